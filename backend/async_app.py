@@ -0,0 +1,511 @@
+"""
+Async (aiohttp) entry point
+
+Serves /api/result and /api/result/stream natively on an event loop with one pooled upstream client
+per worker, so a single process can hold many lookups in flight while OpenAI
+responds. Every other route is passed through to the existing Flask app over a
+small streaming WSGI bridge, so those routes behave exactly as before.
+
+Run with:
+    gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker
+"""
+import io
+import os
+import sys
+import json
+import random
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import unquote_to_bytes
+
+import pinyin
+from aiohttp import web
+
+from main import app as flask_app, contains_chinese_characters
+from async_clients import AsyncUpstreamClient, MnemonicStreamError
+from character_cache import character_info_cache
+from character_data_service import failed_lookups
+from character_lookup import provisional_meaning, build_result, stored_profile
+from connections import getConnections
+from metrics import metrics
+from profiling import bind, phase, profiler
+from mnemonic_store import mnemonic_store, normalize_key
+from services import services
+from singleflight import AsyncSingleFlight, acquire_lock, release_lock, wait_for_result
+
+logger = logging.getLogger(__name__)
+
+# Threads for the WSGI bridge and for synchronous cache/database calls
+_sync_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('WSGI_THREADS', 32)),
+    thread_name_prefix='pinyimage-wsgi'
+)
+
+# Lookups that missed the deadline keep running; hold references until done
+_pending = set()
+
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'upgrade',
+                      'proxy-authenticate', 'proxy-authorization', 'te', 'trailers'}
+
+async def run_sync(fn, *args, **kwargs) -> Any:
+    """Run a blocking call in the thread pool inside a Flask app context"""
+    fn = bind(fn)
+
+    def call():
+        with flask_app.app_context():
+            return fn(*args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_sync_executor, call)
+
+async def _fan_out(coros: Dict[str, Awaitable], timeout: Optional[float]) -> Dict[str, Any]:
+    """Async counterpart of background.fan_out"""
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in coros.items()}
+    await asyncio.wait(tasks.values(), timeout=timeout)
+
+    results = {}
+    for name, task in tasks.items():
+        if not task.done():
+            logger.warning(f"Lookup task {name} missed the {timeout}s deadline")
+            _pending.add(task)
+            task.add_done_callback(_pending.discard)
+        elif not task.cancelled() and task.exception() is None:
+            results[name] = task.result()
+    return results
+
+_flight = AsyncSingleFlight()
+
+async def _coalesced(name: str, coro_fn: Callable[[], Awaitable[Any]], check: Callable[[], Any]) -> Any:
+    """
+    Async counterpart of singleflight.coalesce
+
+    coro_fn must store its result where check can find it before returning.
+    """
+    async def locked():
+        token = await run_sync(acquire_lock, name)
+        if token is None:
+            value = await run_sync(wait_for_result, name, check)
+            return value if value is not None else await coro_fn()
+        try:
+            return await coro_fn()
+        finally:
+            await run_sync(release_lock, name, token)
+    return await _flight.do(name, locked)
+
+async def _info(client: AsyncUpstreamClient, character: str, cached: bool) -> Optional[Dict[str, Any]]:
+    if cached:
+        # With the real loader, stale hits refresh and an entry evicted since
+        # contains() is loaded again
+        return await run_sync(services.character_data.get_character_info, character)
+
+    async def fetch():
+        info = await client.fetch_character_info(character)
+        await run_sync(character_info_cache.store, character, info)
+        return info
+
+    def stored():
+        return services.character_data.get_character_info(character) if character_info_cache.contains(character) else None
+
+    if character in failed_lookups or not client.is_available():
+        # Local results are not cached, so there is nothing to share
+        return await fetch()
+    info = await _coalesced(f"info:{character}", fetch, stored)
+    return dict(info) if info else info
+
+async def _connections(client: AsyncUpstreamClient, character: str, pinyin_text: str, meaning: str,
+                       fresh: bool, has_variants: bool) -> str:
+    if has_variants and not fresh:
+        # Served from the pool; any top-up runs on the background pool
+        return await run_sync(mnemonic_store.get, character, pinyin_text, meaning, services.openai.generate_mnemonic)
+
+    async def generate():
+        text = await client.generate_mnemonic(character, pinyin_text, meaning)
+        if text:
+            await run_sync(mnemonic_store.add, character, pinyin_text, meaning, text)
+        return text
+
+    if fresh:
+        text = await generate()
+    else:
+        # Identical first lookups share one generation
+        key = normalize_key(character, pinyin_text, meaning)
+        text = await _coalesced(f"mnemonic:{key}", generate,
+                                lambda: mnemonic_store.stored_choice(character, pinyin_text, meaning))
+    if text:
+        return text
+    variants = await run_sync(mnemonic_store.variants, character, pinyin_text, meaning)
+    if variants:
+        return random.choice(variants)
+    if not client.is_available():
+        return "OpenAI service is currently unavailable. Please try again later."
+    return "Unable to generate mnemonic at this time. Please try again."
+
+async def _combined(client: AsyncUpstreamClient, character: str, pinyin_text: str, meaning: str) -> Optional[Dict[str, Any]]:
+    async def fetch():
+        profile = await client.get_character_profile(character)
+        if not profile:
+            return None
+        mnemonic = profile.pop("mnemonic")
+        await run_sync(character_info_cache.store, character, profile)
+        await run_sync(mnemonic_store.add, character, pinyin_text, meaning, mnemonic)
+        return {"info": profile, "connections": mnemonic}
+
+    return await _coalesced(f"profile:{character}", fetch,
+                            lambda: stored_profile(character, pinyin_text, meaning))
+
+async def describe_character_async(client: AsyncUpstreamClient, character: str, fresh: bool = False,
+                                   deadline: Optional[float] = None, combined: bool = True) -> Dict[str, Any]:
+    """Async counterpart of character_lookup.describe_character"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    local_pinyin = pinyin.get(character)
+    local_meaning = provisional_meaning(character)
+
+    cached = await run_sync(character_info_cache.contains, character)
+    has_variants = bool(await run_sync(mnemonic_store.variants, character, local_pinyin, local_meaning))
+
+    done = {}
+    if combined and not fresh and not cached and not has_variants:
+        # First-time lookup: one round trip instead of two
+        done = (await _fan_out({
+            "profile": _combined(client, character, local_pinyin, local_meaning)
+        }, timeout=deadline)).get("profile") or {}
+
+    remaining = None if deadline is None else deadline - (loop.time() - started)
+    if not done and (remaining is None or remaining > 0):
+        done = await _fan_out({
+            "info": _info(client, character, cached),
+            "connections": _connections(client, character, local_pinyin, local_meaning, fresh, has_variants),
+        }, timeout=remaining)
+
+    return build_result(character, local_pinyin, local_meaning, done)
+
+async def result(request: web.Request) -> web.Response:
+    """Async /api/result; same contract as the Flask route"""
+    logger.info("async result function called")
+    try:
+        try:
+            formData = await request.json()
+        except ValueError:
+            formData = None
+        if not formData or 'user_input' not in formData:
+            return web.json_response({"error": "No user input provided"}, status=400)
+
+        uinput = formData['user_input'].strip()
+        if not uinput:
+            return web.json_response({"error": "Empty input provided"}, status=400)
+
+        fresh = bool(formData.get('fresh_mnemonic'))
+
+        if not contains_chinese_characters(uinput):
+            return web.json_response({
+                "result": "The input does not contain any Chinese characters.",
+                "connections": ""
+            })
+
+        try:
+            payload = await describe_character_async(
+                request.app['upstream'], uinput, fresh=fresh,
+                deadline=flask_app.config['RESULT_DEADLINE'],
+                combined=flask_app.config['COMBINED_LOOKUP']
+            )
+            with phase('serialize'):
+                response = web.json_response(payload)
+            return response
+        except Exception as e:
+            logger.error(f"Error processing character {uinput}: {e}")
+            pinyin_result = pinyin.get(uinput)
+            connections = await run_sync(getConnections, uinput, pinyin_result, "character", fresh=fresh)
+            return web.json_response({
+                "result": f"\nYour character {uinput} is pronounced {pinyin_result}.",
+                "meaning": "character",
+                "connections": connections,
+                "pinyin": pinyin_result
+            })
+    except Exception as e:
+        logger.error(f"Error in async result endpoint: {e}")
+        return web.json_response({"error": "Internal server error"}, status=500)
+
+def sse_event(event: str, data: Any) -> bytes:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+async def result_stream(request: web.Request) -> web.StreamResponse:
+    """
+    Streaming /api/result over Server-Sent Events
+
+    Events:
+        info: result/meaning/pinyin as soon as the info lookup finishes
+        token: {"text": ...} mnemonic fragments as the model produces them
+        reset: the mnemonic stream broke off; discard the fragments so far
+        done: the complete /api/result payload
+    """
+    uinput = request.query.get('user_input', '').strip()
+    if not uinput:
+        return web.json_response({"error": "No user input provided"}, status=400)
+    fresh = request.query.get('fresh_mnemonic', '').lower() in ('1', 'true')
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'Access-Control-Allow-Origin': '*'
+    })
+    await response.prepare(request)
+
+    if not contains_chinese_characters(uinput):
+        payload = {"result": "The input does not contain any Chinese characters.", "connections": ""}
+        await response.write(sse_event('info', payload))
+        await response.write(sse_event('done', payload))
+        await response.write_eof()
+        return response
+
+    client = request.app['upstream']
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + flask_app.config['RESULT_DEADLINE']
+    local_pinyin = pinyin.get(uinput)
+    local_meaning = provisional_meaning(uinput)
+    cached = await run_sync(character_info_cache.contains, uinput)
+    variants = await run_sync(mnemonic_store.variants, uinput, local_pinyin, local_meaning)
+
+    events = asyncio.Queue()
+    done = {}
+
+    async def produce_info():
+        try:
+            done["info"] = await _info(client, uinput, cached)
+        finally:
+            await events.put('info')
+
+    async def produce_mnemonic():
+        try:
+            if variants and not fresh:
+                text = await run_sync(mnemonic_store.get, uinput, local_pinyin, local_meaning, services.openai.generate_mnemonic)
+                await events.put(('token', text))
+            else:
+                pieces = []
+                try:
+                    async for piece in client.stream_mnemonic(uinput, local_pinyin, local_meaning):
+                        pieces.append(piece)
+                        await events.put(('token', piece))
+                    text = ''.join(pieces).strip()
+                except MnemonicStreamError:
+                    # Truncated: the client drops the fragments and nothing is stored
+                    await events.put(('reset', None))
+                    text = ''
+                if text:
+                    await run_sync(mnemonic_store.add, uinput, local_pinyin, local_meaning, text)
+                elif variants:
+                    text = random.choice(variants)
+                    await events.put(('token', text))
+            if text:
+                done["connections"] = text
+        finally:
+            await events.put('mnemonic')
+
+    tasks = [asyncio.ensure_future(produce_info()), asyncio.ensure_future(produce_mnemonic())]
+    finished = set()
+    try:
+        while len(finished) < 2:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(events.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item == 'info':
+                finished.add(item)
+                payload = build_result(uinput, local_pinyin, local_meaning, done)
+                await response.write(sse_event('info', {key: payload[key] for key in ('result', 'meaning', 'pinyin')}))
+            elif item == 'mnemonic':
+                finished.add(item)
+            elif item[0] == 'reset':
+                await response.write(sse_event('reset', {}))
+            else:
+                await response.write(sse_event('token', {"text": item[1]}))
+        await response.write(sse_event('done', build_result(uinput, local_pinyin, local_meaning, done)))
+        await response.write_eof()
+    except (ConnectionResetError, asyncio.CancelledError):
+        logger.info(f"Client left the stream for {uinput}")
+        raise
+    finally:
+        for task in tasks:
+            if not task.done():
+                _pending.add(task)
+                task.add_done_callback(_pending.discard)
+    return response
+
+class StreamInput(io.RawIOBase):
+    """
+    Blocking wsgi.input over an aiohttp request body
+
+    The Flask app runs in a worker thread; each read waits on the event loop
+    for the next part of request.content, so an upload is consumed as the
+    view reads it instead of being buffered in full first.
+    """
+
+    def __init__(self, content, loop: asyncio.AbstractEventLoop):
+        self._content = content
+        self._loop = loop
+
+    def readable(self) -> bool:
+        return True
+
+    def _wait(self, coro) -> bytes:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return self._wait(self._content.read())
+        if size == 0:
+            return b''
+        return self._wait(self._content.read(size))
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readline(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return self._wait(self._content.readline())
+        return super().readline(size)
+
+def _wsgi_environ(request: web.Request, body: io.RawIOBase) -> Dict[str, Any]:
+    host, _, port = request.host.partition(':')
+    raw_path = request.raw_path.split('?', 1)[0]
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote_to_bytes(raw_path).decode('latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': port or ('443' if request.scheme == 'https' else '80'),
+        'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': request.headers.get('Content-Length', ''),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': body,
+        # The body stream ends where the request body does, chunked or not
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for key, value in request.headers.items():
+        name = 'HTTP_' + key.upper().replace('-', '_')
+        if name in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+async def wsgi_bridge(request: web.Request) -> web.StreamResponse:
+    """Serve a request with the Flask app, streaming its body as it is produced"""
+    loop = asyncio.get_running_loop()
+    environ = _wsgi_environ(request, StreamInput(request.content, loop))
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = status
+        started['headers'] = headers
+        return lambda data: None
+
+    body = await loop.run_in_executor(_sync_executor, flask_app, environ, start_response)
+    chunks = iter(body)
+    try:
+        code, _, reason = started['status'].partition(' ')
+        response = web.StreamResponse(status=int(code), reason=reason or None)
+        for name, value in started['headers']:
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                response.headers.add(name, value)
+        await response.prepare(request)
+        while True:
+            chunk = await loop.run_in_executor(_sync_executor, next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+    finally:
+        if hasattr(body, 'close'):
+            await loop.run_in_executor(_sync_executor, body.close)
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    response = await handler(request)
+    # Bridged responses already carry flask-cors headers
+    if 'Access-Control-Allow-Origin' not in response.headers and not response.prepared:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    # Bridged requests are timed by the Flask app itself
+    if handler is wsgi_bridge:
+        return await handler(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.observe('pinyimage_http_request_duration_seconds', time.perf_counter() - started,
+                        route=request.match_info.route.resource.canonical, method=request.method, status=status)
+
+@web.middleware
+async def profiling_middleware(request: web.Request, handler):
+    # Bridged requests are profiled by the Flask app itself
+    if handler is wsgi_bridge or request.path.startswith('/api/debug/profiles') \
+            or not profiler.should_profile(request.headers):
+        return await handler(request)
+    # Samples of the event loop thread include other requests served concurrently
+    profile, token = profiler.begin(request.method, request.path)
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        if not response.prepared:
+            response.headers['X-Profile-Id'] = profile.id
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        profiler.deactivate(token)
+        await asyncio.get_running_loop().run_in_executor(None, profiler.finish, profile, status)
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[cors_middleware, metrics_middleware, profiling_middleware])
+    app['upstream'] = AsyncUpstreamClient(pool_size=flask_app.config['UPSTREAM_POOL_SIZE'])
+
+    async def start_upstream(app):
+        await app['upstream'].start()
+
+    async def close_upstream(app):
+        await app['upstream'].close()
+
+    app.on_startup.append(start_upstream)
+    app.on_cleanup.append(close_upstream)
+
+    app.router.add_post('/api/result', result)
+    app.router.add_get('/api/result/stream', result_stream)
+    app.router.add_route('*', '/{tail:.*}', wsgi_bridge)
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", 5001))
+    host = os.getenv("HOST", "127.0.0.1")
+    logger.info(f"Starting async app on {host}:{port}")
+    web.run_app(app, host=host, port=port)
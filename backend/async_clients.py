@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from character_data_service import failed_lookups
+from circuit_breaker import CircuitOpenError, openai_breaker
+from metrics import metrics
+from profiling import phase
+from services import services
+from openai_service import (character_info_request, parse_character_info, mnemonic_request,
+                            character_profile_request, parse_character_profile, record_upstream_call)
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+class MnemonicStreamError(Exception):
+    """Raised when a mnemonic stream breaks off part-way through"""
+
+class AsyncUpstreamClient:
+    """
+    Pooled async HTTP client for OpenAI
+
+    One instance (and one aiohttp connection pool) is shared by every request
+    handled by an async worker. Prompts and response parsing are the same ones
+    OpenAIService uses.
+    """
+
+    def __init__(self, pool_size: int = 100, timeout: float = 30):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": "PinyImage/1.0"}
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def is_available(self) -> bool:
+        """Check if OpenAI requests can be made and the circuit breaker lets them through"""
+        return bool(self.api_key) and self.session is not None and openai_breaker.available()
+
+    async def _chat(self, kind: str, request: Dict[str, Any]) -> Optional[str]:
+        if not openai_breaker.allow():
+            raise CircuitOpenError("OpenAI circuit breaker is open")
+        record_upstream_call(kind)
+        started = time.monotonic()
+        try:
+            with phase('upstream'), metrics.time('pinyimage_upstream_request_duration_seconds', provider='openai', operation=kind):
+                async with self.session.post(
+                    OPENAI_CHAT_URL,
+                    json=request,
+                    headers={"Authorization": f"Bearer {self.api_key}"}
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+        except Exception:
+            openai_breaker.record_failure()
+            raise
+        openai_breaker.record_success(time.monotonic() - started)
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def get_character_info(self, character: str) -> Optional[Dict[str, Any]]:
+        """Async counterpart of OpenAIService.get_character_info"""
+        if not self.is_available():
+            return None
+        try:
+            return parse_character_info(character, await self._chat("character_info", character_info_request(character)))
+        except Exception as e:
+            logger.error(f"Async OpenAI character info request failed: {e}")
+            return None
+
+    async def generate_mnemonic(self, character: str, pinyin: str, meaning: str) -> Optional[str]:
+        """Async counterpart of OpenAIService.generate_mnemonic"""
+        if not self.is_available():
+            return None
+        try:
+            return await self._chat("mnemonic", mnemonic_request(character, pinyin, meaning))
+        except Exception as e:
+            logger.error(f"Async OpenAI mnemonic generation failed: {e}")
+            return None
+
+    async def stream_mnemonic(self, character: str, pinyin: str, meaning: str) -> AsyncIterator[str]:
+        """
+        Generate a mnemonic, yielding text fragments as the model produces them
+
+        The stream counts as complete only when OpenAI sends [DONE] or a
+        finish_reason. Yields nothing if OpenAI is unavailable or the request
+        fails before the first fragment.
+
+        Raises:
+            MnemonicStreamError: if the stream breaks off after fragments were
+                yielded; the text so far is truncated and must not be kept
+        """
+        if not self.is_available() or not openai_breaker.allow():
+            return
+        request = dict(mnemonic_request(character, pinyin, meaning), stream=True)
+        record_upstream_call("mnemonic")
+        started = time.monotonic()
+        yielded = False
+        try:
+            async with self.session.post(
+                OPENAI_CHAT_URL,
+                json=request,
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            ) as response:
+                response.raise_for_status()
+                complete = False
+                async for line in response.content:
+                    line = line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == b"[DONE]":
+                        complete = True
+                        break
+                    choice = json.loads(payload)["choices"][0]
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yielded = True
+                        yield content
+                    if choice.get("finish_reason"):
+                        complete = True
+                        break
+                if not complete:
+                    raise MnemonicStreamError("Stream ended before the mnemonic was complete")
+        except Exception as e:
+            openai_breaker.record_failure()
+            metrics.observe('pinyimage_upstream_request_duration_seconds', time.monotonic() - started,
+                            provider='openai', operation='mnemonic_stream', outcome='error')
+            logger.error(f"Async OpenAI mnemonic stream failed: {e}")
+            if yielded:
+                raise e if isinstance(e, MnemonicStreamError) else MnemonicStreamError(str(e)) from e
+        else:
+            openai_breaker.record_success(time.monotonic() - started)
+            metrics.observe('pinyimage_upstream_request_duration_seconds', time.monotonic() - started,
+                            provider='openai', operation='mnemonic_stream', outcome='ok')
+
+    async def get_character_profile(self, character: str) -> Optional[Dict[str, Any]]:
+        """Async counterpart of OpenAIService.get_character_profile"""
+        if not self.is_available():
+            return None
+        try:
+            return parse_character_profile(character, await self._chat("character_profile", character_profile_request(character)))
+        except Exception as e:
+            logger.error(f"Async OpenAI combined character request failed: {e}")
+            return None
+
+    async def fetch_character_info(self, character: str) -> Optional[Dict[str, Any]]:
+        """Async OpenAI -> local dictionary fallback chain, bypassing the cache"""
+        if character not in failed_lookups and self.is_available():
+            result = await self.get_character_info(character)
+            if result and result.get('meaning') != 'character':
+                metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='served')
+                return result
+            metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='failed')
+            failed_lookups.set(character, True)
+        else:
+            metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='skipped')
+        try:
+            result = services.character_data._get_from_local_data(character)
+            metrics.inc('pinyimage_lookup_tier_total', tier='local', outcome='served')
+            return result
+        except ValueError:
+            metrics.inc('pinyimage_lookup_tier_total', tier='local', outcome='failed')
+            metrics.inc('pinyimage_lookup_tier_total', tier='fallback', outcome='served')
+            return services.character_data._get_basic_info(character)
@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed, wait
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from flask import current_app, has_app_context
+from profiling import bind
+
+logger = logging.getLogger(__name__)
+
+# Shared worker pool for work that should not hold up a request
+# (cache refreshes, top-ups). Threads are started lazily on first submit,
+# so each gunicorn worker gets its own pool after fork.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BACKGROUND_WORKERS', 4)),
+    thread_name_prefix='pinyimage-bg'
+)
+
+# Separate pool for fanning out lookups inside a request, so request latency
+# never queues behind background refreshes.
+_lookup_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('LOOKUP_WORKERS', 16)),
+    thread_name_prefix='pinyimage-lookup'
+)
+
+# Pool for the items of a batch request
+_batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_WORKERS', 8)),
+    thread_name_prefix='pinyimage-batch'
+)
+
+# Lookups fanned out by batch items get their own pool, so a large batch
+# never takes the threads single /api/result requests depend on. Each item
+# fans out two lookups.
+_batch_lookup_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_LOOKUP_WORKERS', 2 * _batch_executor._max_workers)),
+    thread_name_prefix='pinyimage-batch-lookup'
+)
+
+# Set while a thread runs a batch item, so its fan_out uses the batch lookup pool
+_local = threading.local()
+
+def _with_app_context(fn: Callable[..., Any], *args, **kwargs) -> Callable[[], Any]:
+    app = current_app._get_current_object() if has_app_context() else None
+    # Lookups fanned out from a profiled request count towards its profile
+    fn = bind(fn)
+
+    def runner():
+        try:
+            if app is None:
+                return fn(*args, **kwargs)
+            with app.app_context():
+                return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Task {getattr(fn, '__name__', fn)} failed: {e}")
+            raise
+
+    return runner
+
+def submit(fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Run a callable on the shared background pool
+
+    If the caller has a Flask app context, the callable runs inside a fresh
+    context for the same app so it can use db.session safely.
+
+    Args:
+        fn: Callable to run
+
+    Returns:
+        Future for the callable's result
+    """
+    return _executor.submit(_with_app_context(fn, *args, **kwargs))
+
+def fan_out(tasks: Dict[str, Callable[[], Any]], timeout: float) -> Dict[str, Any]:
+    """
+    Run independent tasks concurrently under one deadline
+
+    Tasks that have not finished by the deadline keep running (so their
+    results still land in the caches) but are left out of the result.
+
+    Args:
+        tasks: Mapping of name to zero-argument callable
+        timeout: Overall deadline in seconds
+
+    Returns:
+        Mapping of name to result for tasks that finished successfully in time
+    """
+    executor = _batch_lookup_executor if getattr(_local, 'in_batch', False) else _lookup_executor
+    futures = {name: executor.submit(_with_app_context(fn)) for name, fn in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            results[name] = future.result()
+        elif not future.done():
+            logger.warning(f"Lookup task {name} missed the {timeout}s deadline")
+    return results
+
+def stream(tasks: Dict[str, Callable[[], Any]], timeout: Optional[float] = None) -> Iterator[Tuple[str, Any, Optional[BaseException]]]:
+    """
+    Run tasks on the bounded batch pool, yielding each as it finishes
+
+    Tasks are submitted immediately; iterating the returned iterator waits
+    for them.
+
+    Args:
+        tasks: Mapping of name to zero-argument callable
+        timeout: Overall deadline in seconds from submission (None waits for every task)
+
+    Returns:
+        Iterator of (name, result, error) in completion order; tasks still
+        running at the deadline come last with a TimeoutError
+    """
+    futures = {_batch_executor.submit(_with_app_context(_batch_item, fn)): name for name, fn in tasks.items()}
+    return _completed(futures, timeout, None if timeout is None else time.monotonic() + timeout)
+
+def _batch_item(fn: Callable[[], Any]) -> Any:
+    _local.in_batch = True
+    try:
+        return fn()
+    finally:
+        _local.in_batch = False
+
+def _completed(futures: Dict[Future, str], timeout: Optional[float],
+               deadline: Optional[float]) -> Iterator[Tuple[str, Any, Optional[BaseException]]]:
+    pending = set(futures)
+    try:
+        # Time spent before iteration started counts against the deadline
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        for future in as_completed(futures, timeout=remaining):
+            pending.discard(future)
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+    except TimeoutError:
+        for future in list(pending):
+            pending.discard(future)
+            future.cancel()
+            logger.warning(f"Batch task {futures[future]} missed the {timeout}s deadline")
+            yield futures[future], None, TimeoutError(f"missed the {timeout}s deadline")
+    finally:
+        # Consumer went away (e.g. client disconnected): drop work not yet started
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /api/cards serialization paths
+
+Times listing N cards (default 50,000) from an in-memory SQLite database:
+
+- orm: ORM objects, the previous Card.to_dict (strftime per row) and
+  json.dumps, as getCards used to do
+- fast: projected rows, card_serialization.serialize and dumps
+- fast fields=title,pinyin: the same with a sparse fieldset
+
+Usage:
+    python benchmark_serialization.py [--cards 50000] [--repeat 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from models import db, Card, User
+from card_serialization import FIELDS, columns_for, dumps, orjson, serialize
+
+def seed(engine, count: int):
+    db.metadata.create_all(engine, tables=[User.__table__, Card.__table__])
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(User).values(id=1, username='bench', email='bench@example.com',
+                                               password_hash='x'))
+        connection.execute(insert(Card), [
+            {'user_id': 1, 'title': '水', 'pinyin': 'shuǐ', 'meaning': f'water {n}',
+             'con': 'Three drops of water falling beside a stream', 'created_at': start + timedelta(minutes=n)}
+            for n in range(count)
+        ])
+
+def legacy_to_dict(card):
+    """Card.to_dict before the fast path, kept here as the baseline"""
+    from datetime import datetime
+    created_display = card.created_at.strftime("%b %d, %I:%M %p") if card.created_at else None
+    return {
+        'id': card.id,
+        'title': card.title,
+        'pinyin': card.pinyin,
+        'meaning': card.meaning,
+        'con': card.con,
+        'created': card.created_at.isoformat() if card.created_at else None,
+        'created_display': created_display
+    }
+
+def orm_path(session):
+    cards = session.query(Card).filter(Card.user_id == 1).all()
+    return json.dumps([legacy_to_dict(card) for card in cards]).encode('utf-8')
+
+def fast_path(session, fields=FIELDS):
+    rows = session.execute(select(*columns_for(fields)).where(Card.user_id == 1)).all()
+    return dumps(serialize(rows, fields))
+
+def best_of(repeat: int, engine, path, *args) -> float:
+    times = []
+    for _ in range(repeat):
+        # A fresh session per run, like a request
+        with Session(engine) as session:
+            started = time.perf_counter()
+            path(session, *args)
+            times.append(time.perf_counter() - started)
+    return min(times)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare card listing serialization paths")
+    parser.add_argument('--cards', type=int, default=50000, help="Cards to list")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per path (best is reported)")
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    seed(engine, args.cards)
+
+    print(f"📊 Listing {args.cards} cards, best of {args.repeat} (JSON encoder: {'orjson' if orjson else 'json'})")
+    baseline = best_of(args.repeat, engine, orm_path)
+    print(f"  {'orm + to_dict':<25} {baseline * 1000:8.1f} ms")
+    for label, fields in (('fast', FIELDS), ('fast fields=title,pinyin', ('title', 'pinyin'))):
+        elapsed = best_of(args.repeat, engine, fast_path, fields)
+        print(f"  {label:<25} {elapsed * 1000:8.1f} ms  ({baseline / elapsed:.1f}x)")
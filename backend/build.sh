@@ -28,6 +28,34 @@ echo "📦 Installing dependencies..."
 $PYTHON_CMD -m pip install --upgrade pip
 $PYTHON_CMD -m pip install -r requirements.txt --force-reinstall --no-cache-dir
 
+# Build the offline dictionary index
+echo "📚 Building local dictionary index..."
+$PYTHON_CMD build_dictionary.py || {
+    echo "❌ Dictionary build failed"
+    exit 1
+}
+
+# Apply database migrations
+echo "🗄️  Running database migrations..."
+$PYTHON_CMD -m alembic upgrade head || {
+    echo "❌ Database migration failed"
+    exit 1
+}
+
+# Fill normalized pinyin columns on rows written before they existed
+echo "🔤 Filling normalized pinyin..."
+$PYTHON_CMD card_pinyin.py || {
+    echo "❌ Pinyin backfill failed"
+    exit 1
+}
+
+# Index cards written outside the app (e.g. by the SQLite migration)
+echo "🔎 Indexing cards for search..."
+$PYTHON_CMD card_search.py || {
+    echo "❌ Search indexing failed"
+    exit 1
+}
+
 # Verify SQLAlchemy installation
 echo "🔍 Verifying SQLAlchemy..."
 $PYTHON_CMD -c "import sqlalchemy; print(f'SQLAlchemy version: {sqlalchemy.__version__}')"
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Build the offline dictionary index used by CharacterDataService
+Run this at package/deploy time (see build.sh)
+"""
+
+import os
+import sys
+import time
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_dictionary import build_index, DEFAULT_INDEX_PATH
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('LOCAL_DICTIONARY_PATH', DEFAULT_INDEX_PATH)
+    print(f"📚 Building local dictionary index at {path}...")
+    started = time.time()
+    count = build_index(path)
+    print(f"✅ Wrote {count} entries ({os.path.getsize(path) / 1024 / 1024:.1f} MB) in {time.time() - started:.1f}s")
@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+class TTLCache:
+    """Thread-safe bounded LRU mapping with per-entry TTL and a stale window"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, stale_ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        """
+        Look up a key
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (value, state) where state is FRESH, STALE or MISS. Stale entries
+            are past their TTL but still inside the stale window.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, MISS
+            value, stored_at = entry
+            age = now - stored_at
+            if age <= self.ttl:
+                self._data.move_to_end(key)
+                return value, FRESH
+            if age <= self.ttl + self.stale_ttl:
+                self._data.move_to_end(key)
+                return value, STALE
+            del self._data[key]
+            return None, MISS
+
+    def set(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key)[1] != MISS
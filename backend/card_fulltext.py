@@ -0,0 +1,126 @@
+"""
+Ranked full-text search over card meanings and mnemonics
+
+The index lives in the database and is maintained by the database, so every
+write path (the ORM, Core bulk inserts, the SQLite migration) keeps it current:
+
+- SQLite: an FTS5 table card_fts (rowid = cards.id) filled by triggers on
+  cards. The owner column holds "u<user_id>" so the per-user filter is part
+  of the full-text match rather than a scan of everyone's hits.
+- PostgreSQL: a generated tsvector column cards.search_vector (meaning
+  weighted above the mnemonic) with a GIN index.
+
+Other databases fall back to a LIKE scan.
+"""
+import re
+import logging
+from typing import List
+
+from sqlalchemy import text
+
+from models import Card
+
+logger = logging.getLogger(__name__)
+
+_SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS card_fts USING fts5(meaning, con, owner, tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_insert AFTER INSERT ON cards BEGIN
+        INSERT INTO card_fts (rowid, meaning, con, owner) VALUES (new.id, new.meaning, new.con, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_delete AFTER DELETE ON cards BEGIN
+        DELETE FROM card_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_update AFTER UPDATE OF meaning, con, user_id ON cards BEGIN
+        DELETE FROM card_fts WHERE rowid = old.id;
+        INSERT INTO card_fts (rowid, meaning, con, owner) VALUES (new.id, new.meaning, new.con, 'u' || new.user_id);
+    END""",
+    # Cards written before the table existed
+    """INSERT INTO card_fts (rowid, meaning, con, owner)
+        SELECT id, meaning, con, 'u' || user_id FROM cards WHERE id NOT IN (SELECT rowid FROM card_fts)""",
+]
+
+_POSTGRESQL_SCHEMA = [
+    """ALTER TABLE cards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(meaning, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(con, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_cards_search_vector ON cards USING GIN (search_vector)",
+]
+
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS card_fts_insert",
+    "DROP TRIGGER IF EXISTS card_fts_delete",
+    "DROP TRIGGER IF EXISTS card_fts_update",
+    "DROP TABLE IF EXISTS card_fts",
+]
+
+_POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS ix_cards_search_vector",
+    "ALTER TABLE cards DROP COLUMN IF EXISTS search_vector",
+]
+
+_WORD = re.compile(r'\w+')
+
+def install(connection):
+    """
+    Create the full-text index for this database if it is missing
+
+    Idempotent; run at startup for development and test databases, which
+    do not go through the migrations (0006 holds its own copy of this DDL).
+    Existing cards are indexed as part of the install.
+    """
+    statements = {'sqlite': _SQLITE_SCHEMA, 'postgresql': _POSTGRESQL_SCHEMA}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+def uninstall(connection):
+    statements = {'sqlite': _SQLITE_DROP, 'postgresql': _POSTGRESQL_DROP}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.execute(text(statement))
+
+def search_text(session, user_id: int, query: str, limit: int = 50) -> List[Card]:
+    """
+    Cards of one user whose meaning or mnemonic matches the query, best first
+
+    Every word must match; the last one also matches as a prefix so results
+    follow the user's typing ("hor" finds "horse").
+
+    Args:
+        session: SQLAlchemy session
+        user_id: Owner of the cards
+        query: Free English text
+        limit: Maximum number of cards returned
+
+    Returns:
+        Matching cards ordered by relevance
+    """
+    words = _WORD.findall(query.lower())
+    if not words:
+        return []
+    dialect = session.get_bind().dialect.name
+    params = {'user_id': user_id, 'limit': limit}
+
+    if dialect == 'sqlite':
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        params['match'] = f'owner : u{user_id} AND {{meaning con}} : ({" AND ".join(terms)})'
+        statement = text("""
+            SELECT cards.* FROM card_fts JOIN cards ON cards.id = card_fts.rowid
+            WHERE card_fts MATCH :match AND cards.user_id = :user_id
+            ORDER BY bm25(card_fts, 2.0, 1.0, 0.0), cards.id DESC LIMIT :limit
+        """)
+    elif dialect == 'postgresql':
+        params['tsquery'] = ' & '.join(words) + ':*'
+        statement = text("""
+            SELECT cards.* FROM cards, to_tsquery('english', :tsquery) AS query
+            WHERE cards.user_id = :user_id AND cards.search_vector @@ query
+            ORDER BY ts_rank(cards.search_vector, query) DESC, cards.id DESC LIMIT :limit
+        """)
+    else:
+        cards = session.query(Card).filter(Card.user_id == user_id)
+        for word in words:
+            pattern = f'%{word}%'
+            cards = cards.filter(Card.meaning.ilike(pattern) | Card.con.ilike(pattern))
+        return cards.order_by(Card.id.desc()).limit(limit).all()
+
+    return session.query(Card).from_statement(statement.bindparams(**params)).all()
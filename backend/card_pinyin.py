@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Normalized pinyin columns on cards
+
+Card.pinyin is whatever display string the client posted ("nǐhǎo",
+"Nǐ hǎo", "ni3hao3"). Every ORM write also stores the derived forms from
+pinyin_forms.derived_forms ("nihao", "ni3hao3", 2), so tone-insensitive
+filters and pinyin order are plain indexed SQL on
+(user_id, pinyin_toneless, pinyin_numbered, id).
+
+Rows written with Core statements, or before the columns existed, are
+filled by `python card_pinyin.py`.
+
+Usage:
+    python card_pinyin.py [--batch-size 1000]
+"""
+import os
+import sys
+import logging
+import argparse
+from typing import Tuple
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sqlalchemy as sa
+from sqlalchemy import event, select, text
+
+from models import db, Card
+from card_search import normalize_query
+from pinyin_forms import derived_forms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DERIVED_COLUMNS = ('pinyin_toneless', 'pinyin_numbered', 'pinyin_syllables')
+PINYIN_INDEX = 'ix_cards_user_pinyin'
+
+def install(connection):
+    """
+    Add the derived columns and their index to cards if they are missing
+
+    Idempotent; run at startup for development and test databases, which do
+    not go through the migrations (create_all never alters existing tables;
+    0007 holds its own copy of this DDL).
+    """
+    inspector = sa.inspect(connection)
+    existing = {column['name'] for column in inspector.get_columns('cards')}
+    for name in DERIVED_COLUMNS:
+        if name not in existing:
+            column = Card.__table__.c[name]
+            connection.execute(text(
+                f"ALTER TABLE cards ADD COLUMN {name} {column.type.compile(dialect=connection.dialect)}"))
+    if PINYIN_INDEX not in {index['name'] for index in inspector.get_indexes('cards')}:
+        connection.execute(text(
+            f"CREATE INDEX {PINYIN_INDEX} ON cards (user_id, pinyin_toneless, pinyin_numbered, id)"))
+
+def uninstall(connection):
+    connection.execute(text(f"DROP INDEX IF EXISTS {PINYIN_INDEX}"))
+    for name in DERIVED_COLUMNS:
+        connection.execute(text(f"ALTER TABLE cards DROP COLUMN {name}"))
+
+def prefix_filter(query: str) -> Tuple[sa.ColumnElement, ...]:
+    """
+    Conditions for cards whose pinyin starts with the query
+
+    Tone marks and spaces are ignored ("hǎo" and "hao" match every hao);
+    with tone numbers ("hao3") only that tone matches. Written as a range
+    rather than LIKE so any database can answer it from ix_cards_user_pinyin.
+    """
+    value = normalize_query(query)
+    if not value:
+        return ()
+    column = Card.pinyin_numbered if any(ch in '12345' for ch in value) else Card.pinyin_toneless
+    upper = value[:-1] + chr(ord(value[-1]) + 1)
+    return (column >= value, column < upper)
+
+def _fill(card: Card):
+    card.pinyin_toneless, card.pinyin_numbered, card.pinyin_syllables = derived_forms(card.pinyin or '')
+
+@event.listens_for(Card, 'before_insert')
+def _fill_on_insert(mapper, connection, card):
+    _fill(card)
+
+@event.listens_for(Card, 'before_update')
+def _fill_on_update(mapper, connection, card):
+    if sa.inspect(card).attrs.pinyin.history.has_changes() or card.pinyin_numbered is None:
+        _fill(card)
+
+def fill_missing(connection, limit: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Fill the derived columns of up to limit rows that lack them
+
+    Returns:
+        Number of cards updated (0 once every row is filled)
+    """
+    cards = Card.__table__
+    rows = connection.execute(
+        select(cards.c.id, cards.c.pinyin).where(cards.c.pinyin_numbered.is_(None))
+        .order_by(cards.c.id).limit(limit)).all()
+    if not rows:
+        return 0
+    params = []
+    for card_id, pinyin in rows:
+        toneless, numbered, syllables = derived_forms(pinyin or '')
+        params.append({'card_id': card_id, 'toneless': toneless, 'numbered': numbered, 'syllables': syllables})
+    connection.execute(
+        cards.update().where(cards.c.id == sa.bindparam('card_id')).values(
+            pinyin_toneless=sa.bindparam('toneless'),
+            pinyin_numbered=sa.bindparam('numbered'),
+            pinyin_syllables=sa.bindparam('syllables')),
+        params)
+    return len(rows)
+
+def backfill(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Fill the derived columns of rows that lack them, one committed batch at a time
+
+    Returns:
+        Number of cards updated
+    """
+    updated = 0
+    while True:
+        count = fill_missing(db.session.connection(), batch_size)
+        db.session.commit()
+        if not count:
+            return updated
+        updated += count
+        logger.info(f"Filled pinyin forms for {updated} cards")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fill normalized pinyin columns on existing cards")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Cards per batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from main import app
+    with app.app_context():
+        print(f"✅ Filled pinyin forms for {backfill(args.batch_size)} cards")
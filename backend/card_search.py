@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Server-side card search by pinyin or character
+
+Each card gets a search document with its normalized forms: toneless pinyin
+("nihao"), numbered pinyin ("ni3hao3") and the title ("你好"), spaces
+removed. Every 1-3 character substring of those forms is stored in
+card_search_grams keyed by (user_id, gram), so:
+
+- queries of up to three characters are a single index lookup, and
+- longer queries intersect their trigrams, then confirm the match with a
+  substring test on the few documents left.
+
+Both prefix and substring queries work, and the cost depends on how many
+cards match rather than on the size of the collection. The index is kept
+current by a flush hook; cards written with Core statements (for example
+by migrate_sqlite_to_postgres.py) are picked up by `python card_search.py`.
+
+Usage:
+    python card_search.py [--batch-size 1000]
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+import unicodedata
+from typing import Dict, Iterable, List, Set
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from models import db, Card, CardSearchDocument, CardSearchGram
+from pinyin_forms import derived_forms, strip_tones
+
+logger = logging.getLogger(__name__)
+
+GRAM_SIZE = 3
+DEFAULT_BATCH_SIZE = 1000
+SEPARATOR = '|'
+_INDEXED_FIELDS = ('title', 'pinyin', 'user_id')
+
+# Letters, digits and CJK survive normalization; spaces, apostrophes and punctuation do not
+_NOT_SEARCHABLE = re.compile(r'[\W_]+')
+_TONE_NUMBER = re.compile(r'[1-5]')
+
+def search_forms(card: Card) -> List[str]:
+    """
+    Normalized forms a card can be found by
+
+    "nǐhǎo" / "你好" -> ["nihao", "ni3hao3", "你好"]
+    """
+    toneless, numbered, _ = derived_forms(card.pinyin or '')
+    title = _NOT_SEARCHABLE.sub('', unicodedata.normalize('NFC', card.title or '').lower())
+    forms = [toneless, numbered, title]
+    return [form for form in dict.fromkeys(forms) if form]
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query the way documents are normalized
+
+    Tone marks are dropped ("hǎo" finds every hao), tone numbers are kept
+    ("hao3" only finds third-tone hao), spaces are ignored.
+    """
+    query = query.lower()
+    if not _TONE_NUMBER.search(query):
+        query = strip_tones(query)
+    else:
+        query = unicodedata.normalize('NFC', query).replace('ü', 'v').replace('u:', 'v')
+    return _NOT_SEARCHABLE.sub('', query)
+
+def grams(forms: Iterable[str]) -> Set[str]:
+    """Every substring of one to GRAM_SIZE characters, within (never across) forms"""
+    found = set()
+    for form in forms:
+        for size in range(1, GRAM_SIZE + 1):
+            found.update(form[i:i + size] for i in range(len(form) - size + 1))
+    return found
+
+def index_cards(connection, cards: Iterable[Card]):
+    """
+    (Re)write the search rows of the given cards
+
+    Runs on the caller's connection so the index commits with the cards.
+    """
+    cards = [card for card in cards if card.id is not None]
+    if not cards:
+        return
+    remove_cards(connection, [card.id for card in cards])
+
+    documents, gram_rows = [], []
+    for card in cards:
+        forms = search_forms(card)
+        documents.append({'card_id': card.id, 'user_id': card.user_id, 'document': SEPARATOR.join(forms)})
+        gram_rows.extend({'user_id': card.user_id, 'gram': gram, 'card_id': card.id} for gram in grams(forms))
+    connection.execute(CardSearchDocument.__table__.insert(), documents)
+    if gram_rows:
+        connection.execute(CardSearchGram.__table__.insert(), gram_rows)
+
+def remove_cards(connection, card_ids: List[int]):
+    """Drop the search rows of the given card ids"""
+    if not card_ids:
+        return
+    connection.execute(CardSearchGram.__table__.delete().where(CardSearchGram.card_id.in_(card_ids)))
+    connection.execute(CardSearchDocument.__table__.delete().where(CardSearchDocument.card_id.in_(card_ids)))
+
+def search(user_id: int, query: str, limit: int = 50) -> List[Card]:
+    """
+    Cards of one user whose pinyin or title contains the query, newest first
+
+    Args:
+        user_id: Owner of the cards
+        query: Pinyin with or without tone marks or numbers, or Chinese characters
+        limit: Maximum number of cards returned
+
+    Returns:
+        Matching cards
+    """
+    needle = normalize_query(query)
+    if not needle:
+        return []
+
+    if len(needle) <= GRAM_SIZE:
+        matches = select(CardSearchGram.card_id).where(
+            CardSearchGram.user_id == user_id, CardSearchGram.gram == needle)
+    else:
+        trigrams = {needle[i:i + GRAM_SIZE] for i in range(len(needle) - GRAM_SIZE + 1)}
+        candidates = (
+            select(CardSearchGram.card_id)
+            .where(CardSearchGram.user_id == user_id, CardSearchGram.gram.in_(trigrams))
+            .group_by(CardSearchGram.card_id)
+            .having(func.count() == len(trigrams))
+        )
+        # Trigrams can all be present without being adjacent; confirm on the document
+        escaped = needle.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        matches = select(CardSearchDocument.card_id).where(
+            CardSearchDocument.card_id.in_(candidates),
+            CardSearchDocument.document.like(f'%{escaped}%', escape='\\'))
+
+    return (Card.query.filter(Card.user_id == user_id, Card.id.in_(matches))
+            .order_by(Card.created_at.desc(), Card.id.desc()).limit(limit).all())
+
+def index_unindexed(connection, limit: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Index up to limit cards that have no search document yet
+
+    Works on a plain connection, for cards written with Core statements.
+
+    Returns:
+        Number of cards indexed (0 once every card is indexed)
+    """
+    cards, documents = Card.__table__, CardSearchDocument.__table__
+    rows = connection.execute(
+        select(cards.c.id, cards.c.user_id, cards.c.title, cards.c.pinyin)
+        .select_from(cards.outerjoin(documents, documents.c.card_id == cards.c.id))
+        .where(documents.c.card_id.is_(None))
+        .order_by(cards.c.id).limit(limit)).all()
+    index_cards(connection, rows)
+    return len(rows)
+
+def backfill(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Index cards that have no search document yet, one committed batch at a time
+
+    Safe to re-run: indexed cards are skipped, so an interrupted run resumes.
+
+    Returns:
+        Number of cards indexed
+    """
+    indexed = 0
+    while True:
+        count = index_unindexed(db.session.connection(), batch_size)
+        db.session.commit()
+        if not count:
+            return indexed
+        indexed += count
+        logger.info(f"Indexed {indexed} cards for search")
+
+@event.listens_for(Session, 'after_flush')
+def _index_on_flush(session, flush_context):
+    changed: Dict[int, Card] = {}
+    for obj in session.new:
+        if isinstance(obj, Card):
+            changed[obj.id] = obj
+    for obj in session.dirty:
+        if isinstance(obj, Card) and any(inspect(obj).attrs[name].history.has_changes()
+                                         for name in _INDEXED_FIELDS):
+            changed[obj.id] = obj
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Card) and obj.id is not None]
+    if changed:
+        index_cards(session.connection(), changed.values())
+    if deleted:
+        remove_cards(session.connection(), deleted)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the card search index for unindexed cards")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Cards per batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from main import app
+    with app.app_context():
+        print(f"✅ Indexed {backfill(args.batch_size)} cards")
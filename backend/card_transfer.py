@@ -0,0 +1,208 @@
+"""
+Bulk card import and export
+
+Three formats, chosen with ?format=:
+
+- ndjson: one {"title", "pinyin", "meaning", "con"} object per line
+- csv: a header row naming those columns, then one card per row
+- anki: Anki's "Notes in Plain Text" layout, tab separated fields in the
+  order character, pinyin, meaning, mnemonic, with "#key:value" header lines
+
+Exports stream rows from a server-side cursor, so memory stays flat however
+large the collection is. Imports parse the upload as it arrives and insert
+valid rows in batched transactions through the ORM (so card versions, the
+search index and the pinyin columns are maintained as for /api/post). Bad
+rows are reported by row number and do not stop the import.
+"""
+import io
+import csv
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Card
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('title', 'pinyin', 'meaning', 'con')
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'anki': ('text/tab-separated-values', 'txt'),
+}
+EXPORT_CHUNK_ROWS = 500
+MAX_REPORTED_ERRORS = 100
+
+_CHINESE = re.compile(r'[\u4e00-\u9fff]')
+_LIMITS = {'title': Card.title.type.length, 'pinyin': Card.pinyin.type.length}
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be read as the requested format at all"""
+
+# Export
+
+def export_cards(user_id: int, fmt: str) -> Iterator[str]:
+    """
+    Serialize a user's cards, oldest first, in chunks of text
+
+    Must run inside an app context (wrap the generator with stream_with_context).
+    """
+    cards = Card.__table__
+    rows = db.session.execute(
+        select(*(cards.c[field] for field in FIELDS))
+        .where(cards.c.user_id == user_id)
+        .order_by(cards.c.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    if fmt == 'anki':
+        yield "#separator:tab\n#html:false\n#columns:Character\tPinyin\tMeaning\tMnemonic\n"
+    elif fmt == 'csv':
+        yield ','.join(FIELDS) + '\r\n'
+
+    for chunk in rows.partitions():
+        if fmt == 'ndjson':
+            yield ''.join(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n' for row in chunk)
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, delimiter='\t' if fmt == 'anki' else ',')
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+
+# Import
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Parse an upload lazily into (row number, fields dict) pairs
+
+    A row that cannot be parsed yields an error message instead of a dict.
+
+    Raises:
+        ImportFormatError: if the format is unknown or a CSV upload has no usable header
+        UnicodeDecodeError: while iterating, where the upload stops being UTF-8
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'ndjson':
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, item if isinstance(item, dict) else "Expected a JSON object"
+    elif fmt == 'csv':
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or not {'title', 'pinyin', 'meaning'} <= set(reader.fieldnames):
+            raise ImportFormatError("CSV header must name title, pinyin and meaning columns")
+        for number, row in enumerate(reader, start=1):
+            yield number, row
+    elif fmt == 'anki':
+        # Header lines ("#separator:tab") are skipped; notes are numbered by
+        # the file line they end on, so numbers match the uploaded file
+        line_number = [0]
+
+        def notes():
+            for number, line in enumerate(text, start=1):
+                if not line.startswith('#'):
+                    line_number[0] = number
+                    yield line
+
+        for row in csv.reader(notes(), delimiter='\t'):
+            if row:
+                yield line_number[0], dict(zip(FIELDS, row))
+    else:
+        raise ImportFormatError(f"Unknown format {fmt}")
+
+def validate(item: Dict[str, Any]) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """
+    Check one imported row
+
+    Returns:
+        (card fields, None) when valid, otherwise (None, error message)
+    """
+    fields = {}
+    for field in FIELDS:
+        value = item.get(field)
+        fields[field] = value.strip() if isinstance(value, str) else ''
+    for field in ('title', 'pinyin', 'meaning'):
+        if not fields[field]:
+            return None, f"Missing required field: {field}"
+    if not _CHINESE.search(fields['title']):
+        return None, "title must contain Chinese characters"
+    for field, limit in _LIMITS.items():
+        if len(fields[field]) > limit:
+            return None, f"{field} is longer than {limit} characters"
+    return fields, None
+
+def import_cards(user_id: int, rows: Iterable[Tuple[int, Any]], batch_size: int = 500,
+                 max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Insert parsed rows as the user's cards, one transaction per batch
+
+    Args:
+        user_id: Owner of the new cards
+        rows: (row number, fields dict or error message) pairs from read_rows
+        batch_size: Cards per transaction
+        max_rows: Stop reading after this many rows
+
+    Returns:
+        {"imported", "failed", "errors": [{"row", "error"}, ...], "truncated"}.
+        An upload that stops being valid UTF-8 is reported as a row error
+        and truncated there; the rows before it are still imported.
+    """
+    summary = {"imported": 0, "failed": 0, "errors": [], "truncated": False}
+
+    def fail(number: int, error: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": number, "error": error})
+
+    batch: List[Tuple[int, Dict[str, str]]] = []
+    number = 0
+    try:
+        for count, (number, item) in enumerate(rows, start=1):
+            if max_rows is not None and count > max_rows:
+                summary["truncated"] = True
+                break
+            if isinstance(item, str):
+                fail(number, item)
+                continue
+            fields, error = validate(item)
+            if error:
+                fail(number, error)
+                continue
+            batch.append((number, fields))
+            if len(batch) >= batch_size:
+                _insert_batch(user_id, batch, summary, fail)
+                batch = []
+    except UnicodeDecodeError as e:
+        # Earlier batches are committed: report where reading stopped instead of failing the request
+        fail(number + 1, f"Not valid UTF-8 ({e.reason}); the rest of the upload was not read")
+        summary["truncated"] = True
+    if batch:
+        _insert_batch(user_id, batch, summary, fail)
+    return summary
+
+def _insert_batch(user_id: int, batch: List[Tuple[int, Dict[str, str]]], summary: Dict[str, Any], fail):
+    try:
+        db.session.add_all([Card(user_id=user_id, **fields) for _, fields in batch])
+        db.session.commit()
+        summary["imported"] += len(batch)
+        return
+    except IntegrityError:
+        # Only with unique card titles (migration 0003): find the offending rows one by one
+        db.session.rollback()
+
+    for number, fields in batch:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Card(user_id=user_id, **fields))
+            summary["imported"] += 1
+        except IntegrityError:
+            fail(number, "This card is already in your deck")
+    db.session.commit()
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import db, Card, CardCollectionVersion
+
+logger = logging.getLogger(__name__)
+
+_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+def current_version(user_id: int) -> int:
+    """
+    The user's card collection version (0 before their first card)
+
+    A primary key lookup; it changes whenever any of the user's cards do.
+    """
+    version = db.session.execute(
+        select(CardCollectionVersion.version).where(CardCollectionVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+def bump_versions(connection, user_ids: Iterable[int]):
+    """
+    Increment the collection version of each user
+
+    Runs on the caller's connection so the bump commits (or rolls back) with
+    the card change. Code that writes cards with Core statements instead of
+    the ORM must call this itself.
+    """
+    table = CardCollectionVersion.__table__
+    upsert = _UPSERTS.get(connection.dialect.name)
+    for user_id in sorted(set(user_ids)):
+        if upsert is not None:
+            statement = upsert(table).values(user_id=user_id, version=1)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.user_id], set_={'version': table.c.version + 1}))
+        else:
+            result = connection.execute(update(table).where(table.c.user_id == user_id)
+                                        .values(version=table.c.version + 1))
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(user_id=user_id, version=1))
+
+def collection_etag(user_id: int, version: int, args: Iterable[Tuple[str, str]]) -> str:
+    """
+    Strong ETag for one /api/cards response
+
+    Every query parameter changes the body (page size, cursor, total), so
+    they are part of the tag along with the user and collection version.
+    """
+    params = '&'.join(f"{key}={value}" for key, value in sorted(args))
+    digest = hashlib.sha1(f"{user_id}?{params}".encode('utf-8')).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+def _changed_users(session: Session) -> Set[int]:
+    user_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Card) and obj.user_id is not None:
+            user_ids.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, Card) and session.is_modified(obj):
+            history = inspect(obj).attrs.user_id.history
+            user_ids.update(user_id for user_id in history.deleted if user_id is not None)
+            if obj.user_id is not None:
+                user_ids.add(obj.user_id)
+    return user_ids
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    user_ids = _changed_users(session)
+    if user_ids:
+        bump_versions(session.connection(), user_ids)
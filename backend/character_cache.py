@@ -0,0 +1,178 @@
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from flask import has_app_context
+
+import background
+from cache import TTLCache, FRESH, STALE, MISS
+from models import db, CharacterInfo
+from singleflight import coalesce
+
+logger = logging.getLogger(__name__)
+
+class CharacterInfoCache:
+    """
+    Two-level cache for character lookups
+
+    An in-process LRU answers repeat lookups without leaving the worker. Misses
+    fall through to the character_info_cache table, so entries survive restarts
+    and redeploys, and only then to the loader (OpenAI). Entries past
+    their TTL are still served during the stale window while a background
+    refresh replaces them.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 7 * 24 * 3600, stale_ttl: float = 30 * 24 * 3600):
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl, stale_ttl=stale_ttl)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "db_hits": 0, "misses": 0, "refreshes": 0}
+
+    def init_app(self, app):
+        """Apply cache sizing from the Flask config"""
+        self._memory.resize(app.config.get('CHARACTER_CACHE_SIZE', self._memory.maxsize))
+        self._memory.ttl = app.config.get('CHARACTER_CACHE_TTL', self._memory.ttl)
+        self._memory.stale_ttl = app.config.get('CHARACTER_CACHE_STALE_TTL', self._memory.stale_ttl)
+
+    def get_or_load(self, character: str, loader: Callable[[str], Optional[Dict[str, Any]]],
+                    coalesced: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return cached character info, loading and storing it on a miss
+
+        Args:
+            character: Chinese character
+            loader: Called with the character when nothing usable is cached
+            coalesced: Share one loader call between concurrent misses. Pass
+                False when the loader will not reach the upstream, whose
+                (uncached) local result is cheaper than the lock
+
+        Returns:
+            Copy of the character info dictionary, or whatever the loader returned
+        """
+        value, state = self._memory.get(character)
+        if state == FRESH:
+            self._count("hits")
+            return dict(value)
+        if state == STALE:
+            self._count("stale_hits")
+            self._schedule_refresh(character, loader)
+            return dict(value)
+
+        value, stored_at = self._load_persisted(character)
+        if value is not None:
+            age = time.time() - stored_at
+            if age <= self._memory.ttl + self._memory.stale_ttl:
+                self._count("db_hits")
+                self._memory.set(character, value, stored_at=stored_at)
+                if age > self._memory.ttl:
+                    self._schedule_refresh(character, loader)
+                return dict(value)
+
+        self._count("misses")
+        if not coalesced:
+            return self._load_and_store(character, loader)
+        # Concurrent misses for the same character (in this worker or another)
+        # share one loader call
+        value = coalesce(f"info:{character}",
+                         lambda: self._load_and_store(character, loader),
+                         lambda: self._load_persisted(character)[0])
+        return dict(value) if value else value
+
+    def contains(self, character: str) -> bool:
+        """Check for a usable entry in memory or the database without calling a loader"""
+        if self._memory.get(character)[1] != MISS:
+            return True
+        value, stored_at = self._load_persisted(character)
+        if value is None or time.time() - stored_at > self._memory.ttl + self._memory.stale_ttl:
+            return False
+        self._memory.set(character, value, stored_at=stored_at)
+        return True
+
+    def store(self, character: str, value: Optional[Dict[str, Any]]):
+        """Cache a lookup result; local dictionary and placeholder results are not kept"""
+        if not self._is_cacheable(value):
+            return
+        self._memory.set(character, dict(value))
+        self._persist(character, value)
+
+    def invalidate(self, character: str):
+        self._memory.pop(character)
+
+    def clear(self):
+        """Drop the in-process layer (persisted rows are kept)"""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["db_hits"] + stats["misses"]
+        stats["size"] = len(self._memory)
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _is_cacheable(self, value: Optional[Dict[str, Any]]) -> bool:
+        # Local lookups are cheaper than the cache and should not pin out OpenAI results
+        return bool(value) and value.get("source") not in ("fallback", "local")
+
+    def _schedule_refresh(self, character: str, loader: Callable):
+        with self._lock:
+            if character in self._refreshing:
+                return
+            self._refreshing.add(character)
+            self._stats["refreshes"] += 1
+        try:
+            background.submit(self._refresh, character, loader)
+        except Exception as e:
+            logger.warning(f"Could not schedule refresh for {character}: {e}")
+            with self._lock:
+                self._refreshing.discard(character)
+
+    def _load_and_store(self, character: str, loader: Callable):
+        value = loader(character)
+        self.store(character, value)
+        return value
+
+    def _refresh(self, character: str, loader: Callable):
+        try:
+            self.store(character, loader(character))
+        finally:
+            with self._lock:
+                self._refreshing.discard(character)
+
+    def _load_persisted(self, character: str):
+        if not has_app_context():
+            return None, 0
+        try:
+            row = db.session.get(CharacterInfo, character)
+            if row is None:
+                return None, 0
+            stored_at = (row.updated_at or row.created_at or datetime.utcnow()) - datetime(1970, 1, 1)
+            return json.loads(row.data), stored_at.total_seconds()
+        except Exception as e:
+            logger.warning(f"Character cache read failed for {character}: {e}")
+            db.session.rollback()
+            return None, 0
+
+    def _persist(self, character: str, value: Dict[str, Any]):
+        if not has_app_context():
+            return
+        try:
+            db.session.merge(CharacterInfo(
+                character=character,
+                data=json.dumps(value, ensure_ascii=False),
+                source=value.get("source"),
+                updated_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Character cache write failed for {character}: {e}")
+            db.session.rollback()
+
+character_info_cache = CharacterInfoCache()
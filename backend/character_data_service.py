@@ -1,22 +1,23 @@
-import requests
-import json
+import os
 import logging
 from typing import Optional, Dict, Any
 
+from cache import TTLCache
+from character_cache import character_info_cache
+from local_dictionary import get_local_dictionary
+from metrics import metrics
+from radicals import get_radical_index
+
 logger = logging.getLogger(__name__)
 
+# Characters OpenAI failed on recently go straight to the local dictionary
+# instead of paying for another failed request
+failed_lookups = TTLCache(maxsize=4096, ttl=float(os.getenv('NEGATIVE_CACHE_TTL', 60)))
+
 class CharacterDataService:
     def __init__(self):
-        self.local_data = self._load_local_data()
-    
-    def _load_local_data(self) -> Dict[str, Any]:
-        """Load local character data from JSON files"""
-        try:
-            with open("radicals.json", "r", encoding="utf-8") as f:
-                return {"radicals": json.load(f)}
-        except Exception as e:
-            logger.error(f"Failed to load local data: {e}")
-            return {"radicals": []}
+        # Shared per process; radicals.json is only read once
+        self.radicals = get_radical_index()
     
     def get_character_info(self, character: str) -> Optional[Dict[str, Any]]:
         """
@@ -28,75 +29,81 @@ class CharacterDataService:
         Returns:
             Dictionary with character info or None if all sources fail
         """
+        from services import services
+        # During an outage the loader only reads the local dictionary; its
+        # results are not cached, so coalescing would just add lock writes
+        upstream = character not in failed_lookups and services.openai.is_available()
+        return character_info_cache.get_or_load(character, self._fetch_character_info, coalesced=upstream)
+    
+    def _fetch_character_info(self, character: str) -> Optional[Dict[str, Any]]:
+        """Run the OpenAI -> local dictionary fallback chain, bypassing the cache"""
         # Try OpenAI first (most reliable)
         try:
-            from openai_service import OpenAIService
-            openai_service = OpenAIService()
+            from services import services
+            openai_service = services.openai
             logger.info(f"Testing OpenAI availability for {character}")
             
-            if openai_service.is_available():
+            if character in failed_lookups:
+                logger.info(f"OpenAI failed for {character} recently, skipping it")
+                metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='skipped')
+            elif openai_service.is_available():
                 logger.info(f"OpenAI is available, getting character info for {character}")
                 result = openai_service.get_character_info(character)
                 if result and result.get('meaning') != 'character':
                     logger.info(f"OpenAI provided character info for {character}: {result.get('meaning')}")
+                    metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='served')
                     return result
                 else:
                     logger.warning(f"OpenAI returned fallback meaning for {character}")
+                    metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='failed')
+                    failed_lookups.set(character, True)
             else:
                 logger.warning(f"OpenAI is not available for {character}")
+                metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='skipped')
         except Exception as e:
             logger.warning(f"OpenAI failed for {character}: {e}")
+            metrics.inc('pinyimage_lookup_tier_total', tier='openai', outcome='failed')
         
-        # Fallback to CCDB
-        try:
-            logger.info(f"Trying CCDB for {character}")
-            return self._get_from_ccdb(character)
-        except Exception as e:
-            logger.warning(f"CCDB failed for {character}: {e}")
-        
-        # Fallback to local data
+        # Fallback to the offline dictionary (never touches the network)
         try:
             logger.info(f"Trying local data for {character}")
-            return self._get_from_local_data(character)
+            result = self._get_from_local_data(character)
+            metrics.inc('pinyimage_lookup_tier_total', tier='local', outcome='served')
+            return result
         except Exception as e:
             logger.error(f"Local data failed for {character}: {e}")
+            metrics.inc('pinyimage_lookup_tier_total', tier='local', outcome='failed')
         
         # Final fallback - basic info
         logger.info(f"Using basic info fallback for {character}")
+        metrics.inc('pinyimage_lookup_tier_total', tier='fallback', outcome='served')
         return self._get_basic_info(character)
     
-    def _get_from_ccdb(self, character: str) -> Dict[str, Any]:
-        """Get character info from CCDB API"""
-        url = f"http://ccdb.hemiola.com/characters/string/{character}?fields=kDefinition,kMandarin,kRSKangXi"
-        response = requests.get(url, headers={"User-Agent": "PinyImage/1.0"}, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        if not data:
-            raise ValueError("No character data found")
+    def _get_from_local_data(self, character: str) -> Dict[str, Any]:
+        """Get character info from the offline dictionary index"""
+        dictionary = get_local_dictionary()
+        entry = dictionary.lookup(character) if dictionary else None
+        if not entry or not entry["readings"]:
+            raise ValueError("Character not in local dictionary")
         
-        char_data = data[0]
-        definition = char_data.get('kDefinition', '')
-        rad_num = char_data.get('kRSKangXi', '').split('.')[0]
+        reading = entry["readings"][0]
+        definition = ", ".join(reading["definitions"][:3]) or "character"
+        rad_num = str(entry["radical_number"]) if entry["radical_number"] else ""
         
         # Get radical info
         radical_info = self._get_radical_info(rad_num)
         
         return {
             "character": character,
+            "pinyin": reading["pinyin"],
+            "meaning": definition,
             "definition": definition,
             "radical_number": rad_num,
             "radical_character": radical_info.get('radical', ''),
             "radical_meaning": radical_info.get('english', ''),
-            "source": "ccdb"
+            "source": "local"
         }
     
-    def _get_from_local_data(self, character: str) -> Dict[str, Any]:
-        """Get character info from local database"""
-        # This would be expanded with a local character database
-        # For now, return basic info
-        return self._get_basic_info(character)
-    
     def _get_basic_info(self, character: str) -> Dict[str, Any]:
         """Get basic character info when all else fails"""
         return {
@@ -109,20 +116,19 @@ class CharacterDataService:
         }
     
     def _get_radical_info(self, rad_num: str) -> Dict[str, str]:
-        """Get radical information from local data"""
+        """Get radical information from the radical index"""
         try:
-            rad_num_int = int(rad_num)
-            for radical in self.local_data.get("radicals", []):
-                if radical.get("id") == rad_num_int:
-                    return {
-                        "radical": radical.get("radical", ""),
-                        "english": radical.get("english", "")
-                    }
-        except (ValueError, KeyError):
+            radical = self.radicals.get(int(rad_num))
+            if radical:
+                return {
+                    "radical": radical.get("radical", ""),
+                    "english": radical.get("english", "")
+                }
+        except ValueError:
             pass
         
         return {"radical": "", "english": ""}
     
     def is_available(self) -> bool:
         """Check if the service is available"""
-        return len(self.local_data.get("radicals", [])) > 0
+        return len(self.radicals) > 0
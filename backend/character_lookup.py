@@ -0,0 +1,200 @@
+import time
+import random
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import re
+
+import pinyin
+
+import background
+from character_cache import character_info_cache
+from connections import getConnections
+from local_dictionary import get_local_dictionary
+from mnemonic_store import mnemonic_store
+from services import services
+from singleflight import coalesce
+
+logger = logging.getLogger(__name__)
+
+def provisional_meaning(character: str) -> str:
+    """
+    Best local guess at a meaning, available without any network call
+
+    Uses the first definition in the offline dictionary. Falls back to the
+    generic "character" placeholder.
+    """
+    try:
+        dictionary = get_local_dictionary()
+        entry = dictionary.lookup(character) if dictionary else None
+        for reading in (entry or {}).get("readings", []):
+            if reading["definitions"]:
+                return reading["definitions"][0]
+    except Exception as e:
+        logger.warning(f"Local dictionary lookup failed for {character}: {e}")
+    return "character"
+
+_CHINESE = re.compile(r'[\u4e00-\u9fff]')
+
+def warm_up():
+    """Open the local dictionary so the first request does not pay for it"""
+    background.submit(get_local_dictionary)
+
+def stored_profile(character: str, local_pinyin: str, local_meaning: str) -> Optional[Dict[str, Any]]:
+    """Info and a mnemonic already stored (e.g. by another worker), or None"""
+    variants = mnemonic_store.variants(character, local_pinyin, local_meaning)
+    if not variants or not character_info_cache.contains(character):
+        return None
+    return {"info": services.character_data.get_character_info(character),
+            "connections": random.choice(variants)}
+
+def _combined_lookup(character: str, local_pinyin: str, local_meaning: str) -> Optional[Dict[str, Any]]:
+    """Fetch info and mnemonic in one request and seed both caches"""
+    return coalesce(f"profile:{character}",
+                    lambda: _fetch_profile(character, local_pinyin, local_meaning),
+                    lambda: stored_profile(character, local_pinyin, local_meaning))
+
+def _fetch_profile(character: str, local_pinyin: str, local_meaning: str) -> Optional[Dict[str, Any]]:
+    profile = services.openai.get_character_profile(character)
+    if not profile:
+        return None
+    mnemonic = profile.pop("mnemonic")
+    character_info_cache.store(character, profile)
+    mnemonic_store.add(character, local_pinyin, local_meaning, mnemonic)
+    return {"info": profile, "connections": mnemonic}
+
+def describe_character(character: str, fresh: bool = False, deadline: Optional[float] = None,
+                       combined: bool = True) -> Dict[str, Any]:
+    """
+    Build the /api/result payload for a character
+
+    The detailed info lookup and mnemonic generation run concurrently. The
+    mnemonic is seeded from the local pinyin and provisional meaning so it
+    does not have to wait for the info lookup. Whatever has finished by the
+    deadline is used; anything missing falls back to the local data.
+
+    When neither the info nor a mnemonic is cached yet, a single combined
+    request is tried first and the concurrent path only covers its failure.
+
+    Args:
+        character: Chinese character(s) entered by the user
+        fresh: Ask for a newly generated mnemonic
+        deadline: Overall time budget in seconds
+        combined: Use one combined OpenAI request when nothing is cached yet
+
+    Returns:
+        Dictionary with result, meaning, connections and pinyin
+    """
+    local_pinyin = pinyin.get(character)
+    local_meaning = provisional_meaning(character)
+
+    started = time.monotonic()
+    done = {}
+    cold = (combined and not fresh
+            and not character_info_cache.contains(character)
+            and not mnemonic_store.variants(character, local_pinyin, local_meaning))
+    if cold:
+        # First-time lookup: one round trip instead of two
+        done = background.fan_out({
+            "profile": lambda: _combined_lookup(character, local_pinyin, local_meaning)
+        }, timeout=deadline).get("profile") or {}
+
+    remaining = None if deadline is None else deadline - (time.monotonic() - started)
+    if not done and (remaining is None or remaining > 0):
+        char_service = services.character_data
+        done = background.fan_out({
+            "info": lambda: char_service.get_character_info(character),
+            "connections": lambda: getConnections(character, local_pinyin, local_meaning, fresh=fresh),
+        }, timeout=remaining)
+
+    return build_result(character, local_pinyin, local_meaning, done)
+
+def build_result(character: str, local_pinyin: str, local_meaning: str, done: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Assemble the /api/result payload from whichever lookups completed
+
+    Args:
+        character: Chinese character(s) entered by the user
+        local_pinyin: Pinyin from the local data
+        local_meaning: Provisional meaning from the local data
+        done: Completed lookups, keyed "info" and "connections"
+    """
+    char_info = done.get("info")
+    connections = done.get("connections") or "Unable to generate mnemonic at this time. Please try again."
+
+    meaning = (char_info or {}).get('meaning') or (char_info or {}).get('definition')
+    if char_info and meaning and meaning != 'character':
+        pinyin_result = char_info.get('pinyin') or local_pinyin
+        radical = char_info.get('radical') or char_info.get('radical_character', '')
+        radical_info = f"Radical: {radical} ({char_info.get('radical_meaning', '')})"
+        result = f"\nYour character {character} is pronounced {pinyin_result} and means '{meaning}'. \n{radical_info}."
+    elif local_meaning != "character":
+        meaning = local_meaning
+        pinyin_result = local_pinyin
+        result = f"\nYour character {character} is pronounced {pinyin_result} and means '{meaning}'."
+    else:
+        meaning = "character"
+        pinyin_result = local_pinyin
+        result = f"\nYour character {character} is pronounced {pinyin_result}."
+
+    return {
+        "result": result,
+        "meaning": meaning,
+        "connections": connections,
+        "pinyin": pinyin_result,
+        "partial": len(done) < 2
+    }
+
+def is_cached(character: str) -> bool:
+    """True when both the info and a mnemonic can be served without upstream calls"""
+    return (character_info_cache.contains(character)
+            and bool(mnemonic_store.variants(character, pinyin.get(character), provisional_meaning(character))))
+
+def unique_inputs(items: Iterable[Any]) -> List[str]:
+    """Strip and de-duplicate batch inputs, keeping first-seen order"""
+    seen = {}
+    for item in items:
+        if isinstance(item, str) and item.strip():
+            seen.setdefault(item.strip(), None)
+    return list(seen)
+
+def describe_batch(items: Iterable[Any], deadline: Optional[float] = None,
+                   combined: bool = True, batch_deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Describe many characters or words, yielding each result as it is ready
+
+    Inputs are de-duplicated. Fully cached items are answered first, without
+    waiting for anything; the rest go through the bounded batch pool and are
+    yielded in completion order.
+
+    Args:
+        items: Characters or words
+        deadline: Time budget in seconds for each uncached item
+        combined: Use one combined OpenAI request when nothing is cached yet
+        batch_deadline: Time budget in seconds for the whole batch; items not
+            done by then are reported as errors
+
+    Yields:
+        The describe_character payload plus "input", or "input" and "error"
+    """
+    hits, misses = [], {}
+    for item in unique_inputs(items):
+        if not _CHINESE.search(item):
+            yield {"input": item, "error": "The input does not contain any Chinese characters."}
+        elif is_cached(item):
+            hits.append(item)
+        else:
+            misses[item] = (lambda item=item: describe_character(item, deadline=deadline, combined=combined))
+
+    # Start the misses before answering the hits so they overlap
+    completed = background.stream(misses, timeout=batch_deadline)
+    for item in hits:
+        yield dict(describe_character(item, deadline=deadline, combined=combined), input=item)
+    for item, data, error in completed:
+        if isinstance(error, TimeoutError):
+            yield {"input": item, "error": "The batch ran out of time before this item. Please retry it."}
+        elif error is not None:
+            logger.error(f"Batch lookup failed for {item}: {error}")
+            yield {"input": item, "error": "Unable to process character. Please try again later."}
+        else:
+            yield dict(data, input=item)
@@ -0,0 +1,143 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker
+
+    Consecutive failures, or calls slower than slow_call_seconds, trip the
+    breaker open. While open, calls are refused immediately. Once
+    reset_timeout has passed, a single probe call is let through (half-open).
+    The breaker closes again if the probe succeeds and reopens if it fails.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 slow_call_seconds: float = 12):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"successes": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "trips": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        if self._probing and time.monotonic() - self._probe_started >= self.reset_timeout:
+            # The probe never reported back; let another one through
+            self._probing = False
+        return self._state
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through (does not claim the probe)"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def allow(self) -> bool:
+        """
+        Ask to make a call
+
+        Returns:
+            True if the call may go ahead; in the half-open state only the
+            first caller gets True and becomes the probe
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                self._probe_started = time.monotonic()
+                logger.info(f"Circuit {self.name} half-open, sending a probe")
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self, duration: float = 0.0):
+        """Report a completed call; slow calls count against the provider"""
+        if duration > self.slow_call_seconds:
+            with self._lock:
+                self._stats["slow_calls"] += 1
+            logger.warning(f"Slow {self.name} call: {duration:.1f}s")
+            self._fail()
+            return
+        with self._lock:
+            self._stats["successes"] += 1
+            self._failures = 0
+            if self._state != CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+        self._fail()
+
+    def _fail(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["trips"] += 1
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._current_state()
+            stats["consecutive_failures"] = self._failures
+            if self._state == OPEN:
+                stats["retry_in"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+        return stats
+
+def _from_env(name: str) -> CircuitBreaker:
+    prefix = f"{name.upper()}_BREAKER_"
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv(prefix + 'FAILURES', 5)),
+        reset_timeout=float(os.getenv(prefix + 'RESET_TIMEOUT', 30)),
+        slow_call_seconds=float(os.getenv(prefix + 'SLOW_CALL_SECONDS', 12)),
+    )
+
+# One breaker per upstream provider, shared by every thread and the event loop
+openai_breaker = _from_env('openai')
+
+breakers = {breaker.name: breaker for breaker in (openai_breaker,)}
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State and counters of every breaker, for /api/status"""
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -0,0 +1,212 @@
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import jwt
+import requests
+
+import background
+from cache import TTLCache, MISS
+
+logger = logging.getLogger(__name__)
+
+class AuthError(Exception):
+    """Raised when a session token cannot be verified"""
+
+def fetch_jwks(url: str) -> Dict[str, Any]:
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+class JWKSCache:
+    """
+    Clerk signing keys, kept in memory
+
+    Keys are fetched once and refreshed in the background every
+    refresh_interval seconds. A token signed with an unknown key id forces a
+    synchronous refresh (Clerk rotated its keys), at most once per
+    min_refresh_interval so bad tokens cannot hammer the JWKS endpoint.
+    """
+
+    def __init__(self, url: str, refresh_interval: float = 3600, min_refresh_interval: float = 60,
+                 fetch: Callable[[str], Dict[str, Any]] = fetch_jwks):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._fetch = fetch
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: Optional[str]):
+        """
+        Public key for a key id
+
+        Raises:
+            AuthError: if the key id is unknown even after a refresh
+        """
+        if not self._keys:
+            self.refresh(min_age=self.min_refresh_interval)
+        elif time.monotonic() - self._fetched_at > self.refresh_interval:
+            self._schedule_refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            # Skipped when any refresh (including a cold-start one just above)
+            # ran within min_refresh_interval
+            self.refresh(min_age=self.min_refresh_interval)
+            key = self._keys.get(kid)
+        if key is None:
+            raise AuthError(f"Unknown signing key {kid}")
+        return key
+
+    def refresh(self, min_age: float = 0) -> bool:
+        """
+        Fetch the key set now, unless it was fetched less than min_age seconds ago
+
+        Freshness is checked under the lock, so concurrent callers wait for
+        one fetch instead of each making their own.
+
+        Returns:
+            True if a fetch was made
+        """
+        with self._lock:
+            if min_age and self._fetched_at is not None and time.monotonic() - self._fetched_at < min_age:
+                return False
+            try:
+                jwks = self._fetch(self.url)
+                keys = {}
+                for jwk in jwks.get("keys", []):
+                    if jwk.get("kty") == "RSA" and jwk.get("use", "sig") == "sig":
+                        keys[jwk.get("kid")] = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
+                self._keys = keys
+                logger.info(f"Loaded {len(keys)} Clerk signing keys")
+            except Exception as e:
+                logger.error(f"Failed to fetch Clerk JWKS from {self.url}: {e}")
+            finally:
+                # Failed fetches also wait out min_refresh_interval
+                self._fetched_at = time.monotonic()
+                self._refreshing = False
+            return True
+
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            background.submit(self.refresh)
+        except Exception as e:
+            logger.warning(f"Could not schedule JWKS refresh: {e}")
+            self._refreshing = False
+
+class ClerkTokenVerifier:
+    """
+    Offline verification of Clerk session tokens (RS256 JWTs)
+
+    Signatures are checked against the cached JWKS, so no request leaves the
+    worker. Tokens that already verified are remembered until they expire,
+    which makes repeat requests with the same session token a dictionary
+    lookup.
+    """
+
+    def __init__(self, cache_size: int = 4096, leeway: float = 5):
+        self.jwks: Optional[JWKSCache] = None
+        self.issuer: Optional[str] = None
+        self.audience: Optional[str] = None
+        self.authorized_parties: List[str] = []
+        self.leeway = leeway
+        # Clerk session tokens live 60 seconds; entries also expire with the token
+        self._verified = TTLCache(maxsize=cache_size, ttl=300)
+        self._lock = threading.Lock()
+        self._stats = {"verified": 0, "cache_hits": 0, "rejected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.jwks is not None
+
+    def init_app(self, app):
+        """Configure from CLERK_* settings; verification is off without CLERK_JWKS_URL"""
+        url = app.config.get('CLERK_JWKS_URL')
+        self._verified.resize(app.config.get('CLERK_TOKEN_CACHE_SIZE', self._verified.maxsize))
+        self.configure(
+            JWKSCache(url, refresh_interval=app.config.get('CLERK_JWKS_REFRESH', 3600)) if url else None,
+            issuer=app.config.get('CLERK_ISSUER'),
+            audience=app.config.get('CLERK_AUDIENCE'),
+            authorized_parties=app.config.get('CLERK_AUTHORIZED_PARTIES'),
+        )
+        if not url:
+            if app.config.get('CLERK_ALLOW_UNVERIFIED'):
+                logger.warning("CLERK_JWKS_URL is not set; session tokens are NOT verified")
+            else:
+                logger.error("CLERK_JWKS_URL is not set; all authenticated requests will be rejected")
+
+    def configure(self, jwks: Optional[JWKSCache], issuer: Optional[str] = None,
+                  audience: Optional[str] = None, authorized_parties: Optional[List[str]] = None):
+        self.jwks = jwks
+        self.issuer = issuer or None
+        self.audience = audience or None
+        self.authorized_parties = list(authorized_parties or [])
+        self._verified.clear()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a session token and return its claims
+
+        Args:
+            token: Bearer token from the Authorization header
+
+        Returns:
+            Decoded claims (sub, exp, and email when the session token template includes it)
+
+        Raises:
+            AuthError: if the token is malformed, expired, or not signed by Clerk
+        """
+        # Keyed on the whole token: a cached signature must not vouch for an edited payload
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        claims, state = self._verified.get(key)
+        if state != MISS and claims["exp"] + self.leeway > time.time():
+            self._count("cache_hits")
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+            if header.get("alg") != "RS256":
+                raise AuthError(f"Unexpected token algorithm {header.get('alg')}")
+            claims = jwt.decode(
+                token,
+                self.jwks.get_key(header.get("kid")),
+                algorithms=["RS256"],
+                issuer=self.issuer,
+                audience=self.audience,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"], "verify_aud": self.audience is not None},
+            )
+            if self.authorized_parties and claims.get("azp") not in self.authorized_parties:
+                raise AuthError(f"Token issued for unexpected party {claims.get('azp')}")
+        except AuthError:
+            self._count("rejected")
+            raise
+        except jwt.PyJWTError as e:
+            self._count("rejected")
+            raise AuthError(str(e)) from e
+
+        self._count("verified")
+        self._verified.set(key, claims)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = self.enabled
+        stats["cached_tokens"] = len(self._verified)
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+clerk_verifier = ClerkTokenVerifier()
@@ -11,11 +11,73 @@ class Config:
         'pool_pre_ping': True,
         'pool_recycle': 300,
     }
+    
+    # Character info cache (in-process LRU in front of the character_info_cache table)
+    CHARACTER_CACHE_SIZE = int(os.getenv('CHARACTER_CACHE_SIZE', 4096))
+    CHARACTER_CACHE_TTL = int(os.getenv('CHARACTER_CACHE_TTL', 7 * 24 * 3600))
+    CHARACTER_CACHE_STALE_TTL = int(os.getenv('CHARACTER_CACHE_STALE_TTL', 30 * 24 * 3600))
+    
+    # Number of stored mnemonic variants to keep per (character, pinyin, meaning)
+    MNEMONIC_POOL_SIZE = int(os.getenv('MNEMONIC_POOL_SIZE', 5))
+    
+    # /api/cards page size (default and hard cap)
+    CARDS_PAGE_SIZE = int(os.getenv('CARDS_PAGE_SIZE', 100))
+    CARDS_PAGE_SIZE_MAX = int(os.getenv('CARDS_PAGE_SIZE_MAX', 500))
+    
+    # Overall time budget (seconds) for the concurrent lookups behind /api/result
+    RESULT_DEADLINE = float(os.getenv('RESULT_DEADLINE', 15))
+    
+    # Fetch character info and mnemonic in one OpenAI request on first lookup
+    COMBINED_LOOKUP = os.getenv('COMBINED_LOOKUP', 'True').lower() == 'true'
+    
+    # Clerk identity -> users.id cache
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 10000))
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 3600))
+    
+    # Clerk session token verification (off unless CLERK_JWKS_URL is set,
+    # e.g. https://<your-instance>.clerk.accounts.dev/.well-known/jwks.json).
+    # Without it every authenticated request is rejected, except in
+    # development where the X-User-Email/X-User-ID headers are trusted
+    CLERK_ALLOW_UNVERIFIED = False
+    CLERK_JWKS_URL = os.getenv('CLERK_JWKS_URL')
+    CLERK_ISSUER = os.getenv('CLERK_ISSUER')
+    CLERK_AUDIENCE = os.getenv('CLERK_AUDIENCE')
+    CLERK_AUTHORIZED_PARTIES = [p.strip() for p in os.getenv('CLERK_AUTHORIZED_PARTIES', '').split(',') if p.strip()]
+    CLERK_JWKS_REFRESH = int(os.getenv('CLERK_JWKS_REFRESH', 3600))
+    CLERK_TOKEN_CACHE_SIZE = int(os.getenv('CLERK_TOKEN_CACHE_SIZE', 4096))
+    
+    # Most distinct inputs accepted by /api/result/batch
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+    # Overall time budget (seconds) for one /api/result/batch response
+    BATCH_DEADLINE = float(os.getenv('BATCH_DEADLINE', 120))
+    
+    # Bulk card import: cards per transaction and most rows read from one upload
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+    IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', 50000))
+    
+    # /metrics: shared snapshot directory for multi-process (gunicorn) aggregation,
+    # snapshot interval in seconds, and an optional bearer token for scrapers
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 15))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
+    # Request profiling: fraction of requests sampled, HMAC key for the
+    # X-Debug-Profile header (profiling.sign_debug_token), where profiles are
+    # kept, how many are kept, and the stack sampling interval in seconds
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+    
+    # Connection pool size of the async worker's shared OpenAI client
+    UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 100))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///database.db')
+    CLERK_ALLOW_UNVERIFIED = True
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -30,6 +92,7 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CLERK_ALLOW_UNVERIFIED = True
 
 config = {
     'development': DevelopmentConfig,
@@ -1,16 +1,21 @@
-from openai_service import OpenAIService
+from services import services
+from mnemonic_store import mnemonic_store
 import logging
 
 logger = logging.getLogger(__name__)
 
-def getConnections(character, pinyin, meaning=""):
+def getConnections(character, pinyin, meaning="", fresh=False):
     """
     Generate mnemonic connections for a Chinese character using OpenAI.
     
+    Stored variants for the same (character, pinyin, meaning) are reused;
+    OpenAI is only called when the pool is empty or fresh is requested.
+    
     Args:
         character: The Chinese character
         pinyin: The pinyin pronunciation
         meaning: The English meaning (optional)
+        fresh: Generate a new variant instead of reusing a stored one
         
     Returns:
         Generated mnemonic text or error message
@@ -18,16 +23,15 @@ def getConnections(character, pinyin, meaning=""):
     try:
         logger.info(f"Generating connections for character: {character}, pinyin: {pinyin}")
         
-        # Use OpenAI service
-        openai_service = OpenAIService()
-        
-        if not openai_service.is_available():
-            return "OpenAI service is currently unavailable. Please try again later."
+        # Use the worker's shared OpenAI service
+        openai_service = services.openai
         
-        result = openai_service.generate_mnemonic(character, pinyin, meaning)
+        result = mnemonic_store.get(character, pinyin, meaning, openai_service.generate_mnemonic, fresh=fresh)
         
         if result:
             return result
+        elif not openai_service.is_available():
+            return "OpenAI service is currently unavailable. Please try again later."
         else:
             return "Unable to generate mnemonic at this time. Please try again."
             
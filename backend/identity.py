@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from cache import TTLCache, MISS
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+class IdentityResolver:
+    """
+    Maps a Clerk identity to a users.id
+
+    Resolved ids are kept in a bounded in-process cache keyed by (Clerk user
+    id, email), so warm authenticated requests make no user query at all.
+    On a miss the user row is created with INSERT ... ON CONFLICT DO NOTHING
+    and then read back, which is safe when two first requests race.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "created": 0}
+
+    def init_app(self, app):
+        """Apply cache sizing from the Flask config"""
+        self._cache.resize(app.config.get('IDENTITY_CACHE_SIZE', self._cache.maxsize))
+        self._cache.ttl = app.config.get('IDENTITY_CACHE_TTL', self._cache.ttl)
+
+    def resolve(self, clerk_user: Dict[str, Any]) -> int:
+        """
+        Return the users.id for an authenticated Clerk user, creating the row if needed
+
+        Args:
+            clerk_user: Identity from require_clerk_auth ({"user_id", "email"})
+
+        Returns:
+            The user's primary key
+        """
+        key = (clerk_user.get('user_id'), clerk_user['email'])
+        user_id, state = self._cache.get(key)
+        if state != MISS:
+            self._count("hits")
+            return user_id
+
+        self._count("misses")
+        user_id = self._get_or_create(clerk_user['email'])
+        self._cache.set(key, user_id)
+        return user_id
+
+    def invalidate(self, clerk_user: Dict[str, Any]):
+        self._cache.pop((clerk_user.get('user_id'), clerk_user['email']))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = len(self._cache)
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_or_create(self, email: str) -> int:
+        prefix = email.split('@')[0][:60]
+        # The email prefix is the preferred username, but it is unique too;
+        # fall back to a suffixed one if another address already took it
+        for username in (prefix, f"{prefix}_{hashlib.sha1(email.encode('utf-8')).hexdigest()[:8]}"):
+            if self._insert(email, username):
+                self._count("created")
+                logger.info(f"Created new user: {email}")
+            user_id = db.session.execute(select(User.id).where(User.email == email)).scalar()
+            if user_id is not None:
+                return user_id
+        raise RuntimeError(f"Could not create a user for {email}")
+
+    def _insert(self, email: str, username: str) -> bool:
+        """Insert the user unless it (or the username) exists; True if a row was added"""
+        values = dict(username=username, email=email, password_hash='clerk_authenticated')
+        upsert = _UPSERTS.get(db.engine.dialect.name)
+        try:
+            if upsert is not None:
+                result = db.session.execute(upsert(User).values(**values).on_conflict_do_nothing())
+            else:
+                result = db.session.execute(User.__table__.insert().values(**values))
+            db.session.commit()
+            return result.rowcount == 1
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+identity_resolver = IdentityResolver()
@@ -0,0 +1,194 @@
+import os
+import gzip
+import json
+import mmap
+import bisect
+import struct
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from pinyin_forms import numbered_to_marked
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_dictionary.idx')
+
+# File layout: header, fixed-size records sorted by UTF-8 key, then a blob of
+# keys and JSON values. Records are binary searched straight out of the mmap.
+MAGIC = b'PYIDX001'
+HEADER = struct.Struct('<8sII')     # magic, record count, records offset
+RECORD = struct.Struct('<IHII')     # key offset, key length, value offset, value length
+
+# The CJK Unified Ideographs block (U+4E00-U+9FA5) is ordered by KangXi
+# radical. Each radical's run starts at the unified form of the matching
+# Kangxi Radicals code point (U+2F00-U+2FD5), so the radical of a character
+# is the number of run starts at or below it.
+URO_END = 0x9FA5
+_RADICAL_STARTS = [ord(unicodedata.normalize('NFKC', chr(0x2F00 + i))) for i in range(214)]
+
+def kangxi_radical_number(character: str) -> Optional[int]:
+    """KangXi radical number (1-214) of a character in the original CJK block"""
+    code = ord(character)
+    if not _RADICAL_STARTS[0] <= code <= URO_END:
+        return None
+    return bisect.bisect_right(_RADICAL_STARTS, code)
+
+def _pinyin_package_file(name: str) -> str:
+    import pinyin
+    return os.path.join(os.path.dirname(pinyin.__file__), name)
+
+def build_index(path: str = DEFAULT_INDEX_PATH) -> int:
+    """
+    Build the read-only dictionary index
+
+    Definitions and readings come from the CC-CEDICT copy bundled with the
+    pinyin package (traditional and simplified headwords), extra readings
+    from its Mandarin.dat table, and radicals from the block ordering above.
+
+    Args:
+        path: Where to write the index
+
+    Returns:
+        Number of entries written
+    """
+    entries = {}
+
+    def entry(key):
+        return entries.setdefault(key, {"p": []})
+
+    with gzip.open(_pinyin_package_file('cedict.txt.gz'), 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            try:
+                headwords, rest = line.split(' [', 1)
+                reading, definitions = rest.split('] /', 1)
+            except ValueError:
+                continue
+            traditional, simplified = headwords.split(' ', 1)
+            definitions = [d for d in definitions.strip().rstrip('/').split('/') if d]
+            for key in {traditional, simplified}:
+                entry(key)["p"].append([reading, definitions])
+
+    with open(_pinyin_package_file('Mandarin.dat'), encoding='utf-8') as f:
+        for line in f:
+            code, readings = line.strip().split('\t')
+            readings_for = entry(chr(int(code, 16)))["p"]
+            known = {r.lower() for r, _ in readings_for}
+            for reading in readings.lower().replace('v', 'u:').split():
+                if reading not in known:
+                    readings_for.append([reading, []])
+
+    for code in range(_RADICAL_STARTS[0], URO_END + 1):
+        entry(chr(code))["r"] = kangxi_radical_number(chr(code))
+
+    for value in entries.values():
+        # Common readings first: surnames and definition-less readings last
+        value["p"].sort(key=lambda r: (not r[1], bool(r[1]) and r[1][0].startswith('surname'), r[0][:1].isupper()))
+
+    keys = sorted(entries, key=lambda k: k.encode('utf-8'))
+    records = bytearray()
+    blob = bytearray()
+    blob_start = HEADER.size + RECORD.size * len(keys)
+    for key in keys:
+        key_bytes = key.encode('utf-8')
+        value_bytes = json.dumps(entries[key], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        key_offset = blob_start + len(blob)
+        blob += key_bytes
+        records += RECORD.pack(key_offset, len(key_bytes), blob_start + len(blob), len(value_bytes))
+        blob += value_bytes
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys), HEADER.size))
+        f.write(records)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(keys)
+
+class LocalDictionary:
+    """Memory-mapped, read-only view of an index written by build_index"""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._records = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a dictionary index")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, index: int):
+        return RECORD.unpack_from(self._mm, self._records + index * RECORD.size)
+
+    def _find(self, key: bytes) -> Optional[bytes]:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_offset, key_length, value_offset, value_length = self._record(mid)
+            probe = self._mm[key_offset:key_offset + key_length]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return self._mm[value_offset:value_offset + value_length]
+        return None
+
+    def lookup(self, word: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a character or word
+
+        Args:
+            word: Headword in traditional or simplified characters
+
+        Returns:
+            Dictionary with readings (pinyin, numbered pinyin, definitions) and
+            radical_number, or None if the word is not in the index
+        """
+        raw = self._find(word.encode('utf-8'))
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        return {
+            "word": word,
+            "readings": [
+                {"pinyin": numbered_to_marked(reading), "pinyin_numbered": reading, "definitions": definitions}
+                for reading, definitions in value["p"]
+            ],
+            "radical_number": value.get("r")
+        }
+
+    def close(self):
+        self._mm.close()
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+def get_local_dictionary() -> Optional[LocalDictionary]:
+    """
+    Process-wide dictionary, opened on first use
+
+    The index is normally built at package time (build_dictionary.py). If it
+    is missing it is built once here so development setups still work.
+    """
+    global _dictionary
+    if _dictionary is not None:
+        return _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            path = os.getenv('LOCAL_DICTIONARY_PATH', DEFAULT_INDEX_PATH)
+            try:
+                if not os.path.exists(path):
+                    logger.warning(f"Local dictionary index not found at {path}, building it now")
+                    build_index(path)
+                _dictionary = LocalDictionary(path)
+                logger.info(f"Loaded local dictionary with {len(_dictionary)} entries")
+            except Exception as e:
+                logger.error(f"Failed to load local dictionary: {e}")
+                return None
+    return _dictionary
@@ -1,4 +1,4 @@
-from flask import Flask, request, send_from_directory, jsonify
+from flask import Flask, Response, request, send_from_directory, jsonify, stream_with_context
 from flask_cors import CORS
 # JWT removed - using Clerk instead
 from connections import getConnections
@@ -7,6 +7,7 @@ import pinyin
 import requests
 import re
 import json 
+import hmac
 import os
 import logging
 from dotenv import load_dotenv
@@ -15,6 +16,28 @@ from datetime import datetime, timedelta
 # Import our new models and config
 from models import db, User, Card
 from config import config
+from character_cache import character_info_cache
+from mnemonic_store import mnemonic_store
+from pagination import encode_cursor, decode_cursor, encode_pinyin_cursor, decode_pinyin_cursor
+from character_lookup import describe_character, describe_batch, unique_inputs, warm_up
+from radicals import get_radical_index
+from services import services
+from identity import identity_resolver
+from card_versions import collection_etag, current_version
+from card_search import search as search_cards
+from card_fulltext import install as install_fulltext, search_text
+from card_pinyin import install as install_pinyin_columns, prefix_filter
+from card_serialization import columns_for, dumps, parse_fields, serialize
+from metrics import metrics
+from profiling import phase, profiler
+from card_transfer import FORMATS, ImportFormatError, export_cards, import_cards, read_rows
+from clerk_auth import clerk_verifier, AuthError
+from openai_service import upstream_call_counts
+from singleflight import stats as single_flight_stats
+from circuit_breaker import breaker_stats
+from character_data_service import failed_lookups
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 
 # Load environment variables
 load_dotenv()
@@ -25,7 +48,7 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='')
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Total-Count', 'ETag'])  # Enable CORS for all routes
 
 # Clerk configuration
 import requests
@@ -33,28 +56,33 @@ from functools import wraps
 
 def verify_clerk_token(token):
     """Verify Clerk JWT token and return user info"""
-    try:
-        # For demo purposes, we'll use a simple approach
-        # In production, you'd verify the JWT with Clerk's public key
-        
-        # For now, let's extract user info from the request headers
-        # The frontend should send user info along with the token
-        user_email = request.headers.get('X-User-Email')
-        user_id = request.headers.get('X-User-ID')
-        
-        if user_email and user_id:
-            return {'user_id': user_id, 'email': user_email}
-        else:
-            # Fallback for demo - create a unique user based on token
-            import hashlib
-            user_hash = hashlib.md5(token.encode()).hexdigest()[:8]
-            demo_email = f"user_{user_hash}@demo.com"
-            return {'user_id': user_hash, 'email': demo_email}
-            
-    except Exception as e:
-        logger.error(f"Token verification error: {e}")
+    if clerk_verifier.enabled:
+        try:
+            claims = clerk_verifier.verify(token)
+        except AuthError as e:
+            logger.warning(f"Rejected session token: {e}")
+            return None
+        # Users are keyed by email, which comes from the Clerk session token
+        # template; without it the token would map to a new, empty account
+        email = claims.get('email')
+        if not email:
+            logger.warning(f"Rejected session token for {claims['sub']}: no email claim")
+            return None
+        return {'user_id': claims['sub'], 'email': email}
+
+    if not app.config.get('CLERK_ALLOW_UNVERIFIED'):
+        # Fail closed: outside development an unverified token never authenticates
+        logger.error("CLERK_JWKS_URL is not set; rejecting session token")
         return None
 
+    # Local development only: the token is not verified and the
+    # frontend-supplied headers are trusted
+    user_email = request.headers.get('X-User-Email')
+    user_id = request.headers.get('X-User-ID')
+    if user_email and user_id:
+        return {'user_id': user_id, 'email': user_email}
+    return None
+
 def require_clerk_auth(f):
     """Decorator to require Clerk authentication"""
     @wraps(f)
@@ -66,7 +94,8 @@ def require_clerk_auth(f):
                 return jsonify({"error": "Missing or invalid authorization header"}), 401
             
             token = auth_header.split(' ')[1]
-            user_info = verify_clerk_token(token)
+            with phase('auth'):
+                user_info = verify_clerk_token(token)
             
             if not user_info:
                 return jsonify({"error": "Invalid token"}), 401
@@ -83,11 +112,45 @@ def require_clerk_auth(f):
 env = os.getenv('FLASK_ENV', 'development')
 app.config.from_object(config[env])
 db.init_app(app)
+character_info_cache.init_app(app)
+mnemonic_store.init_app(app)
+services.init_app(app)
+identity_resolver.init_app(app)
+clerk_verifier.init_app(app)
+metrics.init_app(app)
+profiler.init_app(app)
+warm_up()
+
+def cache_metrics():
+    """Cumulative hit/miss counts of the in-process caches, for /metrics"""
+    info = character_info_cache.stats()
+    for result in ('hits', 'stale_hits', 'db_hits', 'misses'):
+        yield 'pinyimage_cache_lookups_total', {'cache': 'character_info', 'result': result}, info[result]
+    mnemonics = mnemonic_store.stats()
+    for result in ('hits', 'misses'):
+        yield 'pinyimage_cache_lookups_total', {'cache': 'mnemonic', 'result': result}, mnemonics[result]
+    identities = identity_resolver.stats()
+    for result in ('hits', 'misses'):
+        yield 'pinyimage_cache_lookups_total', {'cache': 'identity', 'result': result}, identities[result]
+    tokens = clerk_verifier.stats()
+    yield 'pinyimage_cache_lookups_total', {'cache': 'clerk_token', 'result': 'hits'}, tokens['cache_hits']
+    yield 'pinyimage_cache_lookups_total', {'cache': 'clerk_token', 'result': 'misses'}, tokens['verified'] + tokens['rejected']
+
+metrics.register_collector(cache_metrics)
 
 # Create tables if they don't exist
 with app.app_context():
+    metrics.instrument_engine(db.engine)
+    profiler.instrument_engine(db.engine)
     try:
         db.create_all()
+        # The pinyin columns and full-text index are created by migrations
+        # 0006 and 0007 on deployed databases; only local development and
+        # test databases get them here
+        if env in ('development', 'testing'):
+            with db.engine.begin() as connection:
+                install_pinyin_columns(connection)
+                install_fulltext(connection)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -119,31 +182,25 @@ def addToDb():
         
         # Get or create user based on Clerk authentication
         clerk_user_info = request.clerk_user
-        user = User.query.filter_by(email=clerk_user_info['email']).first()
-        
-        if not user:
-            # Create new user from Clerk data
-            user = User(
-                username=clerk_user_info['email'].split('@')[0],  # Use email prefix as username
-                email=clerk_user_info['email'],
-                password_hash='clerk_authenticated'  # No password needed with Clerk
-            )
-            db.session.add(user)
-            db.session.commit()
-            logger.info(f"Created new user: {user.email}")
+        user_id = identity_resolver.resolve(clerk_user_info)
         
         # Create new card for this user
         card = Card(
-            user_id=user.id,
+            user_id=user_id,
             title=formData['title'],
             pinyin=formData['pinyin'],
             meaning=formData['meaning'],
             con=formData['con']
         )
         db.session.add(card)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Only raised when unique card titles are enforced (migration 0003)
+            db.session.rollback()
+            return jsonify({"status": "error", "message": "This card is already in your deck"}), 409
         
-        logger.info(f"Successfully added card: {formData['title']} for user: {user.email}")
+        logger.info(f"Successfully added card: {formData['title']} for user: {clerk_user_info['email']}")
         return jsonify({"status": "success"}), 200
         
     except Exception as e:
@@ -163,113 +220,257 @@ def result():
         if not uinput:
             return jsonify({"error": "Empty input provided"}), 400
         
-        # Get existing cards
-        cards = Card.query.all()
+        fresh = bool(formData.get('fresh_mnemonic'))
         
         if contains_chinese_characters(uinput):
             try:
-                # Get character info using the service
-                from character_data_service import CharacterDataService
-                char_service = CharacterDataService()
-                char_info = char_service.get_character_info(uinput)
-                
-                if char_info and char_info.get('meaning') != 'character':
-                    # Use the actual meaning from the service
-                    meaning = char_info.get('meaning', 'character')
-                    pinyin_result = char_info.get('pinyin', pinyin.get(uinput))
-                    radical_info = f"Radical: {char_info.get('radical', '')} ({char_info.get('radical_meaning', '')})"
-                    
-                    result = f"\nYour character {uinput} is pronounced {pinyin_result} and means '{meaning}'. \n{radical_info}."
-                    
-                    # Generate connections using the actual meaning
-                    connections = getConnections(uinput, pinyin_result, meaning)
-                else:
-                    # Fallback to basic info
-                    pinyin_result = pinyin.get(uinput)
-                    result = f"\nYour character {uinput} is pronounced {pinyin_result}."
-                    connections = getConnections(uinput, pinyin_result, "character")
-                    meaning = "character"
-                
-                return jsonify({
-                    "result": result, 
-                    "meaning": meaning, 
-                    "connections": connections, 
-                    "pinyin": pinyin_result, 
-                    "cards": [card.to_dict() for card in cards]
-                })
+                # Info lookup and mnemonic generation run concurrently under one deadline
+                return jsonify(describe_character(uinput, fresh=fresh,
+                                                   deadline=app.config['RESULT_DEADLINE'],
+                                                   combined=app.config['COMBINED_LOOKUP']))
             except Exception as e:
                 logger.error(f"Error processing character {uinput}: {e}")
                 # Fallback: provide basic info without external API
                 try:
                     pinyin_result = pinyin.get(uinput)
-                    connections = getConnections(uinput, pinyin_result, "character")
+                    connections = getConnections(uinput, pinyin_result, "character", fresh=fresh)
                     result = f"\nYour character {uinput} is pronounced {pinyin_result}."
                     
                     return jsonify({
                         "result": result,
                         "meaning": "character",
                         "connections": connections,
-                        "pinyin": pinyin_result,
-                        "cards": [card.to_dict() for card in cards]
+                        "pinyin": pinyin_result
                     })
                 except Exception as fallback_error:
                     logger.error(f"Fallback also failed: {fallback_error}")
                     return jsonify({
-                        "error": "Unable to process character. Please try again later.",
-                        "cards": [card.to_dict() for card in cards]
+                        "error": "Unable to process character. Please try again later."
                     }), 500
         else:
             return jsonify({
                 "result": "The input does not contain any Chinese characters.",
-                "connections": "",
-                "cards": [card.to_dict() for card in cards]
+                "connections": ""
             })
             
     except Exception as e:
         logger.error(f"Error in result endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route("/api/result/batch", methods=["POST"])
+def result_batch():
+    """
+    Look up many characters or words in one request
+
+    Body: {"inputs": ["水", "火", "朋友", ...]}. Duplicates are dropped.
+    The response is NDJSON, one /api/result payload (plus "input") per line,
+    in completion order with cached items first. Items not done within
+    BATCH_DEADLINE come back with an error.
+    """
+    formData = request.get_json(silent=True)
+    inputs = formData.get('inputs') if isinstance(formData, dict) else None
+    inputs = unique_inputs(inputs) if isinstance(inputs, list) else []
+    if not inputs:
+        return jsonify({"error": "No inputs provided"}), 400
+    if len(inputs) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['BATCH_MAX_ITEMS']} distinct inputs per batch"}), 400
+    
+    def generate():
+        for item in describe_batch(inputs, deadline=app.config['RESULT_DEADLINE'],
+                                   combined=app.config['COMBINED_LOOKUP'],
+                                   batch_deadline=app.config['BATCH_DEADLINE']):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/cards')
 @require_clerk_auth
 def getCards():
     try:
         # Get user from Clerk authentication
         clerk_user_info = request.clerk_user
+        user_id = identity_resolver.resolve(clerk_user_info)
         
-        user = User.query.filter_by(email=clerk_user_info['email']).first()
+        # Unchanged collections are answered from the version alone (one primary key lookup)
+        etag = collection_etag(user_id, current_version(user_id), request.args.items(multi=True))
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
         
-        if not user:
-            # Create new user
-            user = User(
-                username=clerk_user_info['email'].split('@')[0],
-                email=clerk_user_info['email'],
-                password_hash='clerk_authenticated'
-            )
-            db.session.add(user)
-            db.session.commit()
+        # Keyset pagination on (created_at, id), newest first, or on
+        # (pinyin_toneless, pinyin_numbered, id) with ?order=pinyin
+        limit = request.args.get('limit', app.config['CARDS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['CARDS_PAGE_SIZE_MAX']))
+        by_pinyin = request.args.get('order') == 'pinyin'
+        try:
+            # ?fields=title,pinyin selects only those columns
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        keyset = ('pinyin_toneless', 'pinyin_numbered', 'id') if by_pinyin else ('created_at', 'id')
         
-        # Only return cards for this user
-        cards = Card.query.filter_by(user_id=user.id).all()
-        cards_data = [card.to_dict() for card in cards]
-        return jsonify(cards_data)
+        # ?pinyin=hao keeps cards whose pinyin starts with it, tones optional
+        matching = [Card.user_id == user_id, *prefix_filter(request.args.get('pinyin', ''))]
+        query = select(*columns_for(fields, keyset)).where(*matching)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                if by_pinyin:
+                    position = decode_pinyin_cursor(cursor)
+                else:
+                    position = decode_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+            if by_pinyin:
+                query = query.where(tuple_(Card.pinyin_toneless, Card.pinyin_numbered, Card.id) > tuple_(*position))
+            else:
+                query = query.where(tuple_(Card.created_at, Card.id) < tuple_(*position))
+        
+        if by_pinyin:
+            query = query.order_by(Card.pinyin_toneless, Card.pinyin_numbered, Card.id)
+        else:
+            query = query.order_by(Card.created_at.desc(), Card.id.desc())
+        # Plain rows: read-only listings skip ORM object construction
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        with phase('serialize'):
+            body = dumps(serialize(rows, fields))
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        if has_more:
+            last = rows[-1]._mapping
+            response.headers['X-Next-Cursor'] = (
+                encode_pinyin_cursor(last['pinyin_toneless'], last['pinyin_numbered'], last['id']) if by_pinyin
+                else encode_cursor(last['created_at'], last['id']))
+        if request.args.get('include_total', '').lower() in ('1', 'true'):
+            total = db.session.execute(select(func.count()).select_from(Card).where(*matching)).scalar()
+            response.headers['X-Total-Count'] = str(total)
+        return response
     except Exception as e:
         logger.error(f"Error fetching cards: {e}")
         return jsonify({"error": "Unable to fetch cards"}), 500
 
+@app.route('/api/cards/search')
+@require_clerk_auth
+def searchCards():
+    """
+    Search the user's cards by pinyin or character
+
+    Query: ?q=hao (tone marks and spaces are ignored, "hao3" matches the
+    third tone only, "好" matches titles) and optional &limit=.
+    With &in=text, q is English matched against meanings and mnemonics,
+    best match first.
+    """
+    try:
+        user_id = identity_resolver.resolve(request.clerk_user)
+        limit = request.args.get('limit', app.config['CARDS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, app.config['CARDS_PAGE_SIZE_MAX']))
+        if request.args.get('in') == 'text':
+            cards = search_text(db.session, user_id, request.args.get('q', ''), limit=limit)
+        else:
+            cards = search_cards(user_id, request.args.get('q', ''), limit=limit)
+        return jsonify([card.to_dict() for card in cards])
+    except Exception as e:
+        logger.error(f"Error searching cards: {e}")
+        return jsonify({"error": "Unable to search cards"}), 500
+
+@app.route('/api/cards/export')
+@require_clerk_auth
+def exportCards():
+    """
+    Download all of the user's cards
+
+    Query: ?format=ndjson (default), csv or anki. The body is streamed, so
+    large decks start downloading at once and use constant memory.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format {fmt}"}), 400
+    user_id = identity_resolver.resolve(request.clerk_user)
+    mimetype, extension = FORMATS[fmt]
+    response = Response(stream_with_context(export_cards(user_id, fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=cards.{extension}'
+    return response
+
+@app.route('/api/cards/import', methods=["POST"])
+@require_clerk_auth
+def importCards():
+    """
+    Add many cards from one upload
+
+    Query: ?format=ndjson (default), csv or anki; the request body is the
+    file. Valid rows are inserted in batches; the response counts them and
+    lists the rows that were rejected and why.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format {fmt}"}), 400
+    try:
+        user_id = identity_resolver.resolve(request.clerk_user)
+        summary = import_cards(user_id, read_rows(request.stream, fmt),
+                               batch_size=app.config['IMPORT_BATCH_SIZE'],
+                               max_rows=app.config['IMPORT_MAX_ROWS'])
+        logger.info(f"Imported {summary['imported']} cards ({summary['failed']} rejected) for user {user_id}")
+        return jsonify(summary)
+    except ImportFormatError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing cards: {e}")
+        db.session.rollback()
+        return jsonify({"error": "Unable to import cards"}), 500
+
+@app.route('/metrics')
+def getMetrics():
+    """Prometheus scrape endpoint, aggregated over all workers when METRICS_DIR is set"""
+    token = app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/debug/profiles')
+def listProfiles():
+    """Stored request profiles, newest first (requires a signed X-Debug-Profile header)"""
+    if not profiler.authorized(request.headers):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify({"profiles": profiler.list_profiles()})
+
+@app.route('/api/debug/profiles/<profile_id>')
+def getProfile(profile_id):
+    """Download one request profile"""
+    if not profiler.authorized(request.headers):
+        return jsonify({"error": "Unauthorized"}), 401
+    profile = profiler.load(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    response = jsonify(profile)
+    response.headers['Content-Disposition'] = f'attachment; filename="{profile_id}.json"'
+    return response
+
 @app.route('/api/status')
 def getStatus():
     """Get system status including AI service availability"""
     try:
-        from ai_service import AIService
-        from character_data_service import CharacterDataService
-        
-        ai_service = AIService()
-        char_service = CharacterDataService()
+        ai_service = services.ai
+        char_service = services.character_data
         
         return jsonify({
             "ai_services": ai_service.get_available_services(),
             "ai_available": ai_service.is_available(),
             "character_service_available": char_service.is_available(),
+            "character_cache": character_info_cache.stats(),
+            "mnemonic_store": mnemonic_store.stats(),
+            "upstream_calls": upstream_call_counts(),
+            "single_flight": single_flight_stats(),
+            "identity_cache": identity_resolver.stats(),
+            "clerk_auth": clerk_verifier.stats(),
+            "circuit_breakers": breaker_stats(),
+            "negative_cache": {"size": len(failed_lookups)},
             "database": "postgresql" if "postgresql" in app.config['SQLALCHEMY_DATABASE_URI'] else "sqlite",
             "environment": os.getenv("FLASK_ENV", "development"),
             "timestamp": datetime.utcnow().isoformat()
@@ -292,8 +493,7 @@ def health_check():
     
     # Check AI service
     try:
-        from ai_service import AIService
-        ai_service = AIService()
+        ai_service = services.ai
         ai_status = "healthy" if ai_service.is_available() else "unhealthy"
     except Exception as e:
         logger.error(f"AI service health check failed: {e}")
@@ -301,8 +501,7 @@ def health_check():
     
     # Check character service
     try:
-        from character_data_service import CharacterDataService
-        char_service = CharacterDataService()
+        char_service = services.character_data
         char_status = "healthy" if char_service.is_available() else "unhealthy"
     except Exception as e:
         logger.error(f"Character service health check failed: {e}")
@@ -328,8 +527,7 @@ def getCharInfo(uinput):
     logger.info(f"Getting character info for: {uinput}")
     
     try:
-        from character_data_service import CharacterDataService
-        char_service = CharacterDataService()
+        char_service = services.character_data
         
         # Get character info with fallbacks
         char_info = char_service.get_character_info(uinput)
@@ -356,22 +554,14 @@ def getCharInfo(uinput):
 def getRads(radNumC):
     logger.info(f"Getting radical info for number: {radNumC}")
     try:
-        radNumC = int(radNumC)
-        with open("radicals.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        rad = None
-        for item in data:
-            if item['id'] == radNumC:
-                rad = item
-                break
+        rad = get_radical_index().get(int(radNumC))
         
         if not rad:
             logger.warning(f"Radical {radNumC} not found in database")
             
         return rad
         
-    except (ValueError, FileNotFoundError, json.JSONDecodeError) as e:
+    except ValueError as e:
         logger.error(f"Error reading radical data: {e}")
         raise
 
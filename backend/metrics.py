@@ -0,0 +1,273 @@
+"""
+Prometheus metrics
+
+A small in-process registry of counters and histograms rendered in the
+Prometheus text format at /metrics. Under gunicorn each worker has its own
+registry, so with METRICS_DIR set every worker writes a snapshot of its
+metrics to <METRICS_DIR>/metrics_<pid>_<nonce>.json every
+METRICS_FLUSH_INTERVAL seconds (and at exit), and /metrics adds up the
+snapshots of all workers. Files of exited workers are kept so their counts
+stay in the totals; point METRICS_DIR at a directory that is emptied on
+deploy.
+
+Recorded here:
+- pinyimage_http_request_duration_seconds{route,method,status}
+- pinyimage_upstream_request_duration_seconds{provider,operation,outcome}
+- pinyimage_lookup_tier_total{tier,outcome}: character info served by, or
+  failed in, each fallback tier (openai, local, fallback)
+- pinyimage_db_query_duration_seconds{operation}
+- pinyimage_cache_lookups_total{cache,result}: hit ratios are
+  hits / (hits + misses) in PromQL
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metrics:
+    """Counters and histograms for this process, plus the /metrics exposition"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self.directory: Optional[str] = None
+        self.flush_interval = 15.0
+        self._snapshot_path: Optional[str] = None
+
+        self.describe('pinyimage_http_request_duration_seconds', 'histogram', 'Flask and aiohttp request latency by route')
+        self.describe('pinyimage_upstream_request_duration_seconds', 'histogram', 'Upstream API call latency')
+        self.describe('pinyimage_lookup_tier_total', 'counter', 'Character info lookups by fallback tier and outcome')
+        self.describe('pinyimage_db_query_duration_seconds', 'histogram', 'Database statement latency', DB_BUCKETS)
+        self.describe('pinyimage_cache_lookups_total', 'counter', 'In-process cache lookups by result')
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._help[name] = (kind, help_text)
+        if kind == 'histogram':
+            self._buckets[name] = tuple(buckets)
+
+    def init_app(self, app):
+        """Time Flask routes and DB statements; enable multi-process snapshots when METRICS_DIR is set"""
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+        directory = app.config.get('METRICS_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.directory = directory
+            self._start_process()
+            # Workers forked from a preloaded app get their own file and flusher
+            os.register_at_fork(after_in_child=self._after_fork)
+
+        from flask import g, request
+
+        @app.before_request
+        def _start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.observe('pinyimage_http_request_duration_seconds', time.perf_counter() - started,
+                             route=route, method=request.method, status=response.status_code)
+            return response
+
+    def instrument_engine(self, engine):
+        """Record the duration of every statement run on a SQLAlchemy engine"""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info['metrics_started'].pop()
+            operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'other'
+            if operation not in ('select', 'insert', 'update', 'delete', 'with'):
+                operation = 'other'
+            self.observe('pinyimage_db_query_duration_seconds', time.perf_counter() - started, operation=operation)
+
+        @event.listens_for(engine, 'handle_error')
+        def _failed(context):
+            # after_cursor_execute never fires for a failed statement
+            if context.connection is not None:
+                context.connection.info.pop('metrics_started', None)
+
+    def register_collector(self, collect: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """
+        Add a source of counter values read at snapshot time
+
+        collect returns (metric name, labels, cumulative value) triples, e.g.
+        from an existing stats() method.
+        """
+        self._collectors.append(collect)
+
+    # Recording
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._buckets[name]
+        key = (name, _labels(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 2)
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Observe the duration of a block; outcome="error" is added if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - started, outcome='error', **labels)
+            raise
+        self.observe(name, time.perf_counter() - started, outcome='ok', **labels)
+
+    # Exposition
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's metrics in a JSON-friendly form"""
+        counters = {}
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    counters[(name, _labels(labels))] = value
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        with self._lock:
+            counters.update(self._counters)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(labels), series] for (name, labels), series in histograms.items()],
+        }
+
+    def render(self) -> str:
+        """Prometheus text exposition, summed over all worker snapshots"""
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, series in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                expected = len(self._buckets[name]) + 2 if name in self._buckets else len(histograms.get(key, series))
+                if len(series) != expected:
+                    # Written with other buckets (e.g. by a worker from an older deploy)
+                    logger.warning(f"Skipping {name} series with mismatched buckets")
+                elif key in histograms:
+                    histograms[key] = [a + b for a, b in zip(histograms[key], series)]
+                else:
+                    histograms[key] = list(series)
+
+        lines = []
+        for name in sorted({name for name, _ in counters} | {name for name, _ in histograms}):
+            kind, help_text = self._help.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (metric, labels), series in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                bounds = [repr(float(bound)) for bound in self._buckets.get(name, ())] + ['+Inf']
+                for bound, count in zip(bounds, series[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Write this process's snapshot for the other workers to read"""
+        if not self._snapshot_path:
+            return
+        tmp = f"{self._snapshot_path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self._snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {self._snapshot_path}: {e}")
+
+    def reset(self):
+        """Drop recorded values (collectors and descriptions are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {filename}: {e}")
+        return snapshots
+
+    def _start_process(self):
+        self._snapshot_path = os.path.join(self.directory, f"metrics_{os.getpid()}_{uuid.uuid4().hex[:8]}.json")
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        self._flusher = threading.Thread(target=run, name='pinyimage-metrics', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _after_fork(self):
+        # Values recorded before the fork belong to the parent
+        self._lock = threading.Lock()
+        self.reset()
+        self._start_process()
+
+metrics = Metrics()
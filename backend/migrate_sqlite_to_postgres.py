@@ -2,143 +2,323 @@
 """
 Migration script to transfer data from SQLite to PostgreSQL
 Run this after setting up PostgreSQL database
+
+Cards are streamed in id order: each batch is read from SQLite, bulk
+inserted (COPY on PostgreSQL, executemany elsewhere) and committed together
+with a checkpoint row in the target database. An interrupted run picks up
+after the last committed batch; pass --restart to start over.
+
+The target schema is created with the Alembic migrations (so the database
+is stamped at head), and the derived pinyin columns and search documents
+are filled for the copied cards at the end.
+
+Usage:
+    python migrate_sqlite_to_postgres.py [--sqlite database.db] [--batch-size 5000]
 """
 
+import io
+import csv
 import sqlite3
 import os
 import sys
+import time
+import argparse
 from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Add the backend directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from models import db, User, Card
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func, select
+
+from models import User, Card
 from config import config
+from card_pinyin import fill_missing
+from card_search import index_unindexed
 
 load_dotenv()
 
-def migrate_sqlite_to_postgres():
+DEFAULT_BATCH_SIZE = 5000
+CHECKPOINT_NAME = 'sqlite_cards'
+DEFAULT_USER_EMAIL = 'default@pinyimage.com'
+
+# Kept apart from the app's models: it only exists in databases this script
+# has migrated into
+checkpoint_metadata = MetaData()
+migration_checkpoints = Table(
+    'migration_checkpoints', checkpoint_metadata,
+    Column('name', String(64), primary_key=True),
+    Column('last_id', Integer, nullable=False),
+    Column('rows_migrated', Integer, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CARD_COLUMNS = ('user_id', 'title', 'pinyin', 'meaning', 'con', 'created_at', 'updated_at')
+
+def default_database_url() -> str:
+    app_config = config['production'] if os.getenv('FLASK_ENV') == 'production' else config['development']
+    return app_config.SQLALCHEMY_DATABASE_URI
+
+def read_batches(sqlite_conn: sqlite3.Connection, after_id: int, batch_size: int) -> Iterator[List[Tuple]]:
+    """
+    Yield cards from SQLite in id order, batch_size rows at a time
+
+    Each batch is a keyset query on id, so memory stays bounded by one batch
+    whatever the table size.
+    """
+    while True:
+        rows = sqlite_conn.execute(
+            'SELECT id, title, pinyin, meaning, con, created FROM cards WHERE id > ? ORDER BY id LIMIT ?',
+            (after_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def parse_created(value: Any) -> datetime:
+    """Parse a SQLite created timestamp, falling back to now"""
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+def convert_rows(rows: List[Tuple], user_id: int) -> List[Dict[str, Any]]:
+    """Map SQLite card rows to cards table values"""
+    converted = []
+    for _, title, pinyin_text, meaning, con, created in rows:
+        created_at = parse_created(created)
+        converted.append({
+            'user_id': user_id,
+            'title': title,
+            'pinyin': pinyin_text,
+            'meaning': meaning,
+            'con': con,
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+    return converted
+
+def copy_buffer(cards: List[Dict[str, Any]]) -> io.StringIO:
+    """CSV payload for COPY cards (...) FROM STDIN WITH (FORMAT csv)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for card in cards:
+        writer.writerow([card[column].isoformat() if isinstance(card[column], datetime) else card[column]
+                         for column in CARD_COLUMNS])
+    buffer.seek(0)
+    return buffer
+
+def load_checkpoint(engine) -> Tuple[int, int]:
+    """Return (last migrated SQLite id, rows migrated so far)"""
+    with engine.connect() as conn:
+        row = conn.execute(select(migration_checkpoints.c.last_id, migration_checkpoints.c.rows_migrated)
+                           .where(migration_checkpoints.c.name == CHECKPOINT_NAME)).first()
+    return (row.last_id, row.rows_migrated) if row else (0, 0)
+
+POSTGRES_SAVE_CHECKPOINT = (
+    'INSERT INTO migration_checkpoints (name, last_id, rows_migrated, updated_at) '
+    'VALUES (%s, %s, %s, %s) ON CONFLICT (name) DO UPDATE SET '
+    'last_id = EXCLUDED.last_id, rows_migrated = EXCLUDED.rows_migrated, updated_at = EXCLUDED.updated_at'
+)
+
+def write_batch(engine, cards: List[Dict[str, Any]], last_id: int, rows_migrated: int):
+    """Insert one batch and advance the checkpoint in a single transaction"""
+    checkpoint = {'name': CHECKPOINT_NAME, 'last_id': last_id,
+                  'rows_migrated': rows_migrated, 'updated_at': datetime.utcnow()}
+    if engine.dialect.name == 'postgresql':
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.copy_expert(f"COPY cards ({', '.join(CARD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                               copy_buffer(cards))
+            cursor.execute(POSTGRES_SAVE_CHECKPOINT, tuple(checkpoint.values()))
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+        return
+
+    with engine.begin() as conn:
+        conn.execute(Card.__table__.insert(), cards)
+        conn.execute(migration_checkpoints.delete().where(migration_checkpoints.c.name == CHECKPOINT_NAME))
+        conn.execute(migration_checkpoints.insert(), [checkpoint])
+
+def ensure_default_user(engine) -> int:
+    """Id of the user migrated cards are assigned to, creating it if needed"""
+    users = User.__table__
+    with engine.begin() as conn:
+        user_id = conn.execute(select(users.c.id).where(users.c.email == DEFAULT_USER_EMAIL)).scalar()
+        if user_id is None:
+            user_id = conn.execute(users.insert().values(
+                username='default_user',
+                email=DEFAULT_USER_EMAIL,
+                password_hash='migrated_user_no_password',
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )).inserted_primary_key[0]
+    return user_id
+
+def upgrade_schema(database_url: str):
+    """Run the Alembic migrations against the target database (alembic upgrade head)"""
+    alembic_config = AlembicConfig(os.path.join(BACKEND_DIR, 'alembic.ini'))
+    alembic_config.set_main_option('script_location', os.path.join(BACKEND_DIR, 'migrations'))
+    alembic_config.set_main_option('sqlalchemy.url', database_url)
+    command.upgrade(alembic_config, 'head')
+
+def fill_derived(engine, batch_size: int) -> Dict[str, int]:
+    """
+    Fill the pinyin columns and search documents of the copied cards
+
+    The bulk insert bypasses the ORM hooks that maintain them. Each batch is
+    committed on its own, so an interrupted run resumes where it stopped.
+
+    Returns:
+        Cards updated per derived form
+    """
+    counts = {}
+    for name, fill in (('pinyin forms', fill_missing), ('search documents', index_unindexed)):
+        counts[name] = 0
+        while True:
+            with engine.begin() as conn:
+                count = fill(conn, batch_size)
+            if not count:
+                break
+            counts[name] += count
+    return counts
+
+def migrate_sqlite_to_postgres(sqlite_path: str = 'database.db', database_url: Optional[str] = None,
+                               batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> bool:
     """Migrate data from SQLite to PostgreSQL"""
     print("🚀 Starting SQLite to PostgreSQL migration...")
-    
-    # Initialize database
-    app_config = config['production'] if os.getenv('FLASK_ENV') == 'production' else config['development']
-    db.init_app(None)  # We'll set the app later
-    
-    # Create tables
-    print("📋 Creating PostgreSQL tables...")
-    with db.engine.connect() as conn:
-        db.metadata.create_all(conn)
-    
-    # Connect to SQLite
-    sqlite_path = 'database.db'
+
     if not os.path.exists(sqlite_path):
         print(f"❌ SQLite database not found at {sqlite_path}")
         return False
-    
-    print("📖 Reading SQLite data...")
+
+    database_url = database_url or default_database_url()
+    engine = create_engine(database_url)
+
+    # Create tables
+    print(f"📋 Migrating the {engine.dialect.name} schema to head...")
+    upgrade_schema(database_url)
+    checkpoint_metadata.create_all(engine)
+
     sqlite_conn = sqlite3.connect(sqlite_path)
-    sqlite_cursor = sqlite_conn.cursor()
-    
+
     try:
+        if restart:
+            with engine.begin() as conn:
+                conn.execute(migration_checkpoints.delete().where(migration_checkpoints.c.name == CHECKPOINT_NAME))
+        last_id, migrated_count = load_checkpoint(engine)
+        if last_id:
+            print(f"↩️  Resuming after SQLite card {last_id} ({migrated_count} cards already migrated)")
+
         # Create default user
         print("👤 Creating default user...")
-        default_user = User(
-            username='default_user',
-            email='default@pinyimage.com',
-            password_hash='migrated_user_no_password'
-        )
-        db.session.add(default_user)
-        db.session.commit()
-        
-        # Migrate cards
-        print("🃏 Migrating cards...")
-        sqlite_cursor.execute('SELECT title, pinyin, meaning, con, created FROM cards')
-        cards_data = sqlite_cursor.fetchall()
-        
-        migrated_count = 0
-        for card_data in cards_data:
-            try:
-                # Parse created date
-                created_date = None
-                if card_data[4]:  # created field
-                    try:
-                        created_date = datetime.fromisoformat(card_data[4])
-                    except:
-                        created_date = datetime.utcnow()
-                
-                card = Card(
-                    user_id=default_user.id,
-                    title=card_data[0],  # title
-                    pinyin=card_data[1],  # pinyin
-                    meaning=card_data[2],  # meaning
-                    con=card_data[3],      # con
-                    created_at=created_date or datetime.utcnow()
-                )
-                db.session.add(card)
-                migrated_count += 1
-                
-            except Exception as e:
-                print(f"⚠️  Error migrating card {card_data[0]}: {e}")
-                continue
-        
-        db.session.commit()
-        print(f"✅ Successfully migrated {migrated_count} cards")
-        
+        user_id = ensure_default_user(engine)
+
+        total = sqlite_conn.execute('SELECT COUNT(*) FROM cards').fetchone()[0]
+        remaining = sqlite_conn.execute('SELECT COUNT(*) FROM cards WHERE id > ?', (last_id,)).fetchone()[0]
+        print(f"🃏 Migrating {remaining} of {total} cards in batches of {batch_size}...")
+
+        started = time.monotonic()
+        done = 0
+        for rows in read_batches(sqlite_conn, last_id, batch_size):
+            migrated_count += len(rows)
+            write_batch(engine, convert_rows(rows, user_id), rows[-1][0], migrated_count)
+            done += len(rows)
+
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed else 0.0
+            eta = (remaining - done) / rate if rate else 0.0
+            print(f"   {migrated_count}/{total} cards ({done / remaining:.0%} of this run), "
+                  f"{rate:,.0f} rows/s, ETA {eta:.0f}s")
+
+        print(f"✅ Successfully migrated {done} cards in {time.monotonic() - started:.1f}s")
+
+        print("🔤 Filling pinyin forms and search documents...")
+        for name, count in fill_derived(engine, batch_size).items():
+            print(f"   {count} cards got {name}")
+
         # Verify migration
-        total_cards = Card.query.count()
-        print(f"📊 Total cards in PostgreSQL: {total_cards}")
-        
+        with engine.connect() as conn:
+            total_cards = conn.execute(select(func.count()).select_from(Card.__table__)).scalar()
+        print(f"📊 Total cards in {engine.dialect.name}: {total_cards}")
+
         return True
-        
+
     except Exception as e:
         print(f"❌ Migration failed: {e}")
-        db.session.rollback()
+        print("   Re-run the script to resume from the last completed batch")
         return False
-        
+
     finally:
         sqlite_conn.close()
+        engine.dispose()
 
-def verify_migration():
+def verify_migration(database_url: Optional[str] = None):
     """Verify that migration was successful"""
     print("🔍 Verifying migration...")
-    
+
+    engine = create_engine(database_url or default_database_url())
     try:
-        # Check user count
-        user_count = User.query.count()
-        print(f"👥 Users: {user_count}")
-        
-        # Check card count
-        card_count = Card.query.count()
-        print(f"🃏 Cards: {card_count}")
-        
-        # Show sample cards
-        sample_cards = Card.query.limit(3).all()
+        with engine.connect() as conn:
+            # Check user count
+            user_count = conn.execute(select(func.count()).select_from(User.__table__)).scalar()
+            print(f"👥 Users: {user_count}")
+
+            # Check card count
+            card_count = conn.execute(select(func.count()).select_from(Card.__table__)).scalar()
+            print(f"🃏 Cards: {card_count}")
+
+            # Show sample cards
+            cards = Card.__table__
+            sample_cards = conn.execute(select(cards.c.title, cards.c.pinyin, cards.c.meaning).limit(3)).all()
         print("📝 Sample cards:")
         for card in sample_cards:
             print(f"  - {card.title} ({card.pinyin}): {card.meaning[:50]}...")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"❌ Verification failed: {e}")
         return False
+    finally:
+        engine.dispose()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream cards from SQLite into PostgreSQL")
+    parser.add_argument('--sqlite', default='database.db', help="Source SQLite database")
+    parser.add_argument('--database-url', default=None, help="Target database (defaults to the app's)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Cards per batch")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
     print("🔄 PinyImage Database Migration Tool")
     print("=" * 40)
-    
+
     # Check environment
     env = os.getenv('FLASK_ENV', 'development')
     print(f"🌍 Environment: {env}")
-    
+
     # Run migration
-    success = migrate_sqlite_to_postgres()
-    
+    success = migrate_sqlite_to_postgres(args.sqlite, args.database_url, args.batch_size, args.restart)
+
     if success:
         print("\n✅ Migration completed successfully!")
-        verify_migration()
+        verify_migration(args.database_url)
     else:
         print("\n❌ Migration failed!")
         sys.exit(1)
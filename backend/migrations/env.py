@@ -0,0 +1,54 @@
+import os
+import sys
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config as app_configs
+from models import db
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = db.metadata
+
+def database_url() -> str:
+    """The app's database URL, resolved the way Flask-SQLAlchemy resolves it"""
+    url = config.get_main_option('sqlalchemy.url')
+    if url:
+        return url
+    env = os.getenv('FLASK_ENV', 'development')
+    url = app_configs.get(env, app_configs['default']).SQLALCHEMY_DATABASE_URI
+    # Relative SQLite paths live in the Flask instance folder
+    if url.startswith('sqlite:///') and not url.startswith('sqlite:////') and ':memory:' not in url:
+        instance = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance')
+        url = f"sqlite:///{os.path.join(instance, url[len('sqlite:///'):])}"
+    return url
+
+def run_migrations_offline():
+    context.configure(url=database_url(), target_metadata=target_metadata,
+                      literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    section = config.get_section(config.config_ini_section, {})
+    section['sqlalchemy.url'] = database_url()
+    connectable = engine_from_config(section, prefix='sqlalchemy.', poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        # SQLite needs batch mode to alter tables
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          render_as_batch=connection.dialect.name == 'sqlite')
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
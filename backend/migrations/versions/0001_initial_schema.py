@@ -0,0 +1,80 @@
+"""Initial schema
+
+Creates the tables the app previously made with db.create_all(). Tables
+that already exist are left alone, so databases created that way can be
+upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table):
+    return table not in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    if _missing('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(80), nullable=False, unique=True),
+            sa.Column('email', sa.String(120), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(255), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    if _missing('cards'):
+        op.create_table(
+            'cards',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('title', sa.String(10), nullable=False),
+            sa.Column('pinyin', sa.String(50), nullable=False),
+            sa.Column('meaning', sa.Text(), nullable=False),
+            sa.Column('con', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    if _missing('character_info_cache'):
+        op.create_table(
+            'character_info_cache',
+            sa.Column('character', sa.String(10), primary_key=True),
+            sa.Column('data', sa.Text(), nullable=False),
+            sa.Column('source', sa.String(20)),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+    if _missing('mnemonics'):
+        op.create_table(
+            'mnemonics',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('key', sa.String(64), nullable=False),
+            sa.Column('character', sa.String(10), nullable=False),
+            sa.Column('pinyin', sa.String(50), nullable=False),
+            sa.Column('meaning', sa.Text(), nullable=False),
+            sa.Column('text', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_mnemonics_key', 'mnemonics', ['key'])
+    if _missing('upstream_locks'):
+        op.create_table(
+            'upstream_locks',
+            sa.Column('name', sa.String(128), primary_key=True),
+            sa.Column('owner', sa.String(64), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+        )
+
+
+def downgrade():
+    for table in ('upstream_locks', 'mnemonics', 'character_info_cache', 'cards', 'users'):
+        op.drop_table(table)
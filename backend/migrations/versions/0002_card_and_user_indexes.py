@@ -0,0 +1,44 @@
+"""Index the hot card and user lookups
+
+/api/cards filters cards by user_id and pages on (created_at, id), so one
+composite index answers the filter, the order and the keyset cursor without
+a sort. Users are looked up by email on every authenticated request; the
+unique constraint already indexes it on databases created from models.py,
+so ix_users_email is only added where nothing covers the column.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _index_names(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _email_indexed():
+    inspector = sa.inspect(op.get_bind())
+    leading = [index['column_names'][:1] for index in inspector.get_indexes('users')]
+    leading += [constraint['column_names'][:1] for constraint in inspector.get_unique_constraints('users')]
+    return ['email'] in leading
+
+
+def upgrade():
+    if 'ix_cards_user_created_id' not in _index_names('cards'):
+        op.create_index('ix_cards_user_created_id', 'cards', ['user_id', 'created_at', 'id'])
+    if not _email_indexed():
+        op.create_index('ix_users_email', 'users', ['email'])
+
+
+def downgrade():
+    if 'ix_users_email' in _index_names('users'):
+        op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_cards_user_created_id', table_name='cards')
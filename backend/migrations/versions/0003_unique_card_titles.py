@@ -0,0 +1,41 @@
+"""Optionally allow each character only once per user
+
+Only applied when ENFORCE_UNIQUE_CARD_TITLES=true, since existing decks may
+already hold duplicates. If they do, the upgrade stops and reports how many
+(user, title) pairs need cleaning up first. To enable it on a database that
+is already at this revision:
+
+    alembic downgrade 0002 && ENFORCE_UNIQUE_CARD_TITLES=true alembic upgrade head
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if os.getenv('ENFORCE_UNIQUE_CARD_TITLES', 'false').lower() != 'true':
+        return
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT COUNT(*) FROM (SELECT user_id, title FROM cards '
+        'GROUP BY user_id, title HAVING COUNT(*) > 1) AS duplicates'
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(f"{duplicates} (user_id, title) pairs have duplicate cards; "
+                           "remove them before enforcing unique card titles")
+    op.create_index('uq_cards_user_title', 'cards', ['user_id', 'title'], unique=True)
+
+
+def downgrade():
+    if 'uq_cards_user_title' in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('cards')}:
+        op.drop_index('uq_cards_user_title', table_name='cards')
@@ -0,0 +1,30 @@
+"""Per-user card collection versions
+
+/api/cards answers If-None-Match from this table alone. Existing users get
+their row on the next card change; until then their version is 0.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'card_collection_versions' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'card_collection_versions',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table('card_collection_versions')
@@ -0,0 +1,135 @@
+"""Card search index
+
+Normalized pinyin/title documents and their 1-3 character grams, used by
+/api/cards/search. Existing cards are indexed during the upgrade.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+cards = sa.table('cards', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                 sa.column('title', sa.String), sa.column('pinyin', sa.String))
+documents = sa.table('card_search_documents', sa.column('card_id', sa.Integer), sa.column('user_id', sa.Integer),
+                     sa.column('document', sa.Text))
+search_grams = sa.table('card_search_grams', sa.column('user_id', sa.Integer), sa.column('gram', sa.String),
+                        sa.column('card_id', sa.Integer))
+
+# Frozen copy of the search document normalization as of this revision
+# (card_search.search_forms and pinyin_forms.derived_forms), so the backfill
+# does not change when the app's normalization does
+_MARKED_VOWELS = {
+    marked: (vowel, tone)
+    for vowel, marks in {'a': 'āáǎà', 'e': 'ēéěè', 'i': 'īíǐì', 'o': 'ōóǒò', 'u': 'ūúǔù', 'ü': 'ǖǘǚǜ'}.items()
+    for tone, marked in enumerate(marks, start=1)
+}
+_MARKED_VOWELS.update({breve: (vowel, 3) for vowel, breve in zip('aeiou', 'ăĕĭŏŭ')})
+_MARKED_VOWELS.update({marked.upper(): (vowel.upper(), tone) for marked, (vowel, tone) in list(_MARKED_VOWELS.items())})
+_ASCII_VOWEL = {'ü': 'v', 'Ü': 'V'}
+_TONELESS = str.maketrans({**{marked: _ASCII_VOWEL.get(vowel, vowel) for marked, (vowel, _) in _MARKED_VOWELS.items()},
+                           **_ASCII_VOWEL})
+_SYLLABLE = re.compile(r"([^\W\d_]+)([1-5]?)")
+_INITIALS = r'(?:zh|ch|sh|[bpmfdtnlgkhjqxrzcsyw])?'
+_FINALS = ('iang', 'iong', 'uang', 'ang', 'eng', 'ing', 'ong', 'uai', 'iao', 'ian', 'uan', 'van',
+           'ai', 'ei', 'ao', 'ou', 'an', 'en', 'in', 'un', 'vn', 'ia', 'ie', 'iu', 'ua', 'uo', 'ui',
+           've', 'ue', 'er', 'a', 'o', 'e', 'i', 'u', 'v', 'ng', 'm', 'n')
+_PINYIN_SYLLABLE = re.compile(_INITIALS + '(?:' + '|'.join(_FINALS) + ')')
+_PINYIN_WORD = re.compile('(?:' + _PINYIN_SYLLABLE.pattern + ')+')
+_NOT_SEARCHABLE = re.compile(r'[\W_]+')
+
+
+def _split_syllables(word):
+    word = unicodedata.normalize('NFC', word)
+    toneless = word.translate(_TONELESS).lower()
+    if not _PINYIN_WORD.fullmatch(toneless):
+        return [word]
+    return [word[m.start():m.end()] for m in _PINYIN_SYLLABLE.finditer(toneless)]
+
+
+def _numbered(text):
+    def number(match):
+        word, tone = match.groups()
+        if tone:
+            return word.translate(_TONELESS).lower() + tone
+        return ' '.join(
+            syllable.translate(_TONELESS).lower()
+            + next((str(_MARKED_VOWELS[ch][1]) for ch in syllable if ch in _MARKED_VOWELS), '5')
+            for syllable in _split_syllables(word)
+        )
+
+    text = unicodedata.normalize('NFC', text).replace('u:', 'ü').replace('U:', 'Ü')
+    return _SYLLABLE.sub(number, text)
+
+
+def _search_forms(title, pinyin):
+    numbered = ''.join(re.findall(r'[a-z]+[1-5]', _numbered(pinyin or '')))
+    title = _NOT_SEARCHABLE.sub('', unicodedata.normalize('NFC', title or '').lower())
+    forms = [re.sub(r'[1-5]', '', numbered), numbered, title]
+    return [form for form in dict.fromkeys(forms) if form]
+
+
+def _grams(forms):
+    found = set()
+    for form in forms:
+        for size in range(1, 4):
+            found.update(form[i:i + size] for i in range(len(form) - size + 1))
+    return found
+
+
+def _index_unindexed(connection):
+    rows = connection.execute(
+        sa.select(cards.c.id, cards.c.user_id, cards.c.title, cards.c.pinyin)
+        .select_from(cards.outerjoin(documents, documents.c.card_id == cards.c.id))
+        .where(documents.c.card_id.is_(None))
+        .order_by(cards.c.id).limit(BATCH_SIZE)).all()
+    if not rows:
+        return 0
+    document_rows, gram_rows = [], []
+    for card_id, user_id, title, pinyin in rows:
+        forms = _search_forms(title, pinyin)
+        document_rows.append({'card_id': card_id, 'user_id': user_id, 'document': '|'.join(forms)})
+        gram_rows.extend({'user_id': user_id, 'gram': gram, 'card_id': card_id} for gram in _grams(forms))
+    op.bulk_insert(documents, document_rows)
+    if gram_rows:
+        op.bulk_insert(search_grams, gram_rows)
+    return len(rows)
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'card_search_documents' not in tables:
+        op.create_table(
+            'card_search_documents',
+            sa.Column('card_id', sa.Integer(), sa.ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('document', sa.Text(), nullable=False),
+        )
+    if 'card_search_grams' not in tables:
+        op.create_table(
+            'card_search_grams',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('gram', sa.String(3), primary_key=True),
+            sa.Column('card_id', sa.Integer(), sa.ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True),
+        )
+        op.create_index('ix_card_search_grams_card_id', 'card_search_grams', ['card_id'])
+    while _index_unindexed(op.get_bind()):
+        pass
+
+
+def downgrade():
+    op.drop_index('ix_card_search_grams_card_id', table_name='card_search_grams')
+    op.drop_table('card_search_grams')
+    op.drop_table('card_search_documents')
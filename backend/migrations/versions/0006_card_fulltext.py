@@ -0,0 +1,64 @@
+"""Full-text search over card meanings and mnemonics
+
+FTS5 table plus triggers on SQLite, generated tsvector column with a GIN
+index on PostgreSQL. Existing cards are indexed during the upgrade.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS card_fts USING fts5(meaning, con, owner, tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_insert AFTER INSERT ON cards BEGIN
+        INSERT INTO card_fts (rowid, meaning, con, owner) VALUES (new.id, new.meaning, new.con, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_delete AFTER DELETE ON cards BEGIN
+        DELETE FROM card_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS card_fts_update AFTER UPDATE OF meaning, con, user_id ON cards BEGIN
+        DELETE FROM card_fts WHERE rowid = old.id;
+        INSERT INTO card_fts (rowid, meaning, con, owner) VALUES (new.id, new.meaning, new.con, 'u' || new.user_id);
+    END""",
+    """INSERT INTO card_fts (rowid, meaning, con, owner)
+        SELECT id, meaning, con, 'u' || user_id FROM cards WHERE id NOT IN (SELECT rowid FROM card_fts)""",
+]
+
+POSTGRESQL_UPGRADE = [
+    """ALTER TABLE cards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(meaning, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(con, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_cards_search_vector ON cards USING GIN (search_vector)",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS card_fts_insert",
+    "DROP TRIGGER IF EXISTS card_fts_delete",
+    "DROP TRIGGER IF EXISTS card_fts_update",
+    "DROP TABLE IF EXISTS card_fts",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_cards_search_vector",
+    "ALTER TABLE cards DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRESQL_UPGRADE}.get(dialect, []):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRESQL_DOWNGRADE}.get(dialect, []):
+        op.execute(statement)
@@ -0,0 +1,115 @@
+"""Normalized pinyin columns on cards
+
+Adds pinyin_toneless, pinyin_numbered and pinyin_syllables with the
+(user_id, pinyin_toneless, pinyin_numbered, id) index. Existing rows are
+filled during the upgrade.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+cards = sa.table('cards', sa.column('id', sa.Integer), sa.column('pinyin', sa.String),
+                 sa.column('pinyin_toneless', sa.String), sa.column('pinyin_numbered', sa.String),
+                 sa.column('pinyin_syllables', sa.SmallInteger))
+
+# Frozen copy of pinyin_forms.derived_forms as of this revision, so the
+# backfill does not change when the app's normalization does
+_MARKED_VOWELS = {
+    marked: (vowel, tone)
+    for vowel, marks in {'a': 'āáǎà', 'e': 'ēéěè', 'i': 'īíǐì', 'o': 'ōóǒò', 'u': 'ūúǔù', 'ü': 'ǖǘǚǜ'}.items()
+    for tone, marked in enumerate(marks, start=1)
+}
+_MARKED_VOWELS.update({breve: (vowel, 3) for vowel, breve in zip('aeiou', 'ăĕĭŏŭ')})
+_MARKED_VOWELS.update({marked.upper(): (vowel.upper(), tone) for marked, (vowel, tone) in list(_MARKED_VOWELS.items())})
+_ASCII_VOWEL = {'ü': 'v', 'Ü': 'V'}
+_TONELESS = str.maketrans({**{marked: _ASCII_VOWEL.get(vowel, vowel) for marked, (vowel, _) in _MARKED_VOWELS.items()},
+                           **_ASCII_VOWEL})
+_SYLLABLE = re.compile(r"([^\W\d_]+)([1-5]?)")
+_INITIALS = r'(?:zh|ch|sh|[bpmfdtnlgkhjqxrzcsyw])?'
+_FINALS = ('iang', 'iong', 'uang', 'ang', 'eng', 'ing', 'ong', 'uai', 'iao', 'ian', 'uan', 'van',
+           'ai', 'ei', 'ao', 'ou', 'an', 'en', 'in', 'un', 'vn', 'ia', 'ie', 'iu', 'ua', 'uo', 'ui',
+           've', 'ue', 'er', 'a', 'o', 'e', 'i', 'u', 'v', 'ng', 'm', 'n')
+_PINYIN_SYLLABLE = re.compile(_INITIALS + '(?:' + '|'.join(_FINALS) + ')')
+_PINYIN_WORD = re.compile('(?:' + _PINYIN_SYLLABLE.pattern + ')+')
+
+
+def _split_syllables(word):
+    word = unicodedata.normalize('NFC', word)
+    toneless = word.translate(_TONELESS).lower()
+    if not _PINYIN_WORD.fullmatch(toneless):
+        return [word]
+    return [word[m.start():m.end()] for m in _PINYIN_SYLLABLE.finditer(toneless)]
+
+
+def _numbered(text):
+    def number(match):
+        word, tone = match.groups()
+        if tone:
+            return word.translate(_TONELESS).lower() + tone
+        return ' '.join(
+            syllable.translate(_TONELESS).lower()
+            + next((str(_MARKED_VOWELS[ch][1]) for ch in syllable if ch in _MARKED_VOWELS), '5')
+            for syllable in _split_syllables(word)
+        )
+
+    text = unicodedata.normalize('NFC', text).replace('u:', 'ü').replace('U:', 'Ü')
+    return _SYLLABLE.sub(number, text)
+
+
+def _derived_forms(text):
+    syllables = re.findall(r'[a-z]+[1-5]', _numbered(text))
+    numbered = ''.join(syllables)
+    return re.sub(r'[1-5]', '', numbered), numbered, len(syllables)
+
+
+def _fill_missing(connection):
+    rows = connection.execute(
+        sa.select(cards.c.id, cards.c.pinyin).where(cards.c.pinyin_numbered.is_(None))
+        .order_by(cards.c.id).limit(BATCH_SIZE)).all()
+    if not rows:
+        return 0
+    params = []
+    for card_id, pinyin in rows:
+        toneless, numbered, syllables = _derived_forms(pinyin or '')
+        params.append({'card_id': card_id, 'toneless': toneless, 'numbered': numbered, 'syllables': syllables})
+    connection.execute(
+        cards.update().where(cards.c.id == sa.bindparam('card_id')).values(
+            pinyin_toneless=sa.bindparam('toneless'),
+            pinyin_numbered=sa.bindparam('numbered'),
+            pinyin_syllables=sa.bindparam('syllables')),
+        params)
+    return len(rows)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('cards')}
+    for column in (sa.Column('pinyin_toneless', sa.String(100)),
+                   sa.Column('pinyin_numbered', sa.String(120)),
+                   sa.Column('pinyin_syllables', sa.SmallInteger())):
+        if column.name not in existing:
+            op.add_column('cards', column)
+    if 'ix_cards_user_pinyin' not in {index['name'] for index in inspector.get_indexes('cards')}:
+        op.create_index('ix_cards_user_pinyin', 'cards', ['user_id', 'pinyin_toneless', 'pinyin_numbered', 'id'])
+    while _fill_missing(op.get_bind()):
+        pass
+
+
+def downgrade():
+    op.drop_index('ix_cards_user_pinyin', table_name='cards')
+    for name in ('pinyin_syllables', 'pinyin_numbered', 'pinyin_toneless'):
+        op.drop_column('cards', name)
@@ -0,0 +1,185 @@
+import random
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Callable, List, Optional
+
+from flask import has_app_context
+
+import background
+from cache import TTLCache, MISS
+from models import db, Mnemonic
+from singleflight import coalesce
+
+logger = logging.getLogger(__name__)
+
+def normalize_key(character: str, pinyin: str, meaning: str) -> str:
+    """
+    Build the pool key for a (character, pinyin, meaning) triple
+
+    Whitespace, case and Unicode composition differences are ignored, so
+    "Shuǐ " and "shuǐ" share a pool.
+    """
+    parts = []
+    for part in (character, pinyin, meaning):
+        part = unicodedata.normalize('NFC', part or '')
+        parts.append(' '.join(part.lower().split()))
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+class MnemonicStore:
+    """
+    Pool of generated mnemonics per (character, pinyin, meaning)
+
+    Lookups return a random stored variant. A new one is generated
+    synchronously only when the pool is empty or the caller asks for a fresh
+    mnemonic; a pool that is merely below its target size is topped up in
+    the background. Pools never hold more than pool_size variants: adding
+    to a full pool replaces its oldest variant, in memory and in the database.
+    """
+
+    def __init__(self, pool_size: int = 5, maxsize: int = 2048, ttl: float = 3600):
+        self.pool_size = pool_size
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._topping_up = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "generated": 0}
+
+    def init_app(self, app):
+        """Apply pool sizing from the Flask config"""
+        self.pool_size = app.config.get('MNEMONIC_POOL_SIZE', self.pool_size)
+
+    def get(self, character: str, pinyin: str, meaning: str,
+            generator: Callable[[str, str, str], Optional[str]], fresh: bool = False) -> Optional[str]:
+        """
+        Return a mnemonic for the triple
+
+        Args:
+            character: The Chinese character
+            pinyin: The pinyin pronunciation
+            meaning: The English meaning
+            generator: Called with (character, pinyin, meaning) to create a new variant
+            fresh: Always generate (and store) a new variant, replacing the
+                oldest one when the pool is full
+
+        Returns:
+            Mnemonic text or None if nothing is stored and generation failed
+        """
+        key = normalize_key(character, pinyin, meaning)
+        pool = self._pool(key)
+
+        if not pool and not fresh:
+            # Identical first lookups share one generation; fresh requests
+            # each want their own variant and are not coalesced
+            self._count("misses")
+            return coalesce(f"mnemonic:{key}",
+                            lambda: self._generate(key, character, pinyin, meaning, generator),
+                            lambda: self._persisted_choice(key))
+
+        if fresh:
+            self._count("misses")
+            text = self._generate(key, character, pinyin, meaning, generator)
+            return text or (random.choice(pool) if pool else None)
+
+        self._count("hits")
+        if len(pool) < self.pool_size:
+            self._schedule_top_up(key, character, pinyin, meaning, generator)
+        return random.choice(pool)
+
+    def add(self, character: str, pinyin: str, meaning: str, text: Optional[str]):
+        """Store a mnemonic generated elsewhere (e.g. by a combined lookup)"""
+        self._add(normalize_key(character, pinyin, meaning), character, pinyin, meaning, text)
+
+    def stored_choice(self, character: str, pinyin: str, meaning: str) -> Optional[str]:
+        """A persisted variant (possibly written by another worker), or None"""
+        return self._persisted_choice(normalize_key(character, pinyin, meaning))
+
+    def variants(self, character: str, pinyin: str, meaning: str) -> List[str]:
+        return list(self._pool(normalize_key(character, pinyin, meaning)))
+
+    def clear(self):
+        """Drop the in-process layer (persisted variants are kept)"""
+        self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pools_cached"] = len(self._memory)
+        stats["pool_size"] = self.pool_size
+        return stats
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _pool(self, key: str) -> List[str]:
+        pool, state = self._memory.get(key)
+        if state != MISS:
+            return pool
+        pool = self._load_persisted(key)
+        if pool:
+            self._memory.set(key, pool)
+        return pool
+
+    def _add(self, key: str, character: str, pinyin: str, meaning: str, text: Optional[str]):
+        if not text:
+            return
+        self._count("generated")
+        limit = max(self.pool_size, 1)
+        pool = (list(self._pool(key)) + [text])[-limit:]
+        self._memory.set(key, pool)
+        if not has_app_context():
+            return
+        try:
+            db.session.add(Mnemonic(key=key, character=character, pinyin=pinyin or '', meaning=meaning or '', text=text))
+            db.session.flush()
+            # Drop the oldest variants beyond the pool size (possibly added by other workers)
+            expired = [row.id for row in db.session.query(Mnemonic.id).filter_by(key=key)
+                       .order_by(Mnemonic.id.desc()).offset(limit)]
+            if expired:
+                db.session.query(Mnemonic).filter(Mnemonic.id.in_(expired)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Mnemonic store write failed for {character}: {e}")
+            db.session.rollback()
+
+    def _generate(self, key: str, character: str, pinyin: str, meaning: str, generator: Callable) -> Optional[str]:
+        text = generator(character, pinyin, meaning)
+        self._add(key, character, pinyin, meaning, text)
+        return text
+
+    def _persisted_choice(self, key: str) -> Optional[str]:
+        pool = self._load_persisted(key)
+        return random.choice(pool) if pool else None
+
+    def _schedule_top_up(self, key: str, character: str, pinyin: str, meaning: str, generator: Callable):
+        with self._lock:
+            if key in self._topping_up:
+                return
+            self._topping_up.add(key)
+        try:
+            background.submit(self._top_up, key, character, pinyin, meaning, generator)
+        except Exception as e:
+            logger.warning(f"Could not schedule mnemonic top-up for {character}: {e}")
+            with self._lock:
+                self._topping_up.discard(key)
+
+    def _top_up(self, key: str, character: str, pinyin: str, meaning: str, generator: Callable):
+        try:
+            self._add(key, character, pinyin, meaning, generator(character, pinyin, meaning))
+        finally:
+            with self._lock:
+                self._topping_up.discard(key)
+
+    def _load_persisted(self, key: str) -> List[str]:
+        if not has_app_context():
+            return []
+        try:
+            rows = db.session.query(Mnemonic.text).filter_by(key=key).order_by(Mnemonic.id).all()
+            return [row.text for row in rows]
+        except Exception as e:
+            logger.warning(f"Mnemonic store read failed: {e}")
+            db.session.rollback()
+            return []
+
+mnemonic_store = MnemonicStore()
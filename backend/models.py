@@ -41,8 +41,24 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def created_display(created_at):
+    """Same text as strftime("%b %d, %I:%M %p") in the C locale, without the per-call parsing"""
+    if created_at is None:
+        return None
+    hour = created_at.hour % 12 or 12
+    return (f"{_MONTHS[created_at.month - 1]} {created_at.day:02d}, "
+            f"{hour:02d}:{created_at.minute:02d} {'PM' if created_at.hour >= 12 else 'AM'}")
+
 class Card(db.Model):
     __tablename__ = 'cards'
+    __table_args__ = (
+        # Serves /api/cards: filter by user, keyset pages on (created_at, id)
+        db.Index('ix_cards_user_created_id', 'user_id', 'created_at', 'id'),
+        # Pinyin-ordered listings and pinyin prefix filters
+        db.Index('ix_cards_user_pinyin', 'user_id', 'pinyin_toneless', 'pinyin_numbered', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -50,6 +66,10 @@ class Card(db.Model):
     pinyin = db.Column(db.String(50), nullable=False)
     meaning = db.Column(db.Text, nullable=False)
     con = db.Column(db.Text, nullable=False)  # mnemonic connection
+    # Derived from pinyin on every write (card_pinyin.py): "nihao", "ni3hao3", 2
+    pinyin_toneless = db.Column(db.String(100))
+    pinyin_numbered = db.Column(db.String(120))
+    pinyin_syllables = db.Column(db.SmallInteger)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -61,15 +81,6 @@ class Card(db.Model):
     
     def to_dict(self):
         """Convert card to dictionary for JSON response"""
-        from datetime import datetime
-        
-        # Format datetime for better display
-        if self.created_at:
-            # Format as "Aug 28, 3:45 PM" or similar
-            created_display = self.created_at.strftime("%b %d, %I:%M %p")
-        else:
-            created_display = None
-            
         return {
             'id': self.id,
             'title': self.title,
@@ -77,5 +88,77 @@ class Card(db.Model):
             'meaning': self.meaning,
             'con': self.con,
             'created': self.created_at.isoformat() if self.created_at else None,
-            'created_display': created_display
+            # Formatted as "Aug 28, 03:45 PM"
+            'created_display': created_display(self.created_at)
         }
+
+class CharacterInfo(db.Model):
+    __tablename__ = 'character_info_cache'
+    
+    character = db.Column(db.String(10), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # JSON-encoded character info
+    source = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CharacterInfo {self.character} from {self.source}>'
+
+class Mnemonic(db.Model):
+    __tablename__ = 'mnemonics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False, index=True)  # hash of normalized (character, pinyin, meaning)
+    character = db.Column(db.String(10), nullable=False)
+    pinyin = db.Column(db.String(50), nullable=False)
+    meaning = db.Column(db.Text, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Mnemonic {self.character} ({self.pinyin})>'
+
+class UpstreamLock(db.Model):
+    __tablename__ = 'upstream_locks'
+    
+    name = db.Column(db.String(128), primary_key=True)  # e.g. "info:水" or "mnemonic:<key>"
+    owner = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<UpstreamLock {self.name} held by {self.owner}>'
+
+class CardCollectionVersion(db.Model):
+    __tablename__ = 'card_collection_versions'
+    
+    # Bumped in the same transaction as every card insert, update and delete
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CardCollectionVersion {self.user_id} v{self.version}>'
+
+class CardSearchDocument(db.Model):
+    __tablename__ = 'card_search_documents'
+    
+    # Normalized search forms of one card, e.g. "nihao|ni3hao3|你好"
+    card_id = db.Column(db.Integer, db.ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    document = db.Column(db.Text, nullable=False)
+    
+    def __repr__(self):
+        return f'<CardSearchDocument {self.card_id} {self.document}>'
+
+class CardSearchGram(db.Model):
+    __tablename__ = 'card_search_grams'
+    __table_args__ = (
+        db.Index('ix_card_search_grams_card_id', 'card_id'),
+    )
+    
+    # Every 1-3 character substring of a card's search forms; the primary key is the lookup index
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    gram = db.Column(db.String(3), primary_key=True)
+    card_id = db.Column(db.Integer, db.ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
+    
+    def __repr__(self):
+        return f'<CardSearchGram {self.gram} -> {self.card_id}>'
@@ -1,10 +1,232 @@
 import openai
 import os
+import re
+import json
+import time
 import logging
+import threading
+from collections import Counter
 from typing import Optional, Dict, Any
 
+from circuit_breaker import CircuitOpenError, openai_breaker
+from metrics import metrics
+from profiling import phase
+
 logger = logging.getLogger(__name__)
 
+# Requests actually sent to OpenAI, by kind, for this process
+_upstream_calls = Counter()
+_upstream_calls_lock = threading.Lock()
+
+# Per-request timeout; without one the openai package waits up to 10 minutes
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 20))
+
+def record_upstream_call(kind: str):
+    with _upstream_calls_lock:
+        _upstream_calls[kind] += 1
+
+def upstream_call_counts() -> Dict[str, int]:
+    with _upstream_calls_lock:
+        return dict(_upstream_calls)
+
+# Expected fields of the combined character + mnemonic response
+CHARACTER_PROFILE_SCHEMA = {
+    "pinyin": str,
+    "meaning": str,
+    "radical": str,
+    "radical_meaning": str,
+    "stroke_count": int,
+    "mnemonic": str,
+}
+CHARACTER_PROFILE_REQUIRED = ("pinyin", "meaning", "mnemonic")
+
+def _close_truncated_json(text: str) -> str:
+    """Close any string, array or object left open by a truncated response"""
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r',\s*$', '', text.rstrip())
+    return text + ''.join(reversed(stack))
+
+def parse_json_response(content: str) -> Dict[str, Any]:
+    """
+    Parse a JSON object out of a model response, repairing common defects
+    
+    Handles markdown fences, prose around the object, smart quotes, trailing
+    commas and output cut off by max_tokens.
+    
+    Raises:
+        ValueError: If no JSON object can be recovered
+    """
+    text = content.strip()
+    text = re.sub(r'^```(?:json)?\s*', '', text)
+    text = re.sub(r'\s*```$', '', text)
+    
+    candidates = [text]
+    start = text.find('{')
+    if start != -1:
+        end = text.rfind('}')
+        candidates.append(text[start:end + 1] if end > start else text[start:])
+    
+    for candidate in candidates:
+        for attempt in (candidate, _repair_json(candidate), _close_truncated_json(_repair_json(candidate))):
+            try:
+                value = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                return value
+    raise ValueError("Response does not contain a JSON object")
+
+def _repair_json(text: str) -> str:
+    text = text.replace('\u201c', '"').replace('\u201d', '"')
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+    return text
+
+def validate_schema(data: Dict[str, Any], schema: Dict[str, type], required=()) -> Dict[str, Any]:
+    """
+    Coerce a parsed response to the expected field types
+    
+    Unknown fields are dropped. Values of the wrong type are converted where
+    that is unambiguous (e.g. "12 strokes" -> 12) and otherwise discarded.
+    
+    Raises:
+        ValueError: If a required field is missing or empty
+    """
+    clean = {}
+    for field, field_type in schema.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if field_type is int and not isinstance(value, int):
+            match = re.search(r'\d+', str(value))
+            value = int(match.group()) if match else None
+        elif field_type is str and not isinstance(value, str):
+            value = ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+        if value is not None:
+            clean[field] = value.strip() if isinstance(value, str) else value
+    
+    missing = [field for field in required if not clean.get(field)]
+    if missing:
+        raise ValueError(f"Response missing required fields: {', '.join(missing)}")
+    return clean
+
+def character_info_request(character: str) -> Dict[str, Any]:
+    """ChatCompletion arguments for a character info lookup"""
+    prompt = f"""Analyze the Chinese character "{character}" and provide the following information in JSON format:
+
+{{
+    "pinyin": "the pinyin pronunciation",
+    "meaning": "the English meaning/definition",
+    "radical": "the main radical component",
+    "radical_meaning": "what the radical means",
+    "stroke_count": "number of strokes",
+    "difficulty": "beginner/intermediate/advanced"
+}}
+
+Be accurate and concise. Only return valid JSON."""
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a Chinese language expert. Provide accurate information about Chinese characters in JSON format only."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 200,
+        "temperature": 0.3
+    }
+
+def parse_character_info(character: str, content: str) -> Optional[Dict[str, Any]]:
+    """Turn a character info completion into the service's info dictionary"""
+    try:
+        char_info = parse_json_response(content)
+    except ValueError as e:
+        logger.error(f"Failed to parse OpenAI response as JSON: {e}")
+        logger.error(f"Response content: {content}")
+        return None
+    
+    return {
+        "character": character,
+        "pinyin": char_info.get("pinyin", ""),
+        "meaning": char_info.get("meaning", ""),
+        "radical": char_info.get("radical", ""),
+        "radical_meaning": char_info.get("radical_meaning", ""),
+        "stroke_count": char_info.get("stroke_count", ""),
+        "difficulty": char_info.get("difficulty", "beginner"),
+        "source": "openai"
+    }
+
+def mnemonic_request(character: str, pinyin: str, meaning: str) -> Dict[str, Any]:
+    """ChatCompletion arguments for mnemonic generation"""
+    prompt = f"""You are a creative language learning assistant specializing in creating memorable mnemonics for Chinese characters. Create a memorable visual and auditory connection between the Chinese character {character} and its pronunciation "{pinyin}" and meaning "{meaning}"). 
+
+Focus on:
+1. Visual similarity between the character's appearance and familiar objects that could hint at its meaning or sound.
+2. Sound associations with the pinyin pronunciation
+3. Vivid mental images or simple situations that could help the learner remember the characters pronunciation and meaning after seeing it.
+
+Keep it to 2-3 sentences maximum. Make it creative and memorable for language learning."""
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a creative language learning assistant specializing in creating memorable mnemonics for Chinese characters."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 150,
+        "temperature": 0.8
+    }
+
+def character_profile_request(character: str) -> Dict[str, Any]:
+    """ChatCompletion arguments for the combined info + mnemonic lookup"""
+    prompt = f"""For the Chinese character "{character}" return one JSON object:
+
+{{
+    "pinyin": "pinyin with tone marks",
+    "meaning": "concise English meaning",
+    "radical": "main radical",
+    "radical_meaning": "what the radical means",
+    "stroke_count": number of strokes,
+    "mnemonic": "2-3 sentence memorable mnemonic"
+}}
+
+The mnemonic should link the character's shape to familiar objects, its sound to the pinyin, and both to the meaning in one vivid image. Only return valid JSON."""
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a Chinese language expert and creative mnemonic writer. Reply with JSON only."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 350,
+        "temperature": 0.7
+    }
+
+def parse_character_profile(character: str, content: str) -> Optional[Dict[str, Any]]:
+    """Validate a combined completion; returns info plus "mnemonic" or None"""
+    try:
+        profile = validate_schema(parse_json_response(content), CHARACTER_PROFILE_SCHEMA, CHARACTER_PROFILE_REQUIRED)
+    except ValueError as e:
+        logger.error(f"Invalid combined response for {character}: {e}")
+        logger.error(f"Response content: {content}")
+        return None
+    
+    profile.update({"character": character, "source": "openai"})
+    return profile
+
 class OpenAIService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
@@ -16,8 +238,32 @@ class OpenAIService:
             logger.warning("OpenAI API key not found")
     
     def is_available(self) -> bool:
-        """Check if OpenAI service is available"""
-        return self.client is not None
+        """Check if OpenAI service is configured and its circuit breaker lets calls through"""
+        return self.client is not None and openai_breaker.available()
+    
+    def _chat(self, kind: str, request: Dict[str, Any]) -> str:
+        """
+        Send a chat completion through the circuit breaker
+        
+        Args:
+            kind: Request kind for the upstream call counters
+            request: ChatCompletion.create keyword arguments
+            
+        Returns:
+            Message content of the first choice
+        """
+        if not openai_breaker.allow():
+            raise CircuitOpenError("OpenAI circuit breaker is open")
+        record_upstream_call(kind)
+        started = time.monotonic()
+        try:
+            with phase('upstream'), metrics.time('pinyimage_upstream_request_duration_seconds', provider='openai', operation=kind):
+                response = self.client.ChatCompletion.create(request_timeout=OPENAI_TIMEOUT, **request)
+        except Exception:
+            openai_breaker.record_failure()
+            raise
+        openai_breaker.record_success(time.monotonic() - started)
+        return response.choices[0].message.content.strip()
     
     def get_character_info(self, character: str) -> Optional[Dict[str, Any]]:
         """
@@ -33,58 +279,8 @@ class OpenAIService:
             return None
         
         try:
-            prompt = f"""Analyze the Chinese character "{character}" and provide the following information in JSON format:
-
-{{
-    "pinyin": "the pinyin pronunciation",
-    "meaning": "the English meaning/definition",
-    "radical": "the main radical component",
-    "radical_meaning": "what the radical means",
-    "stroke_count": "number of strokes",
-    "difficulty": "beginner/intermediate/advanced"
-}}
-
-Be accurate and concise. Only return valid JSON."""
-
-            response = self.client.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a Chinese language expert. Provide accurate information about Chinese characters in JSON format only."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.3
-            )
-            
-            # Parse the response
-            content = response.choices[0].message.content.strip()
-            
-            # Try to extract JSON from the response
-            import json
-            try:
-                # Remove any markdown formatting
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                
-                char_info = json.loads(content.strip())
-                
-                return {
-                    "character": character,
-                    "pinyin": char_info.get("pinyin", ""),
-                    "meaning": char_info.get("meaning", ""),
-                    "radical": char_info.get("radical", ""),
-                    "radical_meaning": char_info.get("radical_meaning", ""),
-                    "stroke_count": char_info.get("stroke_count", ""),
-                    "difficulty": char_info.get("difficulty", "beginner"),
-                    "source": "openai"
-                }
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse OpenAI response as JSON: {e}")
-                logger.error(f"Response content: {content}")
-                return None
+            content = self._chat("character_info", character_info_request(character))
+            return parse_character_info(character, content)
                 
         except Exception as e:
             logger.error(f"OpenAI character info request failed: {e}")
@@ -106,31 +302,37 @@ Be accurate and concise. Only return valid JSON."""
             return None
         
         try:
-            prompt = f"""You are a creative language learning assistant specializing in creating memorable mnemonics for Chinese characters. Create a memorable visual and auditory connection between the Chinese character {character} and its pronunciation "{pinyin}" and meaning "{meaning}"). 
-
-Focus on:
-1. Visual similarity between the character's appearance and familiar objects that could hint at its meaning or sound.
-2. Sound associations with the pinyin pronunciation
-3. Vivid mental images or simple situations that could help the learner remember the characters pronunciation and meaning after seeing it.
-
-Keep it to 2-3 sentences maximum. Make it creative and memorable for language learning."""
-
-            response = self.client.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a creative language learning assistant specializing in creating memorable mnemonics for Chinese characters."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.8
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._chat("mnemonic", mnemonic_request(character, pinyin, meaning))
             
         except Exception as e:
             logger.error(f"OpenAI mnemonic generation failed: {e}")
             return None
     
+    def get_character_profile(self, character: str) -> Optional[Dict[str, Any]]:
+        """
+        Get character information and a mnemonic from a single request
+        
+        Used for first-time lookups, where get_character_info and
+        generate_mnemonic would otherwise be two round trips repeating the
+        same context.
+        
+        Args:
+            character: Chinese character
+            
+        Returns:
+            Dictionary with character info plus "mnemonic", or None if failed
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            content = self._chat("character_profile", character_profile_request(character))
+            return parse_character_profile(character, content)
+            
+        except Exception as e:
+            logger.error(f"OpenAI combined character request failed: {e}")
+            return None
+    
     def get_character_analysis(self, character: str) -> Optional[Dict[str, Any]]:
         """
         Get comprehensive character analysis including breakdown and learning tips
@@ -162,31 +364,23 @@ Keep it to 2-3 sentences maximum. Make it creative and memorable for language le
 
 Be accurate and helpful for language learners."""
 
-            response = self.client.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            content = self._chat("character_analysis", {
+                "model": "gpt-3.5-turbo",
+                "messages": [
                     {"role": "system", "content": "You are a Chinese language teacher. Provide detailed character analysis in JSON format."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=300,
-                temperature=0.4
-            )
-            
-            content = response.choices[0].message.content.strip()
+                "max_tokens": 300,
+                "temperature": 0.4
+            })
             
             # Parse JSON response
-            import json
             try:
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                
-                analysis = json.loads(content.strip())
+                analysis = parse_json_response(content)
                 analysis["source"] = "openai"
                 return analysis
                 
-            except json.JSONDecodeError as e:
+            except ValueError as e:
                 logger.error(f"Failed to parse analysis response: {e}")
                 return None
                 
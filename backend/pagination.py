@@ -0,0 +1,41 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+def encode_cursor(created_at: datetime, card_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque URL-safe token"""
+    raw = f"{created_at.isoformat() if created_at else ''}|{card_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a token produced by encode_cursor
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created, card_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created), int(card_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def encode_pinyin_cursor(toneless: str, numbered: str, card_id: int) -> str:
+    """Encode a (pinyin_toneless, pinyin_numbered, id) keyset position for ?order=pinyin"""
+    raw = f"{toneless or ''}|{numbered or ''}|{card_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_pinyin_cursor(cursor: str) -> Tuple[str, str, int]:
+    """
+    Decode a token produced by encode_pinyin_cursor
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        toneless, numbered, card_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        return toneless, numbered, int(card_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
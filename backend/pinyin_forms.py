@@ -0,0 +1,127 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+# Tone-marked vowels indexed by tone number (1-4); tone 5/0 is unmarked
+TONE_MARKS = {
+    'a': 'āáǎà',
+    'e': 'ēéěè',
+    'i': 'īíǐì',
+    'o': 'ōóǒò',
+    'u': 'ūúǔù',
+    'ü': 'ǖǘǚǜ',
+}
+
+_NUMBERED_SYLLABLE = re.compile(r'([A-Za-züÜ:]+)([1-5])')
+
+def _mark_syllable(syllable: str, tone: int) -> str:
+    syllable = syllable.replace('u:', 'ü').replace('U:', 'Ü').replace('v', 'ü').replace('V', 'Ü')
+    if tone not in (1, 2, 3, 4):
+        return syllable
+    lower = syllable.lower()
+    # a and e always take the mark, o takes it in "ou", otherwise the last vowel does
+    for vowel in ('a', 'e'):
+        if vowel in lower:
+            index = lower.index(vowel)
+            break
+    else:
+        if 'ou' in lower:
+            index = lower.index('o')
+        else:
+            positions = [i for i, ch in enumerate(lower) if ch in TONE_MARKS]
+            if not positions:
+                return syllable
+            index = positions[-1]
+    marked = TONE_MARKS[lower[index]][tone - 1]
+    if syllable[index].isupper():
+        marked = marked.upper()
+    return syllable[:index] + marked + syllable[index + 1:]
+
+def numbered_to_marked(text: str) -> str:
+    """
+    Convert numbered-tone pinyin to tone marks
+
+    "shui3" -> "shuǐ", "lu:4 se4" -> "lǜ sè", "ma5" -> "ma"
+    """
+    return _NUMBERED_SYLLABLE.sub(lambda m: _mark_syllable(m.group(1), int(m.group(2))), text)
+
+# Tone-marked vowel -> (plain vowel, tone number)
+_MARKED_VOWELS = {
+    marked: (vowel, tone)
+    for vowel, marks in TONE_MARKS.items()
+    for tone, marked in enumerate(marks, start=1)
+}
+# Breves are a common stand-in for the third-tone caron
+_MARKED_VOWELS.update({breve: (vowel, 3) for vowel, breve in zip('aeiou', 'ăĕĭŏŭ')})
+_MARKED_VOWELS.update({marked.upper(): (vowel.upper(), tone) for marked, (vowel, tone) in list(_MARKED_VOWELS.items())})
+
+# One pass of str.translate strips every tone mark; ü becomes v, the usual ASCII spelling
+_ASCII_VOWEL = {'ü': 'v', 'Ü': 'V'}
+_TONELESS = str.maketrans({**{marked: _ASCII_VOWEL.get(vowel, vowel) for marked, (vowel, _) in _MARKED_VOWELS.items()},
+                           **_ASCII_VOWEL})
+
+_SYLLABLE = re.compile(r"([^\W\d_]+)([1-5]?)")
+
+# Toneless syllable shape (ü spelled v), used to split words like "nǐhǎo" into syllables
+_INITIALS = r'(?:zh|ch|sh|[bpmfdtnlgkhjqxrzcsyw])?'
+_FINALS = ('iang', 'iong', 'uang', 'ang', 'eng', 'ing', 'ong', 'uai', 'iao', 'ian', 'uan', 'van',
+           'ai', 'ei', 'ao', 'ou', 'an', 'en', 'in', 'un', 'vn', 'ia', 'ie', 'iu', 'ua', 'uo', 'ui',
+           've', 'ue', 'er', 'a', 'o', 'e', 'i', 'u', 'v', 'ng', 'm', 'n')
+_PINYIN_SYLLABLE = re.compile(_INITIALS + '(?:' + '|'.join(_FINALS) + ')')
+_PINYIN_WORD = re.compile('(?:' + _PINYIN_SYLLABLE.pattern + ')+')
+
+def split_syllables(word: str) -> List[str]:
+    """
+    Split an unspaced pinyin word into syllables
+
+    "nǐhǎo" -> ["nǐ", "hǎo"], "Zhōngguó" -> ["Zhōng", "guó"]. Words that do
+    not parse as pinyin come back whole.
+    """
+    word = unicodedata.normalize('NFC', word)
+    # Stripping tones maps one character to one, so spans line up with the input
+    toneless = word.translate(_TONELESS).lower()
+    if not _PINYIN_WORD.fullmatch(toneless):
+        return [word]
+    return [word[m.start():m.end()] for m in _PINYIN_SYLLABLE.finditer(toneless)]
+
+def strip_tones(text: str) -> str:
+    """
+    Remove tone marks and tone numbers, lowercased ASCII
+
+    "Shuǐ" -> "shui", "lǜ sè" -> "lv se", "ni3 hao3" -> "ni hao"
+    """
+    text = unicodedata.normalize('NFC', text).replace('u:', 'ü').replace('U:', 'Ü')
+    return re.sub(r'[1-5]', '', text.translate(_TONELESS)).lower()
+
+def marked_to_numbered(text: str) -> str:
+    """
+    Convert tone-marked pinyin to numbered tones, lowercased ASCII
+
+    "nǐ hǎo" and "nǐhǎo" -> "ni3 hao3", "lǜ" -> "lv4", "ma" -> "ma5"; numbers already present are kept
+    """
+    def number(match):
+        word, tone = match.groups()
+        if tone:
+            return word.translate(_TONELESS).lower() + tone
+        return ' '.join(
+            syllable.translate(_TONELESS).lower()
+            + next((str(_MARKED_VOWELS[ch][1]) for ch in syllable if ch in _MARKED_VOWELS), '5')
+            for syllable in split_syllables(word)
+        )
+
+    text = unicodedata.normalize('NFC', text).replace('u:', 'ü').replace('U:', 'Ü')
+    return _SYLLABLE.sub(number, text)
+
+@lru_cache(maxsize=65536)
+def derived_forms(text: str) -> Tuple[str, str, int]:
+    """
+    Toneless, numbered and syllable count for a card's display pinyin
+
+    "nǐhǎo", "Nǐ hǎo" and "ni3hao3" all give ("nihao", "ni3hao3", 2). Both
+    forms are compact, so they compare and sort the same however the pinyin
+    was typed; the tone numbers still mark the syllable boundaries.
+    """
+    syllables = re.findall(r'[a-z]+[1-5]', marked_to_numbered(text))
+    numbered = ''.join(syllables)
+    return re.sub(r'[1-5]', '', numbered), numbered, len(syllables)
@@ -0,0 +1,325 @@
+"""
+Opt-in per-request profiling
+
+A request is profiled when it is drawn by PROFILE_SAMPLE_RATE, or when it
+carries a valid signed X-Debug-Profile header (see sign_debug_token). A
+profiled request gets:
+
+- a sampling profile: a side thread reads the stacks of the threads working
+  on the request every PROFILE_INTERVAL seconds and counts them as folded
+  stacks ("outer;inner;leaf" -> samples), ready for flamegraph tools
+- a phase breakdown: wall time and call counts for auth, db, upstream and
+  serialize, recorded by phase() blocks around those steps. Phases can
+  overlap (auth includes its own queries) and run in parallel (fan-out
+  lookups), so they need not add up to the request duration.
+
+Profiles are written as JSON to PROFILE_DIR, keeping only the newest
+PROFILE_MAX_FILES, and can be downloaded from /api/debug/profiles with the
+same signed header. The id is returned in X-Profile-Id.
+
+When profiling is off (rate 0 and no PROFILE_SECRET) no hooks are installed;
+phase() then costs one context variable lookup.
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('auth', 'db', 'upstream', 'serialize')
+HEADER = 'X-Debug-Profile'
+MAX_STACK_DEPTH = 64
+
+_active: contextvars.ContextVar = contextvars.ContextVar('pinyimage_profile', default=None)
+
+def sign_debug_token(secret: str, ttl: float = 3600, now: Optional[float] = None) -> str:
+    """
+    Value for the X-Debug-Profile header, valid for ttl seconds
+
+    "<expiry>.<hex HMAC-SHA256 of the expiry under PROFILE_SECRET>"
+    """
+    expiry = str(int((now if now is not None else time.time()) + ttl))
+    signature = hmac.new(secret.encode('utf-8'), expiry.encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"{expiry}.{signature}"
+
+def verify_debug_token(secret: Optional[str], token: Optional[str], now: Optional[float] = None) -> bool:
+    if not secret or not token or '.' not in token:
+        return False
+    expiry, _ = token.split('.', 1)
+    if not expiry.isdigit() or int(expiry) < (now if now is not None else time.time()):
+        return False
+    return hmac.compare_digest(token, sign_debug_token(secret, 0, now=int(expiry)))
+
+class RequestProfile:
+    """Phase timings and stack samples of one request"""
+
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.status: Optional[int] = None
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.phases = {name: {"seconds": 0.0, "count": 0} for name in PHASES}
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        # Threads working on the request -> how many phases they are inside
+        self._threads: Dict[int, int] = {threading.get_ident(): 1}
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='pinyimage-profiler', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self, status: Optional[int]):
+        self._stop.set()
+        self._sampler.join()
+        self.status = status
+        self.duration = time.perf_counter() - self._started
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.phases.setdefault(name, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def enter_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def leave_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 6),
+            "phases": {name: {"seconds": round(entry["seconds"], 6), "count": entry["count"]}
+                       for name, entry in self.phases.items()},
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": dict(sorted(self.stacks.items(), key=lambda item: -item[1])),
+        }
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = [ident for ident in self._threads if ident != own]
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+@contextmanager
+def phase(name: str):
+    """Time a block as one of the request's phases (no-op unless the request is profiled)"""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    profile.enter_thread()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, time.perf_counter() - started)
+        profile.leave_thread()
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap fn to run under the current request's profile, e.g. in a worker thread"""
+    profile = _active.get()
+    if profile is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _active.set(profile)
+        profile.enter_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.leave_thread()
+            _active.reset(token)
+
+    return run
+
+class Profiler:
+    """Decides which requests to profile and stores the results"""
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.secret: Optional[str] = None
+        self.directory = 'profiles'
+        self.max_files = 50
+        self.interval = 0.005
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.secret)
+
+    def init_app(self, app):
+        """Read PROFILE_* settings and install the Flask hooks when profiling is enabled"""
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', self.sample_rate)
+        self.secret = app.config.get('PROFILE_SECRET') or None
+        self.directory = app.config.get('PROFILE_DIR') or self.directory
+        self.max_files = app.config.get('PROFILE_MAX_FILES', self.max_files)
+        self.interval = app.config.get('PROFILE_INTERVAL', self.interval)
+        if not self.enabled:
+            return
+
+        from flask import g, request
+        from flask.json.provider import DefaultJSONProvider
+
+        class ProfilingJSONProvider(DefaultJSONProvider):
+            def dumps(self, obj, **kwargs):
+                with phase('serialize'):
+                    return super().dumps(obj, **kwargs)
+
+        app.json = ProfilingJSONProvider(app)
+
+        @app.before_request
+        def _begin_profile():
+            if request.path.startswith('/api/debug/profiles') or not self.should_profile(request.headers):
+                return
+            g.profile, g.profile_token = self.begin(request.method, request.path)
+
+        @app.after_request
+        def _finish_profile(response):
+            profile = g.pop('profile', None)
+            if profile is not None:
+                self.finish(profile, response.status_code)
+                response.headers['X-Profile-Id'] = profile.id
+            return response
+
+        @app.teardown_request
+        def _reset_profile(exc):
+            token = g.pop('profile_token', None)
+            if token is not None:
+                self.deactivate(token)
+
+    def instrument_engine(self, engine):
+        """Count statement time as the db phase of profiled requests"""
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if _active.get() is not None:
+                conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            profile = _active.get()
+            started = conn.info.get('profile_started')
+            if profile is not None and started:
+                profile.record('db', time.perf_counter() - started.pop())
+
+        @event.listens_for(engine, 'handle_error')
+        def _failed(context):
+            # after_cursor_execute never fires for a failed statement
+            if context.connection is not None:
+                context.connection.info.pop('profile_started', None)
+
+    def should_profile(self, headers) -> bool:
+        if not self.enabled:
+            return False
+        token = headers.get(HEADER)
+        if token and verify_debug_token(self.secret, token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def authorized(self, headers) -> bool:
+        """Whether a request may download profiles"""
+        return verify_debug_token(self.secret, headers.get(HEADER))
+
+    def begin(self, method: str, path: str):
+        """Start profiling the current request; returns the profile and a token for deactivate()"""
+        profile = RequestProfile(method, path, self.interval)
+        token = _active.set(profile)
+        profile.start()
+        return profile, token
+
+    def deactivate(self, token):
+        """Stop attributing work in this context to the profile begin() started"""
+        _active.reset(token)
+
+    def finish(self, profile: RequestProfile, status: Optional[int]):
+        profile.stop(status)
+        try:
+            self._save(profile)
+        except OSError as e:
+            logger.warning(f"Could not save profile {profile.id}: {e}")
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored profiles, newest first"""
+        summaries = []
+        for path in self._files():
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            data.pop('stacks', None)
+            summaries.append(data)
+        return summaries
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not all(ch.isalnum() or ch in '-T' for ch in profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _files(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted(paths, key=lambda path: os.path.getmtime(path), reverse=True)
+
+    def _save(self, profile: RequestProfile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile.id}.json")
+        with open(path, 'w') as f:
+            json.dump(profile.to_dict(), f)
+        for stale in self._files()[self.max_files:]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        logger.info(f"Saved profile {profile.id} for {profile.method} {profile.path} ({profile.duration:.3f}s)")
+
+profiler = Profiler()
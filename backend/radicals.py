@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADICALS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'radicals.json')
+
+class RadicalIndex:
+    """
+    In-memory KangXi radical table
+
+    Radicals are stored in a list indexed by radical number, with reverse
+    maps by glyph and by English name, so every lookup is a single index or
+    dict access.
+    """
+
+    def __init__(self, radicals: List[Dict[str, Any]]):
+        size = max((r['id'] for r in radicals), default=0) + 1
+        self._by_number: List[Optional[Dict[str, Any]]] = [None] * size
+        self._by_glyph: Dict[str, Dict[str, Any]] = {}
+        self._by_english: Dict[str, List[Dict[str, Any]]] = {}
+        for radical in radicals:
+            self._by_number[radical['id']] = radical
+            self._by_glyph[radical['radical']] = radical
+            # The Kangxi Radicals block (U+2F00-U+2FD5) has its own code points
+            # for the same glyphs, e.g. U+2F54 for 水
+            if 1 <= radical['id'] <= 214:
+                self._by_glyph.setdefault(chr(0x2F00 + radical['id'] - 1), radical)
+            self._by_english.setdefault(radical['english'].lower(), []).append(radical)
+
+    def __len__(self) -> int:
+        return sum(1 for r in self._by_number if r is not None)
+
+    def get(self, number: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up a radical by KangXi number
+
+        Args:
+            number: Radical number (1-214)
+
+        Returns:
+            Radical dictionary (id, radical, pinyin, english, strokeCount) or None
+        """
+        if 0 < number < len(self._by_number):
+            return self._by_number[number]
+        return None
+
+    def by_glyph(self, glyph: str) -> Optional[Dict[str, Any]]:
+        """Look up a radical by its character, including Kangxi Radicals block forms"""
+        radical = self._by_glyph.get(glyph)
+        if radical is None and glyph:
+            radical = self._by_glyph.get(unicodedata.normalize('NFKC', glyph))
+        return radical
+
+    def by_english(self, name: str) -> List[Dict[str, Any]]:
+        """Look up radicals by English name; several radicals share a name (e.g. "walk")"""
+        return self._by_english.get(name.strip().lower(), [])
+
+def load_radicals(path: str = DEFAULT_RADICALS_PATH) -> RadicalIndex:
+    """Read radicals.json into a RadicalIndex"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return RadicalIndex(json.load(f))
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_radical_index() -> RadicalIndex:
+    """
+    Process-wide radical index, read from disk on first use
+
+    A missing or unreadable file yields an empty index (and is retried on the
+    next call) so callers can report the service as unavailable.
+    """
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            path = os.getenv('RADICALS_PATH', DEFAULT_RADICALS_PATH)
+            try:
+                _index = load_radicals(path)
+                logger.info(f"Loaded {len(_index)} radicals from {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load radical data: {e}")
+                return RadicalIndex([])
+    return _index
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+def _openai_service():
+    import openai
+    from openai_service import OpenAIService
+    # One pooled HTTP session for every thread in the worker instead of the
+    # per-thread sessions the openai package would otherwise open
+    session = requests.Session()
+    pool_size = int(os.getenv('UPSTREAM_POOL_SIZE', 100))
+    session.mount('https://', requests.adapters.HTTPAdapter(
+        pool_connections=4, pool_maxsize=pool_size, max_retries=2))
+    openai.requestssession = session
+    return OpenAIService()
+
+def _character_data_service():
+    from character_data_service import CharacterDataService
+    return CharacterDataService()
+
+def _ai_service():
+    from ai_service import AIService
+    return AIService()
+
+class ServiceRegistry:
+    """
+    Process-wide home for the long-lived service objects
+
+    Each service is built on first use and then shared by every request the
+    worker handles, so API clients and their connection pools are set up once
+    rather than per request. Instances are owned by the process that built
+    them: after a fork the child starts with an empty registry and builds its
+    own.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def init_app(self, app):
+        """Make the registry reachable as app.extensions['services']"""
+        app.extensions['services'] = self
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register (or replace) the factory for a service"""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Return the shared instance of a service, building it on first use
+
+        Args:
+            name: Registered service name
+
+        Returns:
+            The service instance for this process
+        """
+        if self._pid != os.getpid():
+            self.reset()
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._factories[name]()
+                self._instances[name] = instance
+                logger.info(f"Initialized {name} service in process {os.getpid()}")
+        return instance
+
+    def reset(self):
+        """Drop every instance; the next get() rebuilds them"""
+        self._lock = threading.Lock()
+        self._instances = {}
+        self._pid = os.getpid()
+
+    @property
+    def openai(self):
+        return self.get('openai')
+
+    @property
+    def character_data(self):
+        return self.get('character_data')
+
+    @property
+    def ai(self):
+        return self.get('ai')
+
+services = ServiceRegistry()
+services.register('openai', _openai_service)
+services.register('character_data', _character_data_service)
+services.register('ai', _ai_service)
+
+# Workers forked from a preloaded master must not share the parent's clients
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=services.reset)
@@ -0,0 +1,212 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError
+
+from models import db, UpstreamLock
+
+logger = logging.getLogger(__name__)
+
+# How long a worker may hold the cross-worker lock for one upstream call.
+# Waiters give up and make their own call after this long.
+LOCK_TTL = float(os.getenv('UPSTREAM_LOCK_TTL', 30))
+LOCK_POLL_INTERVAL = 0.1
+
+_stats = {"leaders": 0, "shared": 0, "lock_waits": 0, "lock_wait_hits": 0}
+_stats_lock = threading.Lock()
+
+def utcnow() -> datetime:
+    """Naive UTC now, the form the models' DateTime columns store"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+def stats() -> Dict[str, int]:
+    """Coalescing counters for /api/status"""
+    with _stats_lock:
+        return dict(_stats)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    In-process request coalescing
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and get the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identifies identical work
+            fn: Zero-argument callable doing the work
+            timeout: Longest a waiting caller blocks before running fn itself
+
+        Returns:
+            fn's result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            _count("shared")
+            if not call.done.wait(timeout):
+                logger.warning(f"Gave up waiting for in-flight {key} after {timeout}s")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        _count("leaders")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            _count("leaders")
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            _count("shared")
+        # A caller that times out must not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+def acquire_lock(name: str, ttl: float = LOCK_TTL) -> Optional[str]:
+    """
+    Take the cross-worker lock for an upstream call
+
+    Args:
+        name: Lock name (e.g. "info:水")
+        ttl: Seconds after which the lock is considered abandoned
+
+    Returns:
+        Token to release the lock with, or None if another worker holds it.
+        Without a database the lock is skipped and a token is returned.
+    """
+    token = f"{os.getpid()}-{uuid.uuid4().hex[:16]}"
+    if not has_app_context():
+        return token
+    now = utcnow()
+    try:
+        UpstreamLock.query.filter(UpstreamLock.name == name, UpstreamLock.expires_at < now).delete()
+        db.session.add(UpstreamLock(name=name, owner=token, expires_at=now + timedelta(seconds=ttl)))
+        db.session.commit()
+        return token
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    except Exception as e:
+        logger.warning(f"Upstream lock {name} unavailable, proceeding without it: {e}")
+        db.session.rollback()
+        return token
+
+def release_lock(name: str, token: str):
+    if not has_app_context():
+        return
+    try:
+        UpstreamLock.query.filter_by(name=name, owner=token).delete()
+        db.session.commit()
+    except Exception as e:
+        logger.warning(f"Failed to release upstream lock {name}: {e}")
+        db.session.rollback()
+
+def _lock_held(name: str) -> bool:
+    try:
+        return UpstreamLock.query.filter(UpstreamLock.name == name,
+                                         UpstreamLock.expires_at >= utcnow()).count() > 0
+    except Exception:
+        db.session.rollback()
+        return False
+
+def wait_for_result(name: str, check: Callable[[], Any], timeout: float = LOCK_TTL) -> Any:
+    """
+    Wait for another worker's upstream call to land
+
+    Args:
+        name: Lock held by the other worker
+        check: Returns the stored result, or None while it is not there yet
+        timeout: Longest to wait
+
+    Returns:
+        The stored result, or None if the lock went away (or timed out) without one
+    """
+    _count("lock_waits")
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value is not None:
+            _count("lock_wait_hits")
+            return value
+        if time.monotonic() >= deadline or not _lock_held(name):
+            return check()
+        time.sleep(LOCK_POLL_INTERVAL)
+
+def call_with_lock(name: str, fn: Callable[[], Any], check: Callable[[], Any]) -> Any:
+    """
+    Make an upstream call unless another worker is already making it
+
+    fn must store its result where check can find it before returning.
+    """
+    token = acquire_lock(name)
+    if token is None:
+        value = wait_for_result(name, check)
+        if value is not None:
+            return value
+        return fn()
+    try:
+        return fn()
+    finally:
+        release_lock(name, token)
+
+single_flight = SingleFlight()
+
+def coalesce(name: str, fn: Callable[[], Any], check: Callable[[], Any]) -> Any:
+    """
+    Coalesce identical upstream calls within this process and across workers
+
+    Args:
+        name: Identifies identical work (also the lock name)
+        fn: Makes the call and stores its result
+        check: Reads a result stored by another worker, or None
+
+    Returns:
+        fn's result, or the result another worker stored
+    """
+    return single_flight.do(name, lambda: call_with_lock(name, fn, check), timeout=LOCK_TTL)
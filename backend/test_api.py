@@ -2,11 +2,15 @@ import unittest
 import json
 import sys
 import os
+import uuid
 
 # Add the backend directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
 
 from main import app
+from models import db, User, Card
 
 class TestAPI(unittest.TestCase):
     def setUp(self):
@@ -61,10 +65,10 @@ class TestAPI(unittest.TestCase):
         data = json.loads(response.data)
         if response.status_code == 200:
             self.assertIn('result', data)
-            self.assertIn('cards', data)
         else:
             self.assertIn('error', data)
-            self.assertIn('cards', data)
+        # Lookups no longer ship the card table
+        self.assertNotIn('cards', data)
 
     def test_result_non_chinese(self):
         """Test the POST /api/result endpoint with non-Chinese input"""
@@ -75,7 +79,7 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertIn('result', data)
-        self.assertIn('cards', data)
+        self.assertNotIn('cards', data)
 
     def test_result_empty_input(self):
         """Test the POST /api/result endpoint with empty input"""
@@ -92,5 +96,77 @@ class TestAPI(unittest.TestCase):
                                content_type='application/json')
         self.assertEqual(response.status_code, 400)
 
+class TestResultBatch(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+
+    def test_ndjson_response(self):
+        """Non-Chinese inputs are answered without a lookup, one line each"""
+        response = self.app.post('/api/result/batch', json={'inputs': ['hello', 'hello', 'world']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        self.assertEqual([row['input'] for row in rows], ['hello', 'world'])
+
+    def test_invalid_inputs(self):
+        self.assertEqual(self.app.post('/api/result/batch', json={}).status_code, 400)
+        self.assertEqual(self.app.post('/api/result/batch', json={'inputs': '水'}).status_code, 400)
+        too_many = [chr(0x4e00 + i) for i in range(app.config['BATCH_MAX_ITEMS'] + 1)]
+        self.assertEqual(self.app.post('/api/result/batch', json={'inputs': too_many}).status_code, 400)
+
+class TestCardsPagination(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        self.email = f"pagination_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {
+            'Authorization': 'Bearer test-token',
+            'X-User-Email': self.email,
+            'X-User-ID': self.email
+        }
+        with app.app_context():
+            user = User(username=self.email.split('@')[0], email=self.email, password_hash='clerk_authenticated')
+            db.session.add(user)
+            db.session.flush()
+            for i in range(5):
+                db.session.add(Card(user_id=user.id, title='水', pinyin='shuǐ', meaning=f'water {i}', con='test'))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            user = User.query.filter_by(email=self.email).first()
+            db.session.delete(user)
+            db.session.commit()
+
+    def test_walks_all_pages(self):
+        """Following X-Next-Cursor returns every card exactly once"""
+        seen = []
+        cursor = None
+        while True:
+            query = {'limit': 2}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.app.get('/api/cards', query_string=query, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data)
+            self.assertLessEqual(len(page), 2)
+            seen.extend(card['id'] for card in page)
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_total_count(self):
+        """include_total adds X-Total-Count"""
+        response = self.app.get('/api/cards', query_string={'limit': 1, 'include_total': 1}, headers=self.headers)
+        self.assertEqual(response.headers.get('X-Total-Count'), '5')
+
+    def test_invalid_cursor(self):
+        """Malformed cursors are rejected"""
+        response = self.app.get('/api/cards', query_string={'cursor': 'garbage'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,182 @@
+import unittest
+import json
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiohttp import web
+
+import async_app
+from async_clients import AsyncUpstreamClient, MnemonicStreamError
+
+class TestAsyncApp(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = TestClient(TestServer(async_app.create_app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_result_non_chinese(self):
+        """Native /api/result keeps the Flask contract"""
+        response = await self.client.post('/api/result', json={'user_input': 'hello'})
+        self.assertEqual(response.status, 200)
+        data = await response.json()
+        self.assertIn('result', data)
+        self.assertEqual(response.headers.get('Access-Control-Allow-Origin'), '*')
+
+    async def test_result_empty_input(self):
+        response = await self.client.post('/api/result', json={'user_input': ''})
+        self.assertEqual(response.status, 400)
+
+    async def test_result_chinese(self):
+        """Lookups go through the shared async upstream client"""
+        async def fetch(self, character):
+            return {"character": character, "pinyin": "shuǐ", "meaning": "water", "source": "openai"}
+
+        async def mnemonic(self, character, pinyin, meaning):
+            return "async mnemonic"
+
+        with mock.patch.object(async_app.AsyncUpstreamClient, 'fetch_character_info', fetch), \
+             mock.patch.object(async_app.AsyncUpstreamClient, 'generate_mnemonic', mnemonic):
+            response = await self.client.post('/api/result', json={'user_input': '沝', 'fresh_mnemonic': True})
+        data = await response.json()
+        self.assertEqual(data['meaning'], 'water')
+        self.assertEqual(data['connections'], 'async mnemonic')
+        async_app.character_info_cache.invalidate('沝')
+
+    async def test_result_stream(self):
+        """Info, mnemonic token and done events are streamed"""
+        async def fetch(self, character):
+            return {"character": character, "pinyin": "shuǐ", "meaning": "water", "source": "openai"}
+
+        async def stream(self, character, pinyin, meaning):
+            for piece in ("A river ", "of ", "water."):
+                yield piece
+
+        with mock.patch.object(async_app.AsyncUpstreamClient, 'fetch_character_info', fetch), \
+             mock.patch.object(async_app.AsyncUpstreamClient, 'stream_mnemonic', stream):
+            response = await self.client.get('/api/result/stream',
+                                             params={'user_input': '沝', 'fresh_mnemonic': '1'})
+            body = await response.text()
+        self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        names = [name for name, _ in events]
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(names.count('token'), 3)
+        self.assertIn('info', names)
+        self.assertEqual(events[-1][1]['connections'], 'A river of water.')
+        async_app.character_info_cache.invalidate('沝')
+
+    async def test_result_stream_interrupted(self):
+        """A mnemonic stream that breaks off is discarded, not shown or stored as complete"""
+        async def fetch(self, character):
+            return {"character": character, "pinyin": "shuǐ", "meaning": "water", "source": "openai"}
+
+        async def stream(self, character, pinyin, meaning):
+            yield "A river "
+            raise MnemonicStreamError("connection reset")
+
+        with mock.patch.object(async_app.AsyncUpstreamClient, 'fetch_character_info', fetch), \
+             mock.patch.object(async_app.AsyncUpstreamClient, 'stream_mnemonic', stream), \
+             mock.patch.object(async_app.mnemonic_store, 'variants', return_value=[]), \
+             mock.patch.object(async_app.mnemonic_store, 'add') as add:
+            response = await self.client.get('/api/result/stream',
+                                             params={'user_input': '沝', 'fresh_mnemonic': '1'})
+            body = await response.text()
+        names = [block.split('\n')[0][len('event: '):] for block in body.strip().split('\n\n')]
+        self.assertLess(names.index('token'), names.index('reset'))
+        self.assertEqual(names[-1], 'done')
+        self.assertNotIn('A river', body.rsplit('event: done', 1)[1])
+        add.assert_not_called()
+        async_app.character_info_cache.invalidate('沝')
+
+    async def test_cached_info_refreshes_with_real_loader(self):
+        """Stale hits on the async path schedule a refresh that actually fetches"""
+        loader = async_app.services.character_data._fetch_character_info
+        with mock.patch.object(async_app.character_info_cache, 'get_or_load',
+                               return_value={"meaning": "water"}) as get_or_load:
+            info = await async_app._info(None, '水', cached=True)
+        self.assertEqual(info, {"meaning": "water"})
+        get_or_load.assert_called_once_with('水', loader, coalesced=mock.ANY)
+
+    async def test_flask_routes_bridged(self):
+        """Routes not served natively fall through to the Flask app"""
+        response = await self.client.get('/api/health')
+        self.assertEqual(response.status, 200)
+        data = json.loads(await response.text())
+        self.assertIn('services', data)
+
+        response = await self.client.get('/api/cards')
+        self.assertEqual(response.status, 401)
+
+    async def test_import_streams_through_bridge(self):
+        """Uploads reach the Flask import view as a stream, not a buffered body"""
+        email = 'async_import@example.com'
+        headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email,
+                   'Content-Type': 'application/octet-stream'}
+        rows = [{'title': '水', 'pinyin': 'shuǐ', 'meaning': 'water'},
+                {'title': '木', 'pinyin': 'mù', 'meaning': 'wood'}]
+
+        async def body():
+            for row in rows:
+                yield (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+
+        with mock.patch.object(web.Request, 'read', side_effect=AssertionError('body was buffered')):
+            response = await self.client.post('/api/cards/import', params={'format': 'ndjson'},
+                                              headers=headers, data=body())
+        self.assertEqual(response.status, 200)
+        summary = json.loads(await response.text())
+        self.assertEqual(summary['imported'], 2)
+        self.assertEqual(summary['errors'], [])
+
+class TestStreamMnemonic(unittest.IsolatedAsyncioTestCase):
+    """stream_mnemonic against a fake OpenAI server"""
+
+    async def collect(self, *lines):
+        async def chat(request):
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+            await response.prepare(request)
+            for line in lines:
+                await response.write(f"data: {line}\n\n".encode('utf-8'))
+            return response
+
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', chat)
+        server = TestServer(app)
+        await server.start_server()
+        client = AsyncUpstreamClient()
+        client.api_key = 'test'
+        await client.start()
+        try:
+            with mock.patch('async_clients.OPENAI_CHAT_URL', str(server.make_url('/v1/chat/completions'))):
+                return [piece async for piece in client.stream_mnemonic('水', 'shuǐ', 'water')]
+        finally:
+            await client.close()
+            await server.close()
+
+    def chunk(self, content=None, finish_reason=None):
+        delta = {'content': content} if content else {}
+        return json.dumps({'choices': [{'delta': delta, 'finish_reason': finish_reason}]})
+
+    async def test_complete(self):
+        pieces = await self.collect(self.chunk('A river'), self.chunk(finish_reason='stop'), '[DONE]')
+        self.assertEqual(pieces, ['A river'])
+
+    async def test_truncated(self):
+        with self.assertRaises(MnemonicStreamError):
+            await self.collect(self.chunk('A river'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import uuid
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import insert
+
+from main import app
+from models import db, Card
+from card_fulltext import search_text
+from identity import identity_resolver
+
+class TestCardFullText(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"fts_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+        with app.app_context():
+            self.user_id = identity_resolver.resolve({'user_id': 'clerk_' + email, 'email': email})
+            for title, meaning, con in [
+                ('马', 'horse', 'A horse galloping across the field'),
+                ('妈', 'mother', 'Mother rides a horse to market'),
+                ('水', 'water', 'Three drops of water falling'),
+            ]:
+                db.session.add(Card(user_id=self.user_id, title=title, pinyin='x', meaning=meaning, con=con))
+            db.session.commit()
+
+    def titles(self, query, user_id=None):
+        with app.app_context():
+            return [card.title for card in search_text(db.session, user_id or self.user_id, query)]
+
+    def test_ranked_by_meaning_first(self):
+        self.assertEqual(self.titles('horse'), ['马', '妈'])
+
+    def test_all_words_and_prefix(self):
+        self.assertEqual(self.titles('horse market'), ['妈'])
+        self.assertEqual(self.titles('gallop'), ['马'])
+        self.assertEqual(self.titles('wat'), ['水'])
+        self.assertEqual(self.titles('"); DROP TABLE cards; --'), [])
+
+    def test_other_users_cards_hidden(self):
+        self.assertEqual(self.titles('horse', user_id=self.user_id + 100000), [])
+
+    def test_index_follows_all_writes(self):
+        with app.app_context():
+            card = Card.query.filter_by(user_id=self.user_id, title='水').one()
+            card.con = 'A river of water'
+            db.session.commit()
+            self.assertEqual(search_text(db.session, self.user_id, 'drops'), [])
+            db.session.delete(card)
+            # Core inserts bypass the ORM and are still indexed
+            db.session.execute(insert(Card).values(user_id=self.user_id, title='火', pinyin='x',
+                                                   meaning='fire', con='A campfire burning'))
+            db.session.commit()
+        self.assertEqual(self.titles('water'), [])
+        self.assertEqual(self.titles('campfire'), ['火'])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/cards/search', headers=self.headers,
+                                   query_string={'q': 'horse', 'in': 'text'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card['title'] for card in response.get_json()], ['马', '妈'])
+
+if __name__ == '__main__':
+    unittest.main()
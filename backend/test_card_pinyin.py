@@ -0,0 +1,78 @@
+import unittest
+import uuid
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import insert
+
+from main import app
+from models import db, Card
+from card_pinyin import backfill
+from identity import identity_resolver
+from pinyin_forms import derived_forms
+
+class TestCardPinyin(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"pinyin_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+        with app.app_context():
+            self.user_id = identity_resolver.resolve({'user_id': 'clerk_' + email, 'email': email})
+            for title, pinyin in [('好', 'hǎo'), ('号', 'hào'), ('你好', 'Nǐ hǎo'), ('爱', 'ài'), ('中国', 'zhong1guo2')]:
+                db.session.add(Card(user_id=self.user_id, title=title, pinyin=pinyin, meaning='m', con='c'))
+            db.session.commit()
+
+    def get_cards(self, **params):
+        response = self.client.get('/api/cards', headers=self.headers, query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_derived_forms(self):
+        self.assertEqual(derived_forms('nǐhǎo'), ('nihao', 'ni3hao3', 2))
+        self.assertEqual(derived_forms('Nǐ hǎo'), ('nihao', 'ni3hao3', 2))
+        self.assertEqual(derived_forms('lǜ'), ('lv', 'lv4', 1))
+
+    def test_filled_on_write(self):
+        with app.app_context():
+            card = Card.query.filter_by(user_id=self.user_id, title='中国').one()
+            self.assertEqual((card.pinyin_toneless, card.pinyin_numbered, card.pinyin_syllables),
+                             ('zhongguo', 'zhong1guo2', 2))
+            card.pinyin = 'Zhōngguó'
+            db.session.commit()
+            self.assertEqual(card.pinyin_numbered, 'zhong1guo2')
+
+    def test_pinyin_order_pages(self):
+        titles, cursor = [], None
+        while True:
+            response = self.get_cards(order='pinyin', limit=2, **({'cursor': cursor} if cursor else {}))
+            titles += [card['title'] for card in response.get_json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(titles, ['爱', '好', '号', '你好', '中国'])
+
+    def test_pinyin_filter(self):
+        titles = lambda **params: sorted(card['title'] for card in self.get_cards(**params).get_json())
+        self.assertEqual(titles(pinyin='hao'), ['号', '好'])
+        self.assertEqual(titles(pinyin='hǎo'), ['号', '好'])
+        self.assertEqual(titles(pinyin='hao3'), ['好'])
+        self.assertEqual(titles(pinyin='ni hao'), ['你好'])
+        self.assertEqual(self.get_cards(pinyin='h', include_total='1').headers['X-Total-Count'], '2')
+
+    def test_backfill(self):
+        with app.app_context():
+            db.session.execute(insert(Card).values(user_id=self.user_id, title='水', pinyin='shuǐ',
+                                                   meaning='water', con='c'))
+            db.session.commit()
+            self.assertGreaterEqual(backfill(batch_size=1), 1)
+            self.assertEqual(backfill(), 0)
+            card = Card.query.filter_by(user_id=self.user_id, title='水').one()
+            self.assertEqual((card.pinyin_toneless, card.pinyin_syllables), ('shui', 1))
+
+if __name__ == '__main__':
+    unittest.main()
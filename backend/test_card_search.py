@@ -0,0 +1,98 @@
+import unittest
+import json
+import uuid
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from main import app
+from models import db, Card, CardSearchDocument, CardSearchGram
+from card_search import backfill, normalize_query, remove_cards, search, search_forms
+from identity import identity_resolver
+
+class TestSearchForms(unittest.TestCase):
+    def test_forms(self):
+        card = Card(title='你好', pinyin='nǐhǎo')
+        self.assertEqual(search_forms(card), ['nihao', 'ni3hao3', '你好'])
+        self.assertEqual(search_forms(Card(title='绿', pinyin='lǜ')), ['lv', 'lv4', '绿'])
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('Nǐ Hǎo'), 'nihao')
+        self.assertEqual(normalize_query('hao3'), 'hao3')
+        self.assertEqual(normalize_query('lü4'), 'lv4')
+        self.assertEqual(normalize_query("xi'an"), 'xian')
+
+class TestCardSearch(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"search_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+        with app.app_context():
+            self.user_id = identity_resolver.resolve({'user_id': 'clerk_' + email, 'email': email})
+            for title, pinyin in [('你好', 'nǐhǎo'), ('好', 'hào'), ('中国', 'Zhōngguó'), ('绿色', 'lǜ sè')]:
+                db.session.add(Card(user_id=self.user_id, title=title, pinyin=pinyin, meaning='m', con='c'))
+            db.session.commit()
+
+    def titles(self, query):
+        with app.app_context():
+            return sorted(card.title for card in search(self.user_id, query))
+
+    def test_tone_insensitive(self):
+        self.assertEqual(self.titles('hao'), ['你好', '好'])
+        self.assertEqual(self.titles('hǎo'), ['你好', '好'])
+        self.assertEqual(self.titles('ni hao'), ['你好'])
+
+    def test_numbered_tones(self):
+        self.assertEqual(self.titles('hao3'), ['你好'])
+        self.assertEqual(self.titles('hao4'), ['好'])
+        self.assertEqual(self.titles('lv4'), ['绿色'])
+
+    def test_prefix_and_substring(self):
+        self.assertEqual(self.titles('zhong'), ['中国'])
+        self.assertEqual(self.titles('ngguo'), ['中国'])
+        self.assertEqual(self.titles('zhongguox'), [])
+
+    def test_characters(self):
+        self.assertEqual(self.titles('好'), ['你好', '好'])
+        self.assertEqual(self.titles('中国'), ['中国'])
+
+    def test_other_users_cards_hidden(self):
+        with app.app_context():
+            self.assertEqual(search(self.user_id + 100000, 'hao'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        with app.app_context():
+            card = Card.query.filter_by(user_id=self.user_id, title='好').one()
+            card.pinyin = 'hǎo'
+            db.session.commit()
+            self.assertEqual(sorted(c.title for c in search(self.user_id, 'hao3')), ['你好', '好'])
+            db.session.delete(card)
+            db.session.commit()
+            self.assertEqual(db.session.query(CardSearchGram).filter_by(card_id=card.id).count(), 0)
+        self.assertEqual(self.titles('hao'), ['你好'])
+
+    def test_backfill(self):
+        with app.app_context():
+            ids = [card.id for card in Card.query.filter_by(user_id=self.user_id)]
+            remove_cards(db.session.connection(), ids)
+            db.session.commit()
+            self.assertEqual(search(self.user_id, 'hao'), [])
+            self.assertGreaterEqual(backfill(batch_size=2), len(ids))
+            self.assertEqual(backfill(), 0)
+            self.assertEqual(db.session.query(CardSearchDocument).filter(
+                CardSearchDocument.card_id.in_(ids)).count(), len(ids))
+        self.assertEqual(self.titles('hao'), ['你好', '好'])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/cards/search', headers=self.headers, query_string={'q': 'zhōng'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card['title'] for card in response.get_json()], ['中国'])
+        response = self.client.get('/api/cards/search', headers=self.headers, query_string={'q': ' '})
+        self.assertEqual(response.get_json(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import json
+import uuid
+import sys
+import os
+from datetime import datetime
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import select
+
+from main import app
+from models import db, Card, created_display
+from card_serialization import FIELDS, columns_for, dumps, parse_fields, serialize
+
+class TestCardSerialization(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"fields_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+        response = self.client.post('/api/post', headers=self.headers, data=json.dumps(
+            {'title': '水', 'pinyin': 'shuǐ', 'meaning': 'water', 'con': 'drops'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_created_display_matches_strftime(self):
+        for hour in range(24):
+            moment = datetime(2024, 8, 5, hour, 7)
+            self.assertEqual(created_display(moment), moment.strftime("%b %d, %I:%M %p"))
+        self.assertIsNone(created_display(None))
+
+    def test_fast_path_matches_to_dict(self):
+        with app.app_context():
+            card = Card.query.order_by(Card.id.desc()).first()
+            rows = db.session.execute(select(*columns_for(FIELDS)).where(Card.id == card.id)).all()
+            self.assertEqual(serialize(rows, FIELDS), [card.to_dict()])
+            self.assertEqual(json.loads(dumps(serialize(rows, FIELDS))), [card.to_dict()])
+
+    def test_parse_fields(self):
+        self.assertEqual(parse_fields(None), FIELDS)
+        self.assertEqual(parse_fields('title, pinyin,title'), ('title', 'pinyin'))
+        with self.assertRaises(ValueError):
+            parse_fields('title,password_hash')
+
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/cards', headers=self.headers, query_string={'fields': 'title,pinyin'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [{'title': '水', 'pinyin': 'shuǐ'}])
+
+        response = self.client.get('/api/cards', headers=self.headers, query_string={'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fieldset_pages(self):
+        self.client.post('/api/post', headers=self.headers, data=json.dumps(
+            {'title': '火', 'pinyin': 'huǒ', 'meaning': 'fire', 'con': 'flames'}), content_type='application/json')
+        first = self.client.get('/api/cards', headers=self.headers, query_string={'fields': 'title', 'limit': 1})
+        second = self.client.get('/api/cards', headers=self.headers, query_string={
+            'fields': 'title', 'limit': 1, 'cursor': first.headers['X-Next-Cursor']})
+        self.assertEqual(first.get_json() + second.get_json(), [{'title': '火'}, {'title': '水'}])
+
+if __name__ == '__main__':
+    unittest.main()
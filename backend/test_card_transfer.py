@@ -0,0 +1,109 @@
+import unittest
+import csv
+import io
+import json
+import uuid
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from main import app
+from models import Card
+from card_transfer import import_cards, read_rows
+from identity import identity_resolver
+
+class TestCardTransfer(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"transfer_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+
+    def upload(self, body, fmt):
+        response = self.client.post('/api/cards/import', headers=self.headers, query_string={'format': fmt},
+                                    data=body.encode('utf-8'), content_type='application/octet-stream')
+        return response
+
+    def export(self, fmt):
+        response = self.client.get('/api/cards/export', headers=self.headers, query_string={'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        return response.get_data(as_text=True)
+
+    def test_ndjson_round_trip_with_row_errors(self):
+        body = '\n'.join([
+            json.dumps({'title': '水', 'pinyin': 'shuǐ', 'meaning': 'water', 'con': 'drops'}, ensure_ascii=False),
+            '{not json',
+            json.dumps({'title': 'water', 'pinyin': 'x', 'meaning': 'y'}),
+            json.dumps({'title': '火', 'pinyin': 'huǒ'}, ensure_ascii=False),
+            json.dumps({'title': '木', 'pinyin': 'mù', 'meaning': 'wood'}, ensure_ascii=False),
+        ])
+        summary = self.upload(body, 'ndjson').get_json()
+        self.assertEqual(summary['imported'], 2)
+        self.assertEqual([error['row'] for error in summary['errors']], [2, 3, 4])
+        self.assertIn('meaning', summary['errors'][2]['error'])
+
+        lines = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual(lines, [
+            {'title': '水', 'pinyin': 'shuǐ', 'meaning': 'water', 'con': 'drops'},
+            {'title': '木', 'pinyin': 'mù', 'meaning': 'wood', 'con': ''},
+        ])
+
+    def test_csv(self):
+        body = 'title,pinyin,meaning,con\r\n好,hǎo,"good, well",woman and child\r\n'
+        self.assertEqual(self.upload(body, 'csv').get_json()['imported'], 1)
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(rows, [{'title': '好', 'pinyin': 'hǎo', 'meaning': 'good, well', 'con': 'woman and child'}])
+        self.assertEqual(self.upload('name,value\r\n', 'csv').status_code, 400)
+
+    def test_anki(self):
+        body = '#separator:tab\n#html:false\n马\tmǎ\thorse\tgallops\n妈\tmā\tmother\n'
+        self.assertEqual(self.upload(body, 'anki').get_json()['imported'], 2)
+        exported = self.export('anki')
+        self.assertTrue(exported.startswith('#separator:tab\n'))
+        self.assertIn('马\tmǎ\thorse\tgallops', exported)
+        self.assertIn('妈\tmā\tmother\t', exported)
+
+    def test_anki_rows_numbered_by_file_line(self):
+        body = '#separator:tab\n#html:false\n马\tmǎ\thorse\n妈\tmā\n'
+        summary = self.upload(body, 'anki').get_json()
+        self.assertEqual(summary['imported'], 1)
+        self.assertEqual([error['row'] for error in summary['errors']], [4])
+
+    def test_invalid_utf8_after_committed_batches(self):
+        """Rows before a decode error stay imported and the response still summarizes them"""
+        line = json.dumps({'title': '字', 'pinyin': 'zì', 'meaning': 'character ' + 'x' * 100}, ensure_ascii=False)
+        body = ('\n'.join([line] * 200) + '\n').encode('utf-8') + b'\xff\xfe broken\n'
+        with app.app_context():
+            user_id = identity_resolver.resolve({'user_id': self.headers['X-User-ID'],
+                                                 'email': self.headers['X-User-Email']})
+            summary = import_cards(user_id, read_rows(io.BytesIO(body), 'ndjson'), batch_size=10)
+            self.assertGreater(summary['imported'], 0)
+            self.assertEqual(summary['imported'], Card.query.filter_by(user_id=user_id).count())
+            self.assertTrue(summary['truncated'])
+            self.assertIn('UTF-8', summary['errors'][-1]['error'])
+
+        response = self.client.post('/api/cards/import', headers=self.headers, query_string={'format': 'ndjson'},
+                                    data=body, content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('imported', response.get_json())
+
+    def test_batches_and_limit(self):
+        rows = [(n, {'title': '字', 'pinyin': 'zì', 'meaning': f'm{n}'}) for n in range(1, 8)]
+        with app.app_context():
+            user_id = identity_resolver.resolve({'user_id': self.headers['X-User-ID'],
+                                                 'email': self.headers['X-User-Email']})
+            summary = import_cards(user_id, iter(rows), batch_size=3, max_rows=5)
+            self.assertEqual((summary['imported'], summary['truncated']), (5, True))
+            self.assertEqual(Card.query.filter_by(user_id=user_id).count(), 5)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.upload('', 'xml').status_code, 400)
+        with self.assertRaises(ValueError):
+            list(read_rows(io.BytesIO(b''), 'xml'))
+
+if __name__ == '__main__':
+    unittest.main()
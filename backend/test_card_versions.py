@@ -0,0 +1,93 @@
+import unittest
+import json
+import uuid
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from main import app
+from models import db, Card
+from card_versions import current_version, collection_etag
+from identity import identity_resolver
+from test_identity import count_queries
+
+class TestCardsETag(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        email = f"etag_{uuid.uuid4().hex[:8]}@example.com"
+        self.headers = {'Authorization': 'Bearer token', 'X-User-Email': email, 'X-User-ID': 'clerk_' + email}
+        with app.app_context():
+            self.user_id = identity_resolver.resolve({'user_id': 'clerk_' + email, 'email': email})
+
+    def add_card(self, title='水'):
+        response = self.client.post('/api/post', headers=self.headers, data=json.dumps(
+            {'title': title, 'pinyin': 'shuǐ', 'meaning': 'water', 'con': 'c'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def get_cards(self, etag=None, **params):
+        headers = dict(self.headers)
+        if etag:
+            headers['If-None-Match'] = etag
+        return self.client.get('/api/cards', headers=headers, query_string=params)
+
+    def test_not_modified(self):
+        self.add_card()
+        first = self.get_cards()
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        with count_queries() as statements:
+            second = self.get_cards(etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('FROM card_collection_versions', statements[0])
+
+    def test_changes_invalidate(self):
+        self.add_card()
+        etag = self.get_cards().headers['ETag']
+        self.add_card('火')
+        response = self.get_cards(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_query_parameters_are_part_of_tag(self):
+        self.add_card()
+        etag = self.get_cards().headers['ETag']
+        self.assertEqual(self.get_cards(etag, limit=1).status_code, 200)
+
+    def test_version_bumps_on_update_and_delete(self):
+        with app.app_context():
+            self.assertEqual(current_version(self.user_id), 0)
+            card = Card(user_id=self.user_id, title='木', pinyin='mù', meaning='wood', con='c')
+            db.session.add(card)
+            db.session.commit()
+            self.assertEqual(current_version(self.user_id), 1)
+
+            card.meaning = 'tree'
+            db.session.commit()
+            self.assertEqual(current_version(self.user_id), 2)
+
+            db.session.delete(card)
+            db.session.commit()
+            self.assertEqual(current_version(self.user_id), 3)
+
+    def test_rollback_keeps_version(self):
+        with app.app_context():
+            db.session.add(Card(user_id=self.user_id, title='土', pinyin='tǔ', meaning='earth', con='c'))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(current_version(self.user_id), 0)
+
+    def test_etag_differs_per_user(self):
+        self.assertNotEqual(collection_etag(1, 5, []), collection_etag(2, 5, []))
+
+if __name__ == '__main__':
+    unittest.main()
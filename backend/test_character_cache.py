@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import time
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db
+from config import config
+from cache import TTLCache, FRESH, STALE, MISS
+from character_cache import CharacterInfoCache
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted first"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), (1, FRESH))
+        self.assertEqual(cache.get('b'), (None, MISS))
+
+    def test_stale_window(self):
+        """Entries past their TTL are stale until the stale window ends"""
+        cache = TTLCache(maxsize=4, ttl=10, stale_ttl=10)
+        cache.set('a', 1, stored_at=time.time() - 15)
+        cache.set('b', 2, stored_at=time.time() - 25)
+        self.assertEqual(cache.get('a'), (1, STALE))
+        self.assertEqual(cache.get('b'), (None, MISS))
+
+class TestCharacterInfoCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.from_object(config['testing'])
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.calls = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def loader(self, character):
+        self.calls.append(character)
+        return {"character": character, "meaning": "water", "source": "openai"}
+
+    def test_hit_after_miss(self):
+        """Second lookup is served from memory without calling the loader"""
+        cache = CharacterInfoCache()
+        cache.get_or_load('水', self.loader)
+        info = cache.get_or_load('水', self.loader)
+        self.assertEqual(info['meaning'], 'water')
+        self.assertEqual(self.calls, ['水'])
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_persisted_across_processes(self):
+        """A new cache instance finds entries in the database"""
+        CharacterInfoCache().get_or_load('水', self.loader)
+        cache = CharacterInfoCache()
+        info = cache.get_or_load('水', self.loader)
+        self.assertEqual(info['meaning'], 'water')
+        self.assertEqual(self.calls, ['水'])
+        self.assertEqual(cache.stats()['db_hits'], 1)
+
+    def test_fallback_not_cached(self):
+        """Placeholder results are returned but never stored"""
+        cache = CharacterInfoCache()
+        fallback = lambda c: {"character": c, "source": "fallback"}
+        cache.get_or_load('水', fallback)
+        cache.get_or_load('水', fallback)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
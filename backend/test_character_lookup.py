@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import background
+import character_lookup
+from services import services
+
+class TestFanOut(unittest.TestCase):
+    def test_runs_concurrently(self):
+        """Tasks overlap instead of running back to back"""
+        start = time.time()
+        done = background.fan_out({
+            "a": lambda: time.sleep(0.2) or "a",
+            "b": lambda: time.sleep(0.2) or "b",
+        }, timeout=2)
+        self.assertEqual(done, {"a": "a", "b": "b"})
+        self.assertLess(time.time() - start, 0.35)
+
+    def test_deadline_drops_slow_tasks(self):
+        """Tasks still running at the deadline are left out"""
+        done = background.fan_out({
+            "fast": lambda: "fast",
+            "slow": lambda: time.sleep(0.5) or "slow",
+        }, timeout=0.1)
+        self.assertEqual(done, {"fast": "fast"})
+
+    def test_batch_items_use_their_own_lookup_pool(self):
+        """Lookups fanned out by batch items leave the single-request pool alone"""
+        current = lambda: threading.current_thread().name
+        [(_, name, _)] = background.stream({"item": lambda: background.fan_out({"x": current}, timeout=2)["x"]})
+        self.assertTrue(name.startswith('pinyimage-batch-lookup'))
+        self.assertTrue(background.fan_out({"x": current}, timeout=2)["x"].startswith('pinyimage-lookup'))
+
+class TestDescribeCharacter(unittest.TestCase):
+    def test_slow_info_uses_local_data(self):
+        """A missed info lookup still returns the mnemonic and local pinyin"""
+        slow_info = lambda c: time.sleep(0.5) or {"meaning": "late", "source": "openai"}
+        with mock.patch.object(services.character_data, 'get_character_info', slow_info), \
+             mock.patch.object(character_lookup, 'getConnections', lambda *a, **k: "a mnemonic"):
+            data = character_lookup.describe_character('水', deadline=0.1, combined=False)
+        self.assertEqual(data["connections"], "a mnemonic")
+        self.assertTrue(data["partial"])
+        self.assertNotEqual(data["meaning"], "late")
+
+    def test_cold_lookup_uses_combined_request(self):
+        """A first-time lookup makes one combined request and no separate calls"""
+        profile = lambda c: {"character": c, "pinyin": "shuǐ", "meaning": "water",
+                                   "mnemonic": "combined mnemonic", "source": "openai"}
+        separate = mock.Mock()
+        with mock.patch.object(services.openai, 'get_character_profile', profile), \
+             mock.patch.object(character_lookup, 'getConnections', separate), \
+             mock.patch.object(services.character_data, 'get_character_info', separate):
+            data = character_lookup.describe_character('氵', deadline=1)
+        self.assertEqual(data["connections"], "combined mnemonic")
+        self.assertEqual(data["meaning"], "water")
+        separate.assert_not_called()
+        character_lookup.character_info_cache.invalidate('氵')
+
+class TestDescribeBatch(unittest.TestCase):
+    def test_dedupes_and_streams_hits_first(self):
+        """Cached items come back before misses; duplicates are looked up once"""
+        calls = []
+
+        def describe(item, **kwargs):
+            calls.append(item)
+            if item == '慢':
+                time.sleep(0.2)
+            return {"result": item, "meaning": item, "connections": "", "pinyin": "", "partial": False}
+
+        with mock.patch.object(character_lookup, 'describe_character', describe), \
+             mock.patch.object(character_lookup, 'is_cached', lambda c: c == '水'):
+            rows = list(character_lookup.describe_batch(['慢', '水', ' 水', '火', 'abc', '慢', '', 3]))
+
+        self.assertEqual(sorted(calls), sorted(['慢', '水', '火']))
+        self.assertEqual([r["input"] for r in rows], ['abc', '水', '火', '慢'])
+        self.assertIn("error", rows[0])
+
+    def test_failed_item_reports_error(self):
+        def describe(item, **kwargs):
+            raise RuntimeError("boom")
+
+        with mock.patch.object(character_lookup, 'describe_character', describe), \
+             mock.patch.object(character_lookup, 'is_cached', lambda c: False):
+            rows = list(character_lookup.describe_batch(['水']))
+        self.assertEqual(rows, [{"input": "水", "error": "Unable to process character. Please try again later."}])
+
+    def test_batch_deadline(self):
+        """Items still running at the batch deadline are reported instead of awaited"""
+        def describe(item, **kwargs):
+            time.sleep(0.05 if item == '水' else 1)
+            return {"result": item, "meaning": item, "connections": "", "pinyin": "", "partial": False}
+
+        start = time.time()
+        with mock.patch.object(character_lookup, 'describe_character', describe), \
+             mock.patch.object(character_lookup, 'is_cached', lambda c: False):
+            rows = list(character_lookup.describe_batch(['水', '慢'], batch_deadline=0.3))
+        self.assertLess(time.time() - start, 0.8)
+        self.assertEqual(rows[0]["input"], '水')
+        self.assertNotIn("error", rows[0])
+        self.assertEqual(rows[1]["input"], '慢')
+        self.assertIn("ran out of time", rows[1]["error"])
+
+    def test_stream_is_bounded(self):
+        """No more than BATCH_WORKERS tasks run at once"""
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def task():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        results = list(background.stream({str(i): task for i in range(40)}))
+        self.assertEqual(len(results), 40)
+        self.assertLessEqual(peak[0], background._batch_executor._max_workers)
+
+if __name__ == '__main__':
+    unittest.main()
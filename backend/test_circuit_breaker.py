@@ -0,0 +1,121 @@
+import unittest
+import time
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import event
+
+from main import app
+from models import db
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN, openai_breaker
+from character_data_service import CharacterDataService, failed_lookups
+from openai_service import OpenAIService
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05, slow_call_seconds=0.5)
+
+    def trip(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_trips_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.available())
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+
+    def test_half_open_single_probe(self):
+        self.trip()
+        time.sleep(0.06)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success(0.01)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self.trip()
+        time.sleep(0.06)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()["trips"], 2)
+
+    def test_slow_calls_trip(self):
+        for _ in range(3):
+            self.breaker.record_success(duration=1.0)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()["slow_calls"], 3)
+
+class TestOpenAIBreaker(unittest.TestCase):
+    def setUp(self):
+        openai_breaker.reset()
+        failed_lookups.clear()
+        self.service = OpenAIService()
+        self.service.client = mock.Mock()
+        self.service.client.ChatCompletion.create.side_effect = TimeoutError("upstream timed out")
+
+    def tearDown(self):
+        openai_breaker.reset()
+        failed_lookups.clear()
+
+    def test_open_breaker_skips_upstream(self):
+        """Once open, a degraded upstream costs no request at all"""
+        for _ in range(openai_breaker.failure_threshold):
+            self.assertIsNone(self.service.generate_mnemonic('水', 'shuǐ', 'water'))
+        calls = self.service.client.ChatCompletion.create.call_count
+        self.assertFalse(self.service.is_available())
+
+        started = time.perf_counter()
+        for _ in range(1000):
+            self.assertIsNone(self.service.get_character_info('水'))
+        self.assertLess((time.perf_counter() - started) / 1000, 50e-6)
+        self.assertEqual(self.service.client.ChatCompletion.create.call_count, calls)
+
+        status = app.test_client().get('/api/status').get_json()
+        self.assertEqual(status["circuit_breakers"]["openai"]["state"], OPEN)
+
+    def test_open_breaker_takes_no_locks(self):
+        """Lookups served locally during an outage skip the cross-worker lock"""
+        for _ in range(openai_breaker.failure_threshold):
+            openai_breaker.record_failure()
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'upstream_locks' in statement:
+                statements.append(statement)
+
+        with app.app_context(), mock.patch('services.services.get', return_value=self.service):
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                for _ in range(3):
+                    self.assertIn(CharacterDataService().get_character_info('火')['source'], ('local', 'fallback'))
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(statements, [])
+
+    def test_negative_cache(self):
+        """A character OpenAI just failed on goes straight to the local dictionary"""
+        char_service = CharacterDataService()
+        with mock.patch('services.services.get', return_value=self.service):
+            self.assertEqual(char_service._fetch_character_info('火')['source'], 'local')
+            self.assertEqual(char_service._fetch_character_info('火')['source'], 'local')
+        self.assertEqual(self.service.client.ChatCompletion.create.call_count, 1)
+        self.assertIn('火', failed_lookups)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+import json
+import time
+import threading
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from main import app
+from clerk_auth import AuthError, ClerkTokenVerifier, JWKSCache, clerk_verifier
+
+ISSUER = 'https://example.clerk.accounts.dev'
+
+def make_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def make_jwks(*keys):
+    """JWKS document for (kid, private key) pairs"""
+    jwks = []
+    for kid, private_key in keys:
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update(kid=kid, use='sig', alg='RS256')
+        jwks.append(jwk)
+    return {'keys': jwks}
+
+class TestClerkTokenVerifier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key = make_key()
+        cls.other_key = make_key()
+
+    def setUp(self):
+        self.jwks_doc = make_jwks(('kid1', self.key))
+        self.fetch = mock.Mock(side_effect=lambda url: self.jwks_doc)
+        self.verifier = ClerkTokenVerifier()
+        self.verifier.configure(JWKSCache('https://jwks.test', fetch=self.fetch), issuer=ISSUER,
+                                authorized_parties=['http://localhost:3000'])
+
+    def token(self, key=None, kid='kid1', **claims):
+        now = int(time.time())
+        payload = {'sub': 'user_123', 'iss': ISSUER, 'azp': 'http://localhost:3000',
+                   'iat': now, 'nbf': now, 'exp': now + 60, 'email': 'a@example.com'}
+        payload.update(claims)
+        return jwt.encode(payload, key or self.key, algorithm='RS256', headers={'kid': kid})
+
+    def test_valid_token(self):
+        claims = self.verifier.verify(self.token())
+        self.assertEqual(claims['sub'], 'user_123')
+        self.assertEqual(claims['email'], 'a@example.com')
+
+    def test_rejected_tokens(self):
+        now = int(time.time())
+        bad = {
+            'expired': self.token(exp=now - 60),
+            'wrong key': self.token(key=self.other_key),
+            'wrong issuer': self.token(iss='https://evil.example'),
+            'wrong party': self.token(azp='https://evil.example'),
+            'garbage': 'not.a.token',
+        }
+        for name, token in bad.items():
+            with self.subTest(name):
+                with self.assertRaises(AuthError):
+                    self.verifier.verify(token)
+        self.assertEqual(self.verifier.stats()['rejected'], len(bad))
+
+    def test_tampered_payload(self):
+        """A verified token's signature does not vouch for an edited payload"""
+        token = self.token()
+        self.verifier.verify(token)
+        header, payload, signature = token.split('.')
+        claims = json.loads(jwt.utils.base64url_decode(payload))
+        claims['sub'] = 'someone_else'
+        forged = '.'.join([header, jwt.utils.base64url_encode(json.dumps(claims).encode()).decode(), signature])
+        with self.assertRaises(AuthError):
+            self.verifier.verify(forged)
+
+    def test_hs256_with_public_key_rejected(self):
+        token = jwt.encode({'sub': 'x', 'exp': int(time.time()) + 60}, 'secret', algorithm='HS256',
+                           headers={'kid': 'kid1'})
+        with self.assertRaises(AuthError):
+            self.verifier.verify(token)
+
+    def test_repeat_token_skips_signature_check(self):
+        token = self.token()
+        self.verifier.verify(token)
+        with mock.patch('clerk_auth.jwt.decode') as decode:
+            self.assertEqual(self.verifier.verify(token)['sub'], 'user_123')
+        decode.assert_not_called()
+        self.assertEqual(self.verifier.stats()['cache_hits'], 1)
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_cached_token_expires(self):
+        token = self.token(exp=int(time.time()) + 1)
+        self.verifier.verify(token)
+        with mock.patch('clerk_auth.time.time', return_value=time.time() + 60), \
+                mock.patch('clerk_auth.jwt.decode', side_effect=jwt.ExpiredSignatureError) as decode:
+            with self.assertRaises(AuthError):
+                self.verifier.verify(token)
+        decode.assert_called_once()
+
+    def test_key_rotation_refreshes_jwks(self):
+        self.verifier.verify(self.token())
+        self.jwks_doc = make_jwks(('kid1', self.key), ('kid2', self.other_key))
+        rotated = self.token(key=self.other_key, kid='kid2')
+
+        # Unknown kids inside min_refresh_interval do not refetch
+        with self.assertRaises(AuthError):
+            self.verifier.verify(rotated)
+        self.assertEqual(self.fetch.call_count, 1)
+
+        self.verifier.jwks._fetched_at -= 120
+        self.assertEqual(self.verifier.verify(rotated)['sub'], 'user_123')
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_cold_start_unknown_kid_fetches_once(self):
+        with self.assertRaises(AuthError):
+            self.verifier.verify(self.token(key=self.other_key, kid='kid2'))
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_concurrent_unknown_kids_share_one_fetch(self):
+        self.verifier.verify(self.token())
+        self.verifier.jwks._fetched_at -= 120
+        self.fetch.side_effect = lambda url: time.sleep(0.05) or self.jwks_doc
+        errors = []
+
+        def verify(kid):
+            try:
+                self.verifier.verify(self.token(key=self.other_key, kid=kid))
+            except AuthError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=verify, args=(f'unknown{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 8)
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_stale_jwks_refreshes_in_background(self):
+        self.verifier.verify(self.token())
+        self.verifier.jwks._fetched_at -= 7200
+        with mock.patch('clerk_auth.background.submit') as submit:
+            self.verifier.verify(self.token(sub='user_456'))
+        submit.assert_called_once_with(self.verifier.jwks.refresh)
+
+class TestRequireClerkAuth(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key = make_key()
+
+    def setUp(self):
+        self.client = app.test_client()
+        jwks = JWKSCache('https://jwks.test', fetch=lambda url: make_jwks(('kid1', self.key)))
+        clerk_verifier.configure(jwks, issuer=ISSUER)
+
+    def tearDown(self):
+        clerk_verifier.configure(None)
+
+    def get_cards(self, token, **headers):
+        return self.client.get('/api/cards', headers={'Authorization': f'Bearer {token}', **headers})
+
+    def test_verified_token(self):
+        token = jwt.encode({'sub': 'user_route', 'iss': ISSUER, 'exp': int(time.time()) + 60,
+                            'email': 'route@example.com'}, self.key, algorithm='RS256', headers={'kid': 'kid1'})
+        self.assertEqual(self.get_cards(token).status_code, 200)
+
+    def test_headers_no_longer_trusted(self):
+        response = self.get_cards('made-up', **{'X-User-Email': 'a@example.com', 'X-User-ID': 'user_1'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_without_email_rejected(self):
+        token = jwt.encode({'sub': 'user_route', 'iss': ISSUER, 'exp': int(time.time()) + 60},
+                           self.key, algorithm='RS256', headers={'kid': 'kid1'})
+        self.assertEqual(self.get_cards(token).status_code, 401)
+
+    def test_fails_closed_without_jwks_outside_development(self):
+        clerk_verifier.configure(None)
+        headers = {'X-User-Email': 'a@example.com', 'X-User-ID': 'user_1'}
+        with mock.patch.dict(app.config, {'CLERK_ALLOW_UNVERIFIED': False}):
+            self.assertEqual(self.get_cards('made-up', **headers).status_code, 401)
+        # Development without headers no longer invents a demo user
+        self.assertEqual(self.get_cards('made-up').status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import threading
+import uuid
+import sys
+import os
+from contextlib import contextmanager
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import event
+
+from main import app
+from models import db, User
+from identity import identity_resolver
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+class TestIdentityResolver(unittest.TestCase):
+    def setUp(self):
+        self.email = f"identity_{uuid.uuid4().hex[:8]}@example.com"
+        self.identity = {'user_id': 'clerk_' + self.email, 'email': self.email}
+
+    def test_creates_once_then_cached(self):
+        with app.app_context():
+            user_id = identity_resolver.resolve(self.identity)
+            self.assertEqual(db.session.get(User, user_id).email, self.email)
+            with count_queries() as statements:
+                self.assertEqual(identity_resolver.resolve(self.identity), user_id)
+            self.assertEqual(statements, [])
+
+    def test_concurrent_first_requests(self):
+        """Racing first requests resolve to the same single row"""
+        ids = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            with app.app_context():
+                barrier.wait()
+                ids.append(identity_resolver._get_or_create(self.email))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(ids)), 1)
+        with app.app_context():
+            self.assertEqual(User.query.filter_by(email=self.email).count(), 1)
+
+    def test_username_collision(self):
+        """Two addresses with the same local part both get users"""
+        local = self.email.split('@')[0]
+        with app.app_context():
+            first = identity_resolver.resolve({'user_id': 'a', 'email': f"{local}@one.example"})
+            second = identity_resolver.resolve({'user_id': 'b', 'email': f"{local}@two.example"})
+            self.assertNotEqual(first, second)
+            self.assertNotEqual(db.session.get(User, first).username, db.session.get(User, second).username)
+
+    def test_warm_cards_request_has_no_user_query(self):
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token', 'X-User-Email': self.email, 'X-User-ID': 'clerk_1'}
+        self.assertEqual(client.get('/api/cards', headers=headers).status_code, 200)
+        with count_queries() as statements:
+            self.assertEqual(client.get('/api/cards', headers=headers).status_code, 200)
+        # The collection version lookup and the card page; nothing by email
+        self.assertEqual(len(statements), 2)
+        self.assertIn('FROM card_collection_versions', statements[0])
+        self.assertIn('FROM cards', statements[1])
+
+if __name__ == '__main__':
+    unittest.main()
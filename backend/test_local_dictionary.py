@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_dictionary import get_local_dictionary, kangxi_radical_number
+from pinyin_forms import marked_to_numbered, numbered_to_marked, split_syllables, strip_tones
+from character_data_service import CharacterDataService
+
+class TestLocalDictionary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dictionary = get_local_dictionary()
+
+    def test_character_lookup(self):
+        """Common readings come first, with tone marks and radical"""
+        entry = self.dictionary.lookup('水')
+        self.assertEqual(entry['readings'][0]['pinyin'], 'shuǐ')
+        self.assertIn('water', entry['readings'][0]['definitions'])
+        self.assertEqual(entry['radical_number'], 85)
+
+    def test_traditional_and_simplified(self):
+        self.assertEqual(self.dictionary.lookup('馬')['readings'][0]['definitions'][0], 'horse')
+        self.assertEqual(self.dictionary.lookup('马')['readings'][0]['definitions'][0], 'horse')
+
+    def test_word_lookup(self):
+        self.assertEqual(self.dictionary.lookup('朋友')['readings'][0]['pinyin'], 'péng you')
+
+    def test_missing(self):
+        self.assertIsNone(self.dictionary.lookup('hello'))
+
+    def test_radical_numbers(self):
+        """Radicals come from the KangXi ordering of the CJK block"""
+        self.assertEqual(kangxi_radical_number('一'), 1)
+        self.assertEqual(kangxi_radical_number('好'), 38)
+        self.assertEqual(kangxi_radical_number('龍'), 212)
+        self.assertIsNone(kangxi_radical_number('a'))
+
+    def test_service_uses_local_data(self):
+        """The service fallback reads the dictionary instead of an external host"""
+        info = CharacterDataService()._get_from_local_data('火')
+        self.assertEqual(info['source'], 'local')
+        self.assertEqual(info['pinyin'], 'huǒ')
+        self.assertEqual(info['radical_number'], '86')
+
+class TestPinyinForms(unittest.TestCase):
+    def test_numbered_to_marked(self):
+        self.assertEqual(numbered_to_marked('shui3'), 'shuǐ')
+        self.assertEqual(numbered_to_marked('liu2'), 'liú')
+        self.assertEqual(numbered_to_marked('hao3'), 'hǎo')
+        self.assertEqual(numbered_to_marked('lu:4 se4'), 'lǜ sè')
+        self.assertEqual(numbered_to_marked('Zhong1 guo2'), 'Zhōng guó')
+        self.assertEqual(numbered_to_marked('ma5'), 'ma')
+
+    def test_marked_to_numbered(self):
+        self.assertEqual(marked_to_numbered('nǐ hǎo'), 'ni3 hao3')
+        self.assertEqual(marked_to_numbered('nǐhǎo'), 'ni3 hao3')
+        self.assertEqual(marked_to_numbered('lǜ'), 'lv4')
+        self.assertEqual(marked_to_numbered('péngyou'), 'peng2 you5')
+        self.assertEqual(marked_to_numbered('shui3'), 'shui3')
+        self.assertEqual(split_syllables('Zhōngguó'), ['Zhōng', 'guó'])
+        self.assertEqual(strip_tones('Lǜ Sè'), 'lv se')
+
+if __name__ == '__main__':
+    unittest.main()
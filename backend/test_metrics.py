@@ -0,0 +1,110 @@
+import unittest
+import json
+import tempfile
+import shutil
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from sqlalchemy import create_engine, text
+
+from main import app
+from metrics import Metrics, metrics
+from services import services
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_histogram_exposition(self):
+        registry = Metrics()
+        registry.observe('pinyimage_upstream_request_duration_seconds', 0.02, provider='openai', operation='mnemonic', outcome='ok')
+        registry.observe('pinyimage_upstream_request_duration_seconds', 3, provider='openai', operation='mnemonic', outcome='ok')
+        text = registry.render()
+        labels = 'operation="mnemonic",outcome="ok",provider="openai"'
+        self.assertIn('# TYPE pinyimage_upstream_request_duration_seconds histogram', text)
+        self.assertIn(f'pinyimage_upstream_request_duration_seconds_bucket{{{labels},le="0.01"}} 0', text)
+        self.assertIn(f'pinyimage_upstream_request_duration_seconds_bucket{{{labels},le="0.025"}} 1', text)
+        self.assertIn(f'pinyimage_upstream_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f'pinyimage_upstream_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'pinyimage_upstream_request_duration_seconds_sum{{{labels}}} 3.02', text)
+
+    def test_time_records_errors(self):
+        registry = Metrics()
+        with self.assertRaises(RuntimeError):
+            with registry.time('pinyimage_upstream_request_duration_seconds', provider='openai', operation='x'):
+                raise RuntimeError()
+        self.assertIn('outcome="error"', registry.render())
+
+    def test_collectors(self):
+        registry = Metrics()
+        registry.register_collector(lambda: [('pinyimage_cache_lookups_total', {'cache': 'c', 'result': 'hits'}, 7)])
+        self.assertIn('pinyimage_cache_lookups_total{cache="c",result="hits"} 7', registry.render())
+
+    def test_workers_aggregate_through_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        workers = []
+        for _ in range(2):
+            worker = Metrics()
+            worker.directory = directory
+            worker._snapshot_path = os.path.join(directory, f"metrics_{len(workers)}.json")
+            worker.inc('pinyimage_lookup_tier_total', tier='local', outcome='served')
+            worker.observe('pinyimage_db_query_duration_seconds', 0.001, operation='select')
+            worker.flush()
+            workers.append(worker)
+        text = workers[0].render()
+        self.assertIn('pinyimage_lookup_tier_total{outcome="served",tier="local"} 2', text)
+        self.assertIn('pinyimage_db_query_duration_seconds_count{operation="select"} 2', text)
+
+    def test_mismatched_series_skipped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        worker = Metrics()
+        worker.directory = directory
+        worker._snapshot_path = os.path.join(directory, "metrics_current.json")
+        worker.observe('pinyimage_db_query_duration_seconds', 0.001, operation='select')
+        worker.flush()
+        labels = [['operation', 'select']]
+        with open(os.path.join(directory, "metrics_old.json"), 'w') as f:
+            json.dump({"counters": [], "histograms": [['pinyimage_db_query_duration_seconds', labels, [5, 0, 5]]]}, f)
+        self.assertIn('pinyimage_db_query_duration_seconds_count{operation="select"} 1', worker.render())
+
+    def test_failed_statements_do_not_leak_timers(self):
+        engine = create_engine('sqlite://')
+        Metrics().instrument_engine(engine)
+        with engine.connect() as conn:
+            for _ in range(3):
+                with self.assertRaises(Exception):
+                    conn.execute(text("SELECT * FROM missing"))
+            self.assertEqual(conn.info.get('metrics_started', []), [])
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_routes_db_and_caches(self):
+        self.client.get('/api/health')
+        text = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('pinyimage_http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}', text)
+        self.assertIn('pinyimage_db_query_duration_seconds_count{operation="select"}', text)
+        self.assertIn('pinyimage_cache_lookups_total{cache="identity",result="hits"}', text)
+
+    def test_fallback_tiers(self):
+        metrics.reset()
+        with mock.patch.object(services.openai, 'is_available', return_value=False):
+            services.character_data._fetch_character_info('水')
+        text = metrics.render()
+        self.assertIn('pinyimage_lookup_tier_total{outcome="skipped",tier="openai"} 1', text)
+        self.assertIn('pinyimage_lookup_tier_total{outcome="served",tier="local"} 1', text)
+
+    def test_token(self):
+        with mock.patch.dict(app.config, {'METRICS_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
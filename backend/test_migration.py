@@ -0,0 +1,90 @@
+import unittest
+import sqlite3
+import tempfile
+import shutil
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+
+import migrate_sqlite_to_postgres as migration
+
+class TestStreamingMigration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'source.db')
+        self.target_url = f"sqlite:///{os.path.join(self.tmp, 'target.db')}"
+        conn = sqlite3.connect(self.source)
+        conn.execute('''CREATE TABLE cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            title TEXT NOT NULL, pinyin TEXT NOT NULL, meaning TEXT NOT NULL, con TEXT NOT NULL)''')
+        conn.executemany('INSERT INTO cards (created, title, pinyin, meaning, con) VALUES (?, ?, ?, ?, ?)',
+                         [('2024-01-02 03:04:05' if i % 2 else 'garbage', chr(0x4e00 + i), 'yī', f'meaning {i}', 'con')
+                          for i in range(1050)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def target_count(self, sql="SELECT COUNT(*) FROM cards"):
+        engine = create_engine(self.target_url)
+        with engine.connect() as conn:
+            count = conn.execute(text(sql)).scalar()
+        engine.dispose()
+        return count
+
+    def test_migrates_in_batches(self):
+        with mock.patch.object(migration, 'write_batch', wraps=migration.write_batch) as write_batch:
+            self.assertTrue(migration.migrate_sqlite_to_postgres(self.source, self.target_url, batch_size=100))
+        self.assertEqual(write_batch.call_count, 11)
+        self.assertEqual(self.target_count(), 1050)
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM cards WHERE created_at LIKE '2024-01-02%'"), 525)
+
+    def test_resumes_after_interruption(self):
+        """A failed run keeps its committed batches and the rerun adds only the rest"""
+        real_write = migration.write_batch
+        calls = []
+
+        def flaky(*args):
+            calls.append(1)
+            if len(calls) == 4:
+                raise RuntimeError("connection lost")
+            return real_write(*args)
+
+        with mock.patch.object(migration, 'write_batch', flaky):
+            self.assertFalse(migration.migrate_sqlite_to_postgres(self.source, self.target_url, batch_size=100))
+        self.assertEqual(self.target_count(), 300)
+
+        self.assertTrue(migration.migrate_sqlite_to_postgres(self.source, self.target_url, batch_size=100))
+        self.assertEqual(self.target_count(), 1050)
+        self.assertEqual(self.target_count("SELECT COUNT(DISTINCT title) FROM cards"), 1050)
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM users"), 1)
+
+        # Nothing left to do on a third run
+        self.assertTrue(migration.migrate_sqlite_to_postgres(self.source, self.target_url, batch_size=100))
+        self.assertEqual(self.target_count(), 1050)
+
+    def test_target_is_stamped_and_derived_forms_filled(self):
+        """The copy runs the migrations and fills what the ORM hooks would have"""
+        self.assertTrue(migration.migrate_sqlite_to_postgres(self.source, self.target_url, batch_size=100))
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM alembic_version"), 1)
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM cards WHERE pinyin_toneless = 'yi' "
+                                           "AND pinyin_numbered = 'yi1' AND pinyin_syllables = 1"), 1050)
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM card_search_documents"), 1050)
+        self.assertEqual(self.target_count("SELECT COUNT(*) FROM card_search_documents "
+                                           "WHERE document = 'yi|yi1|' || (SELECT title FROM cards "
+                                           "WHERE cards.id = card_search_documents.card_id)"), 1050)
+
+    def test_copy_buffer(self):
+        cards = migration.convert_rows([(1, '水', 'shuǐ', 'water, "liquid"', 'con', '2024-01-02 03:04:05')], 7)
+        self.assertEqual(migration.copy_buffer(cards).read(),
+                         '7,水,shuǐ,"water, ""liquid""",con,2024-01-02T03:04:05,2024-01-02T03:04:05\r\n')
+
+if __name__ == '__main__':
+    unittest.main()
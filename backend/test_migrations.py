@@ -0,0 +1,174 @@
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, select, func, text, tuple_
+
+from models import db, User, Card
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def alembic_config(url):
+    config = Config(os.path.join(BACKEND_DIR, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(BACKEND_DIR, 'migrations'))
+    config.set_main_option('sqlalchemy.url', url)
+    return config
+
+def hot_queries():
+    """The statements /api/cards and the auth decorators run on every request"""
+    cards = Card.__table__
+    users = User.__table__
+    page = (select(cards).where(cards.c.user_id == 1)
+            .order_by(cards.c.created_at.desc(), cards.c.id.desc()).limit(101))
+    return {
+        "first page": page,
+        "next page": page.where(tuple_(cards.c.created_at, cards.c.id) < tuple_(datetime(2024, 1, 1), 500)),
+        "total": select(func.count()).select_from(cards).where(cards.c.user_id == 1),
+        "user by email": select(users).where(users.c.email == 'a@example.com'),
+    }
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.url = f"sqlite:///{os.path.join(self.tmp, 'test.db')}"
+        self.engine = create_engine(self.url)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tmp)
+
+    def indexes(self, table):
+        return {index['name']: index for index in inspect(self.engine).get_indexes(table)}
+
+    def test_upgrade_and_downgrade(self):
+        command.upgrade(alembic_config(self.url), 'head')
+        self.assertEqual(self.indexes('cards')['ix_cards_user_created_id']['column_names'],
+                         ['user_id', 'created_at', 'id'])
+        self.assertNotIn('uq_cards_user_title', self.indexes('cards'))
+
+        command.downgrade(alembic_config(self.url), 'base')
+        self.assertNotIn('cards', inspect(self.engine).get_table_names())
+
+    def test_upgrade_database_from_create_all(self):
+        """Databases made by db.create_all() upgrade in place"""
+        db.metadata.create_all(self.engine)
+        command.upgrade(alembic_config(self.url), 'head')
+        self.assertIn('ix_cards_user_created_id', self.indexes('cards'))
+        # The unique constraint already covers users.email
+        self.assertNotIn('ix_users_email', self.indexes('users'))
+
+    def test_unique_titles_opt_in(self):
+        config = alembic_config(self.url)
+        command.upgrade(config, '0002')
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'a', 'a@x', 'x')"))
+            conn.execute(text("INSERT INTO cards (user_id, title, pinyin, meaning, con) VALUES "
+                              "(1, '水', 'shuǐ', 'water', 'c'), (1, '水', 'shuǐ', 'water', 'c')"))
+        with mock.patch.dict(os.environ, {'ENFORCE_UNIQUE_CARD_TITLES': 'true'}):
+            with self.assertRaises(RuntimeError):
+                command.upgrade(config, 'head')
+            with self.engine.begin() as conn:
+                conn.execute(text("DELETE FROM cards WHERE id = 2"))
+            command.upgrade(config, 'head')
+        self.assertTrue(self.indexes('cards')['uq_cards_user_title']['unique'])
+
+    def test_existing_cards_indexed_for_search(self):
+        """Cards written before migration 0005 become searchable"""
+        config = alembic_config(self.url)
+        command.upgrade(config, '0004')
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'a', 'a@x', 'x')"))
+            conn.execute(text("INSERT INTO cards (user_id, title, pinyin, meaning, con) VALUES "
+                              "(1, '你好', 'nǐhǎo', 'hello', 'c')"))
+        command.upgrade(config, '0005')
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT document FROM card_search_documents")).all(),
+                             [('nihao|ni3hao3|你好',)])
+            self.assertIn(('hao',), conn.execute(text("SELECT gram FROM card_search_grams")).all())
+
+    def test_existing_cards_indexed_for_fulltext(self):
+        """Cards written before migration 0006 are in the full-text index"""
+        config = alembic_config(self.url)
+        command.upgrade(config, '0005')
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'a', 'a@x', 'x')"))
+            conn.execute(text("INSERT INTO cards (user_id, title, pinyin, meaning, con) VALUES "
+                              "(1, '马', 'mǎ', 'horse', 'c')"))
+        command.upgrade(config, '0006')
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT rowid, owner FROM card_fts WHERE card_fts MATCH 'horses'")).all(),
+                             [(1, 'u1')])
+        command.downgrade(config, '0005')
+        with self.engine.connect() as conn:
+            self.assertNotIn('card_fts', inspect(conn).get_table_names())
+
+    def test_existing_cards_get_pinyin_forms(self):
+        """Cards written before migration 0007 get their normalized pinyin filled"""
+        config = alembic_config(self.url)
+        command.upgrade(config, '0006')
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'a', 'a@x', 'x')"))
+            conn.execute(text("INSERT INTO cards (user_id, title, pinyin, meaning, con) VALUES "
+                              "(1, '你好', 'nǐhǎo', 'hello', 'c')"))
+        command.upgrade(config, '0007')
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text(
+                "SELECT pinyin_toneless, pinyin_numbered, pinyin_syllables FROM cards")).all(),
+                [('nihao', 'ni3hao3', 2)])
+
+    def test_hot_queries_use_indexes(self):
+        """EXPLAIN QUERY PLAN shows index searches and no sort for the card pages"""
+        command.upgrade(alembic_config(self.url), 'head')
+        self.engine.dispose()  # drop connections opened before the schema change
+        with self.engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [
+                {"id": i, "username": f"u{i}", "email": f"u{i}@example.com", "password_hash": "x"}
+                for i in range(1, 51)])
+            start = datetime(2024, 1, 1)
+            conn.execute(Card.__table__.insert(), [
+                {"user_id": i % 50 + 1, "title": "水", "pinyin": "shuǐ", "meaning": "water", "con": "c",
+                 "created_at": start + timedelta(minutes=i), "updated_at": start}
+                for i in range(5000)])
+            conn.execute(text("ANALYZE"))
+
+            for name, statement in hot_queries().items():
+                compiled = statement.compile(self.engine)
+                params = tuple(compiled.params[key] for key in compiled.positiontup)
+                params = tuple(p.isoformat(' ') if isinstance(p, datetime) else p for p in params)
+                plan = ' | '.join(row[-1] for row in conn.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {compiled}", params))
+                with self.subTest(name, plan=plan):
+                    self.assertIn('USING', plan)
+                    self.assertIn('INDEX', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    self.assertNotRegex(plan, r'SCAN (cards|users)\b(?! USING)')
+
+    @unittest.skipUnless(os.getenv('TEST_POSTGRES_URL'), "set TEST_POSTGRES_URL to run EXPLAIN on PostgreSQL")
+    def test_hot_queries_use_indexes_postgres(self):
+        url = os.environ['TEST_POSTGRES_URL']
+        command.upgrade(alembic_config(url), 'head')
+        engine = create_engine(url)
+        try:
+            with engine.connect() as conn:
+                # Tiny test tables are cheaper to seq-scan; ask whether an index path exists
+                conn.execute(text("SET enable_seqscan = off"))
+                for name, statement in hot_queries().items():
+                    compiled = statement.compile(engine, compile_kwargs={"render_postcompile": True})
+                    plan = '\n'.join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params))
+                    with self.subTest(name, plan=plan):
+                        self.assertIn('Index', plan)
+                        self.assertNotIn('Seq Scan', plan)
+        finally:
+            engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from models import db
+from config import config
+from mnemonic_store import MnemonicStore, normalize_key
+
+class TestMnemonicStore(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.from_object(config['testing'])
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.calls = 0
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def generator(self, character, pinyin, meaning):
+        self.calls += 1
+        return f"mnemonic {self.calls}"
+
+    def test_normalized_key(self):
+        """Case, whitespace and composition differences share a pool"""
+        self.assertEqual(normalize_key('水', 'Shuǐ ', 'Water'),
+                         normalize_key('水', 'shu\u0069\u030c', 'water'))
+
+    def test_reuses_stored_variant(self):
+        """A full pool is served without generating"""
+        store = MnemonicStore(pool_size=1)
+        first = store.get('水', 'shuǐ', 'water', self.generator)
+        second = store.get('水', 'shuǐ', 'water', self.generator)
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+
+    def test_fresh_adds_variant(self):
+        """Asking for a fresh mnemonic grows a pool that is not full"""
+        store = MnemonicStore(pool_size=2)
+        store.get('水', 'shuǐ', 'water', self.generator)
+        fresh = store.get('水', 'shuǐ', 'water', self.generator, fresh=True)
+        self.assertEqual(fresh, 'mnemonic 2')
+        self.assertEqual(len(MnemonicStore().variants('水', 'shuǐ', 'water')), 2)
+
+    def test_full_pool_replaces_oldest(self):
+        """Fresh and externally added variants never grow a pool past pool_size"""
+        store = MnemonicStore(pool_size=2)
+        store.get('水', 'shuǐ', 'water', self.generator)
+        store.get('水', 'shuǐ', 'water', self.generator, fresh=True)
+        store.get('水', 'shuǐ', 'water', self.generator, fresh=True)
+        store.add('水', 'shuǐ', 'water', 'streamed')
+        self.assertEqual(store.variants('水', 'shuǐ', 'water'), ['mnemonic 3', 'streamed'])
+        self.assertEqual(MnemonicStore().variants('水', 'shuǐ', 'water'), ['mnemonic 3', 'streamed'])
+
+if __name__ == '__main__':
+    unittest.main()
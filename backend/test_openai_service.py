@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openai_service import (parse_json_response, validate_schema,
+                            CHARACTER_PROFILE_SCHEMA, CHARACTER_PROFILE_REQUIRED)
+
+class TestParseJsonResponse(unittest.TestCase):
+    def test_fenced(self):
+        """Markdown fences are stripped"""
+        self.assertEqual(parse_json_response('```json\n{"pinyin": "shuǐ"}\n```'), {"pinyin": "shuǐ"})
+
+    def test_surrounding_prose_and_trailing_comma(self):
+        """Prose around the object and trailing commas are tolerated"""
+        content = 'Here you go: {"pinyin": "shuǐ", "meaning": "water",} Hope it helps!'
+        self.assertEqual(parse_json_response(content), {"pinyin": "shuǐ", "meaning": "water"})
+
+    def test_truncated(self):
+        """Output cut off mid-string is closed"""
+        content = '{"pinyin": "shuǐ", "mnemonic": "A river flows'
+        self.assertEqual(parse_json_response(content)["mnemonic"], "A river flows")
+
+    def test_unrecoverable(self):
+        """Text with no object raises ValueError"""
+        with self.assertRaises(ValueError):
+            parse_json_response("I cannot help with that.")
+
+class TestValidateSchema(unittest.TestCase):
+    def test_coerces_types(self):
+        """Stroke counts given as text become integers; unknown fields are dropped"""
+        data = {"pinyin": "shuǐ", "meaning": "water", "mnemonic": "m", "stroke_count": "4 strokes", "extra": 1}
+        clean = validate_schema(data, CHARACTER_PROFILE_SCHEMA, CHARACTER_PROFILE_REQUIRED)
+        self.assertEqual(clean["stroke_count"], 4)
+        self.assertNotIn("extra", clean)
+
+    def test_missing_required(self):
+        """Missing required fields raise ValueError"""
+        with self.assertRaises(ValueError):
+            validate_schema({"pinyin": "shuǐ"}, CHARACTER_PROFILE_SCHEMA, CHARACTER_PROFILE_REQUIRED)
+
+if __name__ == '__main__':
+    unittest.main()
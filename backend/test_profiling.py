@@ -0,0 +1,134 @@
+import unittest
+import tempfile
+import shutil
+import json
+import time
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from flask import Flask, jsonify
+
+from main import app
+from background import fan_out
+from profiling import HEADER, Profiler, phase, profiler, sign_debug_token, verify_debug_token
+
+class TestDebugToken(unittest.TestCase):
+    def test_sign_and_verify(self):
+        token = sign_debug_token('secret', ttl=60)
+        self.assertTrue(verify_debug_token('secret', token))
+        self.assertFalse(verify_debug_token('other', token))
+        self.assertFalse(verify_debug_token(None, token))
+        self.assertFalse(verify_debug_token('secret', token + '0'))
+
+    def test_expired(self):
+        token = sign_debug_token('secret', ttl=60, now=1000)
+        self.assertTrue(verify_debug_token('secret', token, now=1050))
+        self.assertFalse(verify_debug_token('secret', token, now=1061))
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config.update(PROFILE_SECRET='secret', PROFILE_DIR=self.directory,
+                               PROFILE_MAX_FILES=2, PROFILE_INTERVAL=0.001)
+        self.profiler = Profiler()
+        self.profiler.init_app(self.app)
+
+        @self.app.route('/work')
+        def work():
+            with phase('upstream'):
+                time.sleep(0.02)
+            return jsonify({"ok": True})
+
+        @self.app.route('/fan-out')
+        def fan():
+            def lookup():
+                with phase('upstream'):
+                    time.sleep(0.01)
+                return 1
+            return jsonify(fan_out({'a': lookup, 'b': lookup}, timeout=5))
+
+        self.client = self.app.test_client()
+        self.headers = {HEADER: sign_debug_token('secret')}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled_by_default(self):
+        disabled = Profiler()
+        disabled.init_app(Flask(__name__))
+        self.assertFalse(disabled.enabled)
+        self.assertFalse(disabled.should_profile({HEADER: sign_debug_token('secret')}))
+        with phase('db'):
+            pass
+
+    def test_unsigned_requests_are_not_profiled(self):
+        response = self.client.get('/work', headers={HEADER: 'forged'})
+        self.assertNotIn('X-Profile-Id', response.headers)
+        self.assertEqual(self.profiler.list_profiles(), [])
+
+    def test_signed_request_is_profiled(self):
+        response = self.client.get('/work', headers=self.headers)
+        profile = self.profiler.load(response.headers['X-Profile-Id'])
+        self.assertEqual(profile['path'], '/work')
+        self.assertEqual(profile['status'], 200)
+        self.assertEqual(profile['phases']['upstream']['count'], 1)
+        self.assertGreaterEqual(profile['phases']['upstream']['seconds'], 0.02)
+        self.assertEqual(profile['phases']['serialize']['count'], 1)
+        self.assertGreater(profile['samples'], 0)
+        self.assertTrue(any('work (test_profiling.py' in stack for stack in profile['stacks']))
+
+    def test_sample_rate(self):
+        self.profiler.sample_rate = 1.0
+        self.assertIn('X-Profile-Id', self.client.get('/work').headers)
+
+    def test_fan_out_tasks_count_towards_profile(self):
+        response = self.client.get('/fan-out', headers=self.headers)
+        profile = self.profiler.load(response.headers['X-Profile-Id'])
+        self.assertEqual(profile['phases']['upstream']['count'], 2)
+
+    def test_directory_is_bounded(self):
+        for _ in range(3):
+            self.client.get('/work', headers=self.headers)
+            time.sleep(0.01)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertEqual(len(self.profiler.list_profiles()), 2)
+
+class TestProfileDownload(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.patch = mock.patch.multiple(profiler, secret='secret', directory=self.directory)
+        self.patch.start()
+        self.client = app.test_client()
+        self.headers = {HEADER: sign_debug_token('secret')}
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.directory)
+
+    def test_requires_signed_header(self):
+        self.assertEqual(self.client.get('/api/debug/profiles').status_code, 401)
+
+    def test_list_and_download(self):
+        profile, token = profiler.begin('GET', '/api/cards')
+        profiler.deactivate(token)
+        profiler.finish(profile, 200)
+
+        listing = self.client.get('/api/debug/profiles', headers=self.headers).get_json()
+        self.assertEqual([item['id'] for item in listing['profiles']], [profile.id])
+        self.assertNotIn('stacks', listing['profiles'][0])
+
+        response = self.client.get(f'/api/debug/profiles/{profile.id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        self.assertIn('stacks', json.loads(response.get_data()))
+        self.assertEqual(self.client.get('/api/debug/profiles/..', headers=self.headers).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import timeit
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from radicals import RadicalIndex, get_radical_index
+from character_data_service import CharacterDataService
+import main
+
+class TestRadicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = get_radical_index()
+
+    def test_lookup_by_number(self):
+        self.assertEqual(len(self.index), 214)
+        self.assertEqual(self.index.get(85)['radical'], '水')
+        self.assertEqual(self.index.get(1)['english'], 'one')
+        self.assertIsNone(self.index.get(0))
+        self.assertIsNone(self.index.get(215))
+
+    def test_reverse_maps(self):
+        self.assertEqual(self.index.by_glyph('水')['id'], 85)
+        # KANGXI RADICAL WATER (U+2F54) resolves to the same entry
+        self.assertEqual(self.index.by_glyph('⽔')['id'], 85)
+        self.assertIsNone(self.index.by_glyph('a'))
+        self.assertEqual([r['id'] for r in self.index.by_english('Person')], [9])
+        self.assertGreater(len(self.index.by_english('walk')), 1)
+
+    def test_loaded_once(self):
+        """Services and getRads share the process-wide index"""
+        self.assertIs(CharacterDataService().radicals, self.index)
+        self.assertIs(get_radical_index(), self.index)
+        self.assertEqual(main.getRads('9')['radical'], '人')
+        self.assertIsNone(main.getRads(999))
+        with self.assertRaises(ValueError):
+            main.getRads('abc')
+
+    def test_no_file_io_on_lookup(self):
+        """Lookups and service construction never touch radicals.json"""
+        with mock.patch('builtins.open', side_effect=AssertionError('file read during lookup')):
+            self.assertEqual(main.getRads(85)['english'], 'water')
+            service = CharacterDataService()
+            self.assertEqual(service._get_radical_info('86')['radical'], '火')
+            self.assertTrue(service.is_available())
+
+    def test_empty_index(self):
+        empty = RadicalIndex([])
+        self.assertEqual(len(empty), 0)
+        self.assertIsNone(empty.get(1))
+
+    def test_constant_time_lookup(self):
+        """Micro-benchmark: the last radical is as cheap to find as the first"""
+        number = 20000
+        first = min(timeit.repeat(lambda: main.getRads(1), number=number, repeat=5))
+        last = min(timeit.repeat(lambda: main.getRads(214), number=number, repeat=5))
+        # A linear scan would make radical 214 ~200x slower than radical 1
+        self.assertLess(last, first * 3)
+        # Comfortably under 50us per lookup including logging overhead
+        self.assertLess(last / number, 50e-6)
+
+if __name__ == '__main__':
+    unittest.main()
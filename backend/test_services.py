@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+import main
+from services import ServiceRegistry, services
+from character_data_service import CharacterDataService
+
+class TestServiceRegistry(unittest.TestCase):
+    def test_built_once(self):
+        registry = ServiceRegistry()
+        factory = mock.Mock(side_effect=object)
+        registry.register('thing', factory)
+        first = registry.get('thing')
+        self.assertIs(registry.get('thing'), first)
+        factory.assert_called_once()
+
+    def test_rebuilt_after_fork(self):
+        """A child process never reuses the parent's instances"""
+        registry = ServiceRegistry()
+        registry.register('thing', object)
+        parent = registry.get('thing')
+        registry._pid = -1
+        self.assertIsNot(registry.get('thing'), parent)
+
+    def test_unknown_service(self):
+        with self.assertRaises(KeyError):
+            ServiceRegistry().get('missing')
+
+    def test_default_services(self):
+        self.assertIsInstance(services.character_data, CharacterDataService)
+        self.assertIs(services.character_data, services.character_data)
+        self.assertIs(main.app.extensions['services'], services)
+
+class TestRoutesReuseServices(unittest.TestCase):
+    def setUp(self):
+        self.client = main.app.test_client()
+
+    def test_no_construction_per_request(self):
+        """Health and status probes reuse the worker's services"""
+        self.client.get('/api/health')
+        with mock.patch('ai_service.AIService.__init__') as ai_init, \
+             mock.patch('character_data_service.CharacterDataService.__init__') as char_init, \
+             mock.patch('openai_service.OpenAIService.__init__') as openai_init:
+            for _ in range(5):
+                self.assertEqual(self.client.get('/api/health').status_code, 200)
+                self.assertEqual(self.client.get('/api/status').status_code, 200)
+        ai_init.assert_not_called()
+        char_init.assert_not_called()
+        openai_init.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+from datetime import timedelta
+from unittest import mock
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run main.app on the in-memory testing database, never the tracked dev database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from main import app
+from models import db, UpstreamLock
+from character_cache import character_info_cache
+from mnemonic_store import mnemonic_store
+from openai_service import OpenAIService, upstream_call_counts
+import singleflight
+from singleflight import SingleFlight, AsyncSingleFlight, acquire_lock, release_lock, call_with_lock, utcnow
+
+def run_concurrently(fn, count=10):
+    """Run fn in count threads (each with an app context) and return their results"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        with app.app_context():
+            barrier.wait()
+            results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"value": 42}
+
+        results = run_concurrently(lambda: flight.do('key', slow))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_error_reaches_waiters(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        def call():
+            try:
+                return flight.do('key', failing)
+            except RuntimeError as e:
+                return str(e)
+
+        self.assertEqual(set(run_concurrently(call, 5)), {"upstream down"})
+
+    def test_sequential_calls_not_cached(self):
+        flight = SingleFlight()
+        counter = iter(range(10))
+        self.assertEqual(flight.do('key', lambda: next(counter)), 0)
+        self.assertEqual(flight.do('key', lambda: next(counter)), 1)
+
+    def test_async_callers_share_one_call(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "shared"
+
+        async def main():
+            return await asyncio.gather(*(flight.do('key', slow) for _ in range(10)))
+
+        self.assertEqual(asyncio.run(main()), ["shared"] * 10)
+        self.assertEqual(len(calls), 1)
+
+class TestDatabaseLock(unittest.TestCase):
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        UpstreamLock.query.filter(UpstreamLock.name.like('test:%')).delete(synchronize_session=False)
+        db.session.commit()
+
+    def tearDown(self):
+        UpstreamLock.query.filter(UpstreamLock.name.like('test:%')).delete(synchronize_session=False)
+        db.session.commit()
+        self.ctx.pop()
+
+    def test_exclusive(self):
+        token = acquire_lock('test:a')
+        self.assertIsNotNone(token)
+        self.assertIsNone(acquire_lock('test:a'))
+        release_lock('test:a', token)
+        self.assertIsNotNone(acquire_lock('test:a'))
+
+    def test_expired_lock_taken_over(self):
+        db.session.add(UpstreamLock(name='test:b', owner='dead-worker',
+                                    expires_at=utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        self.assertIsNotNone(acquire_lock('test:b'))
+
+    def test_waits_for_other_worker(self):
+        """A held lock means another worker is calling; its stored result is used"""
+        db.session.add(UpstreamLock(name='test:c', owner='other-worker',
+                                    expires_at=utcnow() + timedelta(seconds=30)))
+        db.session.commit()
+        stored = iter([None, None, "from other worker"])
+        fn = mock.Mock()
+        with mock.patch.object(singleflight, 'LOCK_POLL_INTERVAL', 0.01):
+            self.assertEqual(call_with_lock('test:c', fn, lambda: next(stored)), "from other worker")
+        fn.assert_not_called()
+
+class TestCoalescedLookups(unittest.TestCase):
+    def test_character_info_loaded_once(self):
+        calls = []
+
+        def loader(character):
+            calls.append(character)
+            time.sleep(0.1)
+            return {"character": character, "meaning": "test", "source": "openai"}
+
+        results = run_concurrently(lambda: character_info_cache.get_or_load('𠀀', loader))
+        self.assertEqual(calls, ['𠀀'])
+        self.assertTrue(all(r["meaning"] == "test" for r in results))
+        with app.app_context():
+            character_info_cache.invalidate('𠀀')
+            db.session.execute(db.text("DELETE FROM character_info_cache WHERE character = '𠀀'"))
+            db.session.commit()
+
+    def test_mnemonic_generated_once(self):
+        calls = []
+
+        def generator(character, pinyin, meaning):
+            calls.append(character)
+            time.sleep(0.1)
+            return "one shared mnemonic"
+
+        meaning = f"coalesce-{time.time()}"
+        results = run_concurrently(lambda: mnemonic_store.get('𠀁', 'x', meaning, generator))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(set(results), {"one shared mnemonic"})
+
+    def test_upstream_calls_counted(self):
+        service = OpenAIService()
+        service.client = mock.Mock()
+        service.client.ChatCompletion.create.return_value.choices = [mock.Mock(message=mock.Mock(content="text"))]
+        before = upstream_call_counts().get("mnemonic", 0)
+        service.generate_mnemonic('水', 'shuǐ', 'water')
+        self.assertEqual(upstream_call_counts()["mnemonic"], before + 1)
+
+        response = app.test_client().get('/api/status')
+        self.assertIn("upstream_calls", response.get_json())
+        self.assertIn("single_flight", response.get_json())
+
+if __name__ == '__main__':
+    unittest.main()
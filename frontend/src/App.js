@@ -23,6 +23,7 @@ const AppContent = () => {
   const [filteredCards, setFilteredCards] = useState([]);
   const [curCard, setCurCard] = useState({ title: "", pinyin: "", meaning: "", con: "" });
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [saved, setSaved] = useState(false);
   const [validChar, setValidChar] = useState(null);
   const [submitted, setSubmitted] = useState(false);
@@ -47,22 +48,31 @@ const AppContent = () => {
 
   useEffect(() => {
     if (isSignedIn && user && session) {
-      // Set up axios default headers with Clerk token and user info
-      session.getToken()
-        .then(token => {
-          // Set up headers with token and user info
-          axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
-          axios.defaults.headers.common['X-User-Email'] = user.emailAddresses[0]?.emailAddress || user.primaryEmailAddress?.emailAddress;
-          axios.defaults.headers.common['X-User-ID'] = user.id;
-          
-          // Fetch cards immediately after getting token
-          fetchCards();
-        })
-        .catch(error => {
+      // Clerk session tokens expire after about a minute, so ask the session
+      // for one on every request (it returns a cached token while still valid)
+      const interceptor = axios.interceptors.request.use(async (config) => {
+        try {
+          const token = await session.getToken();
+          if (token) {
+            config.headers.Authorization = `Bearer ${token}`;
+          }
+        } catch (error) {
           console.error('Error getting Clerk token:', error);
-          // Still try to fetch cards without token for now
-          fetchCards();
-        });
+        }
+        // The backend only trusts these headers when it runs without a
+        // CLERK_JWKS_URL (development); in production identity comes from the token
+        if (process.env.NODE_ENV === 'development') {
+          config.headers['X-User-Email'] = user.emailAddresses[0]?.emailAddress || user.primaryEmailAddress?.emailAddress;
+          config.headers['X-User-ID'] = user.id;
+        }
+        return config;
+      });
+
+      fetchCards();
+
+      return () => {
+        axios.interceptors.request.eject(interceptor);
+      };
     } else {
       // Clear cards when user logs out
       setCards([]);
@@ -70,18 +80,26 @@ const AppContent = () => {
       setResult("");
       setConnections("");
       setCurCard(null);
-      // Clear headers
-      delete axios.defaults.headers.common['Authorization'];
-      delete axios.defaults.headers.common['X-User-Email'];
-      delete axios.defaults.headers.common['X-User-ID'];
     }
   }, [isSignedIn, user, session]);
 
-  const searchFiltering = (searchTerm) => {
-    const filteredResult = cards.filter(card =>
-      card.pinyin.toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, "").includes(searchTerm.toLowerCase().normalize("NFD").replace(/[\u0300-\u036f]/g, ""))
-    );
-    setFilteredCards(filteredResult);
+  const latestSearch = useRef('');
+
+  const searchFiltering = async (searchTerm) => {
+    // Matching runs on the server's pinyin index; only the newest keystroke's answer is shown
+    latestSearch.current = searchTerm;
+    if (!searchTerm.trim()) {
+      setFilteredCards([]);
+      return;
+    }
+    try {
+      const response = await axios.get('/api/cards/search', { params: { q: searchTerm } });
+      if (latestSearch.current === searchTerm) {
+        setFilteredCards(response.data);
+      }
+    } catch (error) {
+      console.error("Error searching cards: ", error);
+    }
   };
 
   const handleScroll = (ref) => {
@@ -90,9 +108,6 @@ const AppContent = () => {
 
   const handleLogout = () => {
     signOut();
-    delete axios.defaults.headers.common['Authorization'];
-    delete axios.defaults.headers.common['X-User-Email'];
-    delete axios.defaults.headers.common['X-User-ID'];
     setCards([]);
     setFilteredCards([]);
     setResult("");
@@ -102,8 +117,15 @@ const AppContent = () => {
 
   const fetchCards = async () => {
     try {
-      const response = await axios.get('/api/cards');
-      setCards(response.data);
+      // /api/cards is keyset-paginated; follow X-Next-Cursor until the last page
+      let allCards = [];
+      let cursor = null;
+      do {
+        const response = await axios.get('/api/cards', { params: cursor ? { cursor } : {} });
+        allCards = allCards.concat(response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setCards(allCards);
     } catch (error) {
       console.error("Error fetching cards: ", error);
     }
@@ -130,25 +152,68 @@ const AppContent = () => {
     }
 
     setResult("");
+    setConnections("");
+    setStreaming(true);
     try {
-      const response = await axios.post('/api/result', { user_input: input });
-      setResult(response.data.result);
-      setConnections(response.data.connections);
+      let data;
+      try {
+        data = await streamResult(input);
+      } catch (streamError) {
+        // Fall back to the single-response endpoint
+        console.error("Streaming failed, retrying without streaming: ", streamError);
+        const response = await axios.post('/api/result', { user_input: input });
+        data = response.data;
+      }
+      setResult(data.result);
+      setConnections(data.connections);
       // DON'T overwrite database cards with AI response cards
       // setCards(removeDuplicates(response.data.cards));
       setCurCard({
         title: input,
-        pinyin: response.data.pinyin,
-        meaning: "means " + response.data.meaning,
-        con: response.data.connections,
+        pinyin: data.pinyin,
+        meaning: "means " + data.meaning,
+        con: data.connections,
       });
     } catch (error) {
       console.error("Error submitting input: ", error);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
+  // Show pinyin/meaning as soon as they are known, then the mnemonic as it is written
+  const streamResult = (input) => new Promise((resolve, reject) => {
+    const source = new EventSource(`/api/result/stream?user_input=${encodeURIComponent(input)}`);
+    let mnemonic = "";
+    let finished = false;
+    source.addEventListener('info', (event) => {
+      const info = JSON.parse(event.data);
+      setResult(info.result);
+      setLoading(false);
+    });
+    source.addEventListener('token', (event) => {
+      mnemonic += JSON.parse(event.data).text;
+      setConnections(mnemonic);
+    });
+    // The mnemonic stream broke off: drop the partial text (a stored one may follow)
+    source.addEventListener('reset', () => {
+      mnemonic = "";
+      setConnections(mnemonic);
+    });
+    source.addEventListener('done', (event) => {
+      finished = true;
+      source.close();
+      resolve(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+      source.close();
+      if (!finished) {
+        reject(new Error("Result stream closed early"));
+      }
+    };
+  });
+
   const addToDatabase = async () => {
     try {
       const response = await axios.post('/api/post', curCard);
@@ -206,6 +271,7 @@ const AppContent = () => {
                 <div>
                   <br />
                   <div className="response">{connections}</div>
+                  {!streaming && (
                   <div className="save">
                     Save this response?
                     {saved ? (
@@ -214,6 +280,7 @@ const AppContent = () => {
                       <button className="saveButton" onClick={addToDatabase}>Save to Cards</button>
                     )}
                   </div>
+                  )}
                 </div>
               )}
             </div>
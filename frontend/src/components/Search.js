@@ -19,7 +19,7 @@ const Search = ({ handleSearch }) => {
       
       <input
         type="text"
-        placeholder="Search by Pinyin"
+        placeholder="Search by Pinyin or Character"
         value={searchTerm}
         class = 'search'
         onChange={handleChange}